@@ -1,11 +1,21 @@
 import streamlit as st
-import pandas as pd
 import os
 import datetime
 import pytz
 import base64
-import re
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
+from stock import alternates, analytics, backends, caches, changes, export, memory, metrics, profiling, snapshot, warmup
+from stock.caches import FileBytesCache, LRUCache, VersionedCache
+from stock.reload import COOLDOWN, FAILED, DirWatch, ReloadGate
+from stock.refresh import StaleWhileRevalidate
+from stock.images import StaticImages, fit_width, img_html
+from stock.rules import as_clean_item_no, find_image_path, get_stock_status
+from stock.search_index import canonical_query
 
 # ---------- Page + Theme ----------
 st.set_page_config(
@@ -17,6 +27,26 @@ st.set_page_config(
     }
 )
 
+metrics.start_server()
+metrics.begin_rerun("2")
+# PROFILE_SAMPLE of reruns, or every rerun of an admin who turned profiling on
+profiling.begin("2", force=st.session_state.get('admin_ok', False) and st.session_state.get('profile_reruns', False))
+
+def end_rerun():
+    """Close this rerun's timing and profile (at the end of the script, or before it is cut short)."""
+    metrics.end_rerun()
+    profiling.end()
+
+def stop():
+    """st.stop() that doesn't leave the rerun's profile running."""
+    end_rerun()
+    st.stop()
+
+def rerun():
+    """st.rerun() that doesn't leave the rerun's profile running."""
+    end_rerun()
+    st.rerun()
+
 # ---------- Constants ----------
 tz = pytz.timezone('Asia/Kolkata')
 stk_sum_file = 'data/website stock.xlsx'
@@ -27,6 +57,17 @@ whatsapp_phone = "919516789702"
 logo_path = 'images/jyoti logo-1.png'
 call_icon_url = 'images/call_icon.png'
 MASTER_DF_OUT = 'data/master_df.xlsx'
+IMAGE_CACHE_MB = int(os.environ.get("IMAGE_CACHE_MB", "64") or 64)
+IMAGE_PATH_CACHE_ENTRIES = int(os.environ.get("IMAGE_PATH_CACHE_ENTRIES", "8192") or 8192)
+FRAGMENT_CACHE_MB = int(os.environ.get("FRAGMENT_CACHE_MB", "16") or 16)
+# ?admin=1 shows the cache admin view; disabled when unset
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "")
+# SQLite files for search analytics and the stock change feed; off unless set
+# (data/ holds the shipped workbooks, so nothing is written there by default)
+ANALYTICS_DB = os.environ.get("ANALYTICS_DB", "").strip()
+CHANGES_DB = os.environ.get("CHANGES_DB", "").strip()
+# static HTML/JSON copy of the catalogue, refreshed after every snapshot build
+STATIC_EXPORT_DIR = os.environ.get("STATIC_EXPORT_DIR", "").strip()
 
 # ====== OFFER BANNER ======
 OFFER_ENABLED = True
@@ -37,151 +78,224 @@ if 'search_history' not in st.session_state:
     st.session_state.search_history = []
 if 'show_success' not in st.session_state:
     st.session_state.show_success = None
+if 'show_error' not in st.session_state:
+    st.session_state.show_error = None
 
 # ---------- Helper Functions ----------
-def safe_file_mtime(path: str) -> datetime.datetime | None:
-    try:
-        ts = os.path.getmtime(path)
-        return datetime.datetime.fromtimestamp(ts, tz)
-    except Exception:
-        return None
-
 def file_mtime_num(path: str) -> float:
     try:
         return os.path.getmtime(path)
     except Exception:
         return 0.0
 
-def file_signature(path: str) -> tuple[float, int]:
-    """Return (mtime, size) to robustly invalidate cache on data change."""
-    try:
-        stt = os.stat(path)
-        return (stt.st_mtime, stt.st_size)
-    except Exception:
-        return (0.0, 0)
-
 def get_base64_image(image_path: str) -> str | None:
     if not os.path.exists(image_path):
         return None
     with open(image_path, 'rb') as f:
         return base64.b64encode(f.read()).decode()
 
-def as_clean_item_no(x) -> str:
-    if pd.isna(x):
-        return ""
-    s = str(x).strip()
-    m = re.search(r'(\d+)', s)
-    if not m:
-        return ""
-    return m.group(1)
+# ---------- Data Pipeline ----------
+@st.cache_resource
+def excel_backend() -> backends.ExcelBackend:
+    """The three workbooks; each is parsed again only when its own file changes."""
+    return backends.ExcelBackend(stk_sum_file, alternate_list_file, condition_file)
 
-def _digits(s: str) -> str:
-    d = "".join(ch for ch in str(s) if ch.isdigit())
-    return d.lstrip('0') or d
+def build_catalogue(version):
+    """Snapshot of the workbooks and its alternates graph for one (stock, alternates, conditions) file signature."""
+    metrics.cache_miss("master_df")
+    items = excel_backend().fetch()
+    catalogue = snapshot.Snapshot(snapshot.build(items, version))
+    write_master_df(items)
 
-@st.cache_data(ttl=3600)
-def get_image_path(item_no: str) -> str | None:
-    """Cached image path lookup for better performance"""
-    if not item_no:
-        return None
-    want = _digits(item_no)
-    if not want:
-        return None
-    # 1) direct lookup
-    for ext in ['jpg', 'jpeg', 'png', 'JPG', 'JPEG', 'PNG']:
-        p = os.path.join('images', f'{item_no}.{ext}')
-        if os.path.exists(p):
-            return p
-    # 2) recursive search
-    exts = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
-    best, best_score = None, (999, 999999)
-    for root, _, files in os.walk('images'):
-        for fname in files:
-            _, ext = os.path.splitext(fname)
-            if ext not in exts:
-                continue
-            full = os.path.join(root, fname)
-            name_no_ext = os.path.splitext(fname)[0]
-            name_digits = _digits(name_no_ext)
-            score = None
-            if name_digits == want and name_no_ext == item_no: score = 0
-            elif name_digits == want: score = 1
-            elif want and want in _digits(fname): score = 2
-            if score is not None:
-                cand = (score, len(full))
-                if cand < best_score:
-                    best_score, best = cand, full
-    return best
-
-def get_stock_status(quantity, condition_value):
-    """Return stock status with percentage"""
-    if pd.isna(quantity) or quantity <= 0:
-        return 'Out of Stock', 0
-    if pd.isna(condition_value):
-        return 'In Stock', 100
-    percentage = min(100, int((quantity / condition_value) * 100))
-    if quantity > condition_value:
-        return 'In Stock', percentage
-    else:
-        return 'Low Stock', percentage
+    with metrics.span("alternates_graph"):
+        status = {r['sku']: get_stock_status(r['quantity'], r['reorder_level'])[0] for r in items}
+        alt_graph = alternates.build({r['sku']: r['alternates'] for r in items if r['alternates']}, status)
 
+    if CHANGES_DB:
+        change_feed_worker().submit(record_changes, version, items, status)
 
-# ---------- Data Pipeline ----------
-@st.cache_data(show_spinner=False)
-def build_master_df(_stk_sig, _alt_sig, _cond_sig):
-    """Build master dataframe with caching for performance"""
-    # Website Stock
-    df_stk_sum = pd.read_excel(stk_sum_file, usecols=[0, 2])
-    df_stk_sum = df_stk_sum.iloc[8:].reset_index(drop=True)  # Data starts from row 8
-    df_stk_sum.columns = ['ITEM NO.', 'Quantity']
-    df_stk_sum['ITEM NO.'] = df_stk_sum['ITEM NO.'].apply(as_clean_item_no)
-    df_stk_sum['Quantity'] = df_stk_sum['Quantity'].astype(str).str.replace(' pcs', '', regex=False)
-    df_stk_sum['Quantity'] = pd.to_numeric(df_stk_sum['Quantity'], errors='coerce').fillna(0) * 100
-    df_stk_sum['Quantity'] = df_stk_sum['Quantity'].astype(int)
-
-    # Alternates
-    df_alt = pd.read_excel(alternate_list_file)
-    df_alt = df_alt.iloc[3:].reset_index(drop=True)
-    df_alt.columns = ['S.NO.', 'ITEM NO.', 'Alt1', 'Alt2', 'Alt3']
-    df_alt = df_alt[['ITEM NO.', 'Alt1', 'Alt2', 'Alt3']]
-    df_alt['ITEM NO.'] = df_alt['ITEM NO.'].apply(as_clean_item_no)
-    for c in ['Alt1', 'Alt2', 'Alt3']:
-        df_alt[c] = df_alt[c].apply(as_clean_item_no)
-
-    # Conditions
-    df_condition = pd.read_excel(condition_file, usecols=[1, 3])
-    df_condition.columns = ['ITEM NO.', 'CONDITION']
-    df_condition['ITEM NO.'] = df_condition['ITEM NO.'].apply(as_clean_item_no)
-    df_condition['CONDITION'] = pd.to_numeric(df_condition['CONDITION'], errors='coerce')
-
-    # Merge
-    keys = set(df_stk_sum['ITEM NO.'].tolist()) | set(df_alt['ITEM NO.'].tolist()) | set(df_condition['ITEM NO.'].tolist())
-    base = pd.DataFrame({'ITEM NO.': sorted(k for k in keys if k)})
-
-    master = (base
-        .merge(df_stk_sum[['ITEM NO.', 'Quantity']], on='ITEM NO.', how='left')
-        .merge(df_alt, on='ITEM NO.', how='left')
-        .merge(df_condition, on='ITEM NO.', how='left'))
-
-    master['Quantity'] = pd.to_numeric(master['Quantity'], errors='coerce').fillna(0).astype(int)
-    master['CONDITION'] = pd.to_numeric(master['CONDITION'], errors='coerce')
-    for c in ['Alt1', 'Alt2', 'Alt3']:
-        master[c] = master[c].fillna("").astype(str)
+    if STATIC_EXPORT_DIR:
+        threading.Thread(target=export_static, args=(version, catalogue, alt_graph),
+                         name="static-export", daemon=True).start()
+
+    return catalogue, alt_graph
+
+@st.cache_resource
+def change_feed_worker() -> ThreadPoolExecutor:
+    """One background writer, so change sets are recorded in snapshot order without holding up the build."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="change-feed")
+
+def record_changes(version, items, status):
+    """Add what changed since the previous snapshot to the stock change feed (CHANGES_DB)."""
+    try:
+        with metrics.span("change_diff"):
+            state = {r['sku']: (status[r['sku']], float(r['quantity'])) for r in items}
+            changes.ChangeLog(CHANGES_DB).record(version, state)
+    except Exception:
+        metrics.count("stock_change_feed_errors_total")
 
+def write_master_df(items):
+    """The merged table as MASTER_DF_OUT, for anyone who opens it in Excel."""
+    import pandas as pd
+    alts = [(r['alternates'] + ["", "", ""])[:3] for r in items]
+    master = pd.DataFrame({
+        'ITEM NO.': [r['sku'] for r in items],
+        'Quantity': [r['quantity'] for r in items],
+        'Alt1': [a[0] for a in alts],
+        'Alt2': [a[1] for a in alts],
+        'Alt3': [a[2] for a in alts],
+        'CONDITION': [r['reorder_level'] for r in items],
+    })
     try:
         master.to_excel(MASTER_DF_OUT, index=False)
     except Exception:
         pass
 
-    return master
+def export_static(version, catalogue, alt_graph) -> dict | None:
+    """Rewrite the static pages whose item changed (off the build thread, so the new snapshot isn't held up)."""
+    pages = [{
+        'sku': r['sku'],
+        'status': get_stock_status(r['quantity'], r['reorder_level'])[0],
+        'image': get_image_path(r['sku']),
+        'alternates': [alt for alt, _, _ in alt_graph.get(r['sku'], ())],
+    } for r in catalogue]
+    try:
+        return export.export(pages, STATIC_EXPORT_DIR, version,
+                             site={'title': 'Jyoti Cards Stock Status', 'whatsapp': whatsapp_phone})
+    except Exception:
+        metrics.count("stock_static_export_errors_total")
+        return None
+
+@st.cache_resource
+def master_source() -> StaleWhileRevalidate:
+    """Keeps serving the current (snapshot, alternates graph) while newer Excel files are read in the background."""
+    return StaleWhileRevalidate(build_catalogue, name="master_df")
+
+def data_signature() -> tuple:
+    return excel_backend().signature()
+
+@st.cache_resource
+def image_path_cache() -> LRUCache:
+    """Process-wide item -> image path (None when there is no photo), re-checked hourly."""
+    return caches.register("image_path", LRUCache(IMAGE_PATH_CACHE_ENTRIES, ttl=3600))
+
+_NOT_CACHED = object()
+
+def get_image_path(item_no: str) -> str | None:
+    cache = image_path_cache()
+    path = cache.get(item_no, _NOT_CACHED)
+    if path is _NOT_CACHED:
+        metrics.cache_miss("image_path")
+        path = find_image_path(item_no)
+        cache.put(item_no, path)
+    return path
+
+def resolve_image(item: str) -> str | None:
+    metrics.cache_request("image_path")
+    with metrics.span("image_resolve"):
+        return get_image_path(item)
+
+@st.cache_resource
+def image_cache() -> FileBytesCache:
+    """Process-wide image bytes keyed by (path, mtime, size), shared by all sessions."""
+    return caches.register("image_bytes", FileBytesCache(max_bytes=IMAGE_CACHE_MB * 1024 * 1024, transform=fit_width))
+
+def image_bytes(path: str) -> bytes | None:
+    cache = image_cache()
+    metrics.cache_request("image_bytes")
+    data = cache.get(path)
+    if data is None:
+        metrics.cache_miss("image_bytes")
+        with metrics.span("image_read"):
+            data = cache.load(path)
+    else:
+        metrics.count("stock_image_bytes_saved_total", len(data))
+    return data
+
+@st.cache_resource
+def static_images() -> StaticImages | None:
+    """Resized photos published under ./static, or None when server.enableStaticServing is off."""
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    return caches.register("image_url", StaticImages(root))
+
+def show_image(path: str) -> bool:
+    """Render the photo at `path`: a stable static URL when served, else bytes through st.image."""
+    images = static_images()
+    if images is not None:
+        with metrics.span("image_url"):
+            url = images.url(path)
+        if url:
+            st.markdown(img_html(url), unsafe_allow_html=True)
+            return True
+    data = image_bytes(path)
+    if data:
+        st.image(data, width="stretch")
+    return bool(data)
+
+def prefetch_image(path: str):
+    """Do the slow part of show_image ahead of the first search (publish the copy, or load the bytes)."""
+    images = static_images()
+    if images is not None:
+        images.url(path)
+    else:
+        image_bytes(path)
+
+@st.cache_resource
+def fragment_cache() -> VersionedCache:
+    """Pre-rendered HTML per (snapshot version, item), shared by all sessions."""
+    return caches.register("fragment", VersionedCache(4096, FRAGMENT_CACHE_MB * 1024 * 1024))
+
+@st.cache_resource
+def reload_gate() -> ReloadGate:
+    return ReloadGate()
+
+@st.cache_resource
+def images_watch() -> DirWatch:
+    return DirWatch('images')
+
+def reload_all():
+    """Rebuild the master table once for every session, then drop the caches derived from it."""
+    master_source().rebuild(data_signature())
+    fragment_cache().clear()
+    if images_watch().changed():
+        image_path_cache().clear()
+        image_cache().clear()
+
+def request_reload():
+    """🔄 callback: concurrent clicks share one reload; repeats inside the cooldown do nothing."""
+    gate = reload_gate()
+    outcome = gate.request(reload_all)
+    if outcome == FAILED:
+        st.session_state.show_error = f"⚠️ Data error: {gate.last_error}"
+    elif outcome == COOLDOWN:
+        st.session_state.show_success = f"⏳ डेटा अभी-अभी रीलोड हुआ है, {int(gate.seconds_until_ready()) + 1}s बाद फिर कोशिश करें"
+    else:
+        st.session_state.show_success = "✅ डेटा रीलोड हो गया"
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def warm_snapshot(version, _catalogue, _alt_graph) -> dict:
+    """Pre-resolve image paths and photos for the most searched items and their alternates once per snapshot."""
+    items = warmup.top_skus(_catalogue.column('sku'), popular=analytics.popular_skus(ANALYTICS_DB))
+    wanted = set(items) | {alt for item in items for alt, _, _ in _alt_graph.get(item, ())}
+    images_watch()  # baseline for the reload button's "did images change" check
+
+    def warm_images():
+        for item in sorted(wanted):
+            path = resolve_image(item)
+            if path:
+                prefetch_image(path)
+
+    return warmup.run([("images", warm_images)])
 
 # ---------- Load Data ----------
-with st.spinner('⏳ Loading data...'):
-    stk_sig = file_signature(stk_sum_file)
-    alt_sig = file_signature(alternate_list_file)
-    cond_sig = file_signature(condition_file)
-    master_df = build_master_df(stk_sig, alt_sig, cond_sig)
-    alt_df = master_df[['ITEM NO.', 'Alt1', 'Alt2', 'Alt3']].copy()
+with st.spinner('⏳ Loading data...'), metrics.span("data_load"):
+    metrics.cache_request("master_df")
+    served = master_source().get(data_signature())
+    snapshot_version = served.version
+    catalogue, alt_graph = served.value
+    warm_snapshot(snapshot_version, catalogue, alt_graph)
 
 # ---------- Modern Styling ----------
 st.markdown("""
@@ -296,7 +410,7 @@ st.markdown("""
     }
     
     /* Result Card */
-      .card {
+      .card, div[class*="st-key-card-"] {
         background: white;
         border-radius: 20px;
         padding: 24px;
@@ -426,7 +540,7 @@ st.markdown("""
     .progress-out { background: linear-gradient(90deg, #ef4444, #dc2626); }
     
     /* Image Container */
-    .img-container {
+    .img-container, div[class*="st-key-card-"] [data-testid="stImage"], .card-img {
           border-radius: 16px;
         overflow: hidden;
         margin: 20px 0;
@@ -437,6 +551,11 @@ st.markdown("""
     .img-container:hover {
         transform: scale(1.02);
     }
+
+    .card-img img {
+        width: 100%;
+        display: block;
+    }
     
     /* Alternatives Grid */
       .alt-grid {
@@ -452,7 +571,7 @@ st.markdown("""
         }
     }
     
-      .alt-card {
+      .alt-card, div[class*="st-key-alt-card-"] {
         background: white;
         border-radius: 16px;
           overflow: hidden;
@@ -461,12 +580,12 @@ st.markdown("""
         cursor: pointer;
     }
     
-    .alt-card:hover {
+    .alt-card:hover, div[class*="st-key-alt-card-"]:hover {
         transform: translateY(-4px);
         box-shadow: 0 8px 24px rgba(0, 0, 0, 0.12);
     }
     
-    .alt-card img {
+    .alt-card img, div[class*="st-key-alt-card-"] img {
         width: 100%;
         height: auto;
         display: block;
@@ -596,7 +715,7 @@ st.markdown("""
             font-size: 1.8em;
         }
         
-        .card {
+        .card, div[class*="st-key-card-"] {
             padding: 20px;
             margin: 1rem;
         }
@@ -648,6 +767,111 @@ st.markdown("""
 if st.session_state.show_success:
     st.markdown(f'<div class="success-msg">{st.session_state.show_success}</div>', unsafe_allow_html=True)
     st.session_state.show_success = None
+if st.session_state.show_error:
+    st.error(st.session_state.show_error)
+    st.session_state.show_error = None
+
+# ---------- Admin: caches ----------
+def _fmt_bytes(n: int | None) -> str:
+    if n is None:
+        return "–"
+    return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
+
+def _fmt_growth(n: int | None) -> str:
+    if n is None:
+        return "–"
+    return ("+" if n >= 0 else "−") + _fmt_bytes(abs(n))
+
+def clear_cache(name: str):
+    if caches.clear(name):
+        st.session_state.show_success = f"🗑️ {name} cache cleared"
+
+def toggle_profiling():
+    st.session_state.profile_reruns = not st.session_state.get('profile_reruns', False)
+
+def leave_admin():
+    del st.query_params['admin']
+
+def render_hot_spots():
+    runs, hot = profiling.top(n=15)
+    if not runs:
+        return
+    lines = ["| Function | ms / rerun (cum.) | ms / rerun (own) | Calls |", "| --- | --- | --- | --- |"]
+    lines += [f"| `{h['function']}` | {h['cumtime_ms']:.1f} | {h['tottime_ms']:.1f} | {h['calls']} |" for h in hot]
+    st.markdown(f"### 🔬 Hot spots ({runs} profiled reruns)")
+    st.markdown("\n".join(lines))
+
+def render_memory_report(snapshots: dict):
+    """RSS, the largest consumers (snapshot, caches, session state) and growth across the last reloads."""
+    rep = memory.report(snapshots)
+    traced = f" · Python (tracemalloc): {_fmt_bytes(rep['traced'])}" if rep['traced'] is not None else ""
+    st.markdown("### 🧠 Memory")
+    st.markdown(f"RSS: **{_fmt_bytes(rep['rss'])}** · peak: {_fmt_bytes(rep['peak_rss'])}{traced}")
+    sessions = rep['sessions']
+    consumers = [(f"snapshot: {r['name']}", r['bytes'], "") for r in rep['snapshots']]
+    consumers += [(f"cache: {r['name']}", r['bytes'], r['entries']) for r in rep['caches']]
+    consumers.append((f"session state ({sessions['count']} sessions)", sessions['bytes'], ""))
+    consumers.sort(key=lambda c: c[1], reverse=True)
+    lines = ["| Consumer | Memory (est.) | Entries |", "| --- | --- | --- |"]
+    lines += [f"| {name} | {_fmt_bytes(size)} | {entries} |" for name, size, entries in consumers]
+    st.markdown("\n".join(lines))
+    if sessions['largest']:
+        big = sessions['largest'][0]
+        st.markdown(f"Largest session: {_fmt_bytes(big['bytes'])} in {big['keys']} keys, mostly `{big['largest_key']}`")
+    builds = rep['builds'][-5:]
+    if builds:
+        lines = ["| Build | Seconds | RSS before → after | Growth since previous build |", "| --- | --- | --- | --- |"]
+        lines += [f"| {b['label']} `{b['version'][:32]}` | {b['seconds']:.2f} | {_fmt_bytes(b['rss_before'])} → "
+                  f"{_fmt_bytes(b['rss_after'])} | {_fmt_growth(b['growth'])} |" for b in builds]
+        st.markdown("\n".join(lines))
+    if builds and builds[-1]['top_growth']:
+        lines = ["| Allocated at | Growth | Objects |", "| --- | --- | --- |"]
+        lines += [f"| `{g['where']}` | {_fmt_growth(g['bytes'])} | {g['count']:+d} |" for g in builds[-1]['top_growth']]
+        st.markdown("Live Python allocations that grew most since the previous build:")
+        st.markdown("\n".join(lines))
+
+def render_cache_admin():
+    """Size, hit rate, evictions and estimated memory of every registered cache, each with a clear button."""
+    if not ADMIN_PASSWORD:
+        st.error("Admin view is disabled (set ADMIN_PASSWORD).")
+        stop()
+    if not st.session_state.get('admin_ok'):
+        password = st.text_input("Admin password", type="password")
+        if not password:
+            stop()
+        if not hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode()):
+            st.error("❌ गलत पासवर्ड")
+            stop()
+        st.session_state.admin_ok = True
+    rows = caches.report()
+    lines = ["| Cache | Entries | Hit rate | Hits / misses | Evictions | Memory (est.) |",
+             "| --- | --- | --- | --- | --- | --- |"]
+    for r in rows:
+        lines.append(
+            f"| {r['name']} | {r['entries']} / {r['max_entries']} | {r['hit_rate']:.0%} | "
+            f"{r['hits']} / {r['misses']} | {r['evictions']} | {_fmt_bytes(r['bytes'])} / {_fmt_bytes(r['max_bytes'])} |"
+        )
+    st.markdown("### 🧰 Caches")
+    st.markdown("\n".join(lines))
+    clearable = [r['name'] for r in rows if r['clearable']]
+    for col, name in zip(st.columns(len(clearable) or 1), clearable):
+        col.button(f"🗑️ {name}", key=f"clear_cache_{name}", on_click=clear_cache, args=(name,))
+    render_memory_report({'catalogue': (catalogue, alt_graph)})
+    if 'profile' in st.query_params and 'profile_reruns' not in st.session_state:
+        st.session_state.profile_reruns = True
+    col_a, col_b = st.columns(2)
+    profiling_on = st.session_state.get('profile_reruns', False)
+    col_a.button(f"🔬 Profile my reruns: {'on' if profiling_on else 'off'}", key="profile_toggle", on_click=toggle_profiling)
+    col_b.button("← App", key="admin_back", on_click=leave_admin)
+    render_hot_spots()
+    if STATIC_EXPORT_DIR and st.button("📦 Static export", key="static_export"):
+        with st.spinner("⏳ Exporting..."):
+            done = export_static(snapshot_version, catalogue, alt_graph)
+        st.markdown(f"`{STATIC_EXPORT_DIR}`: {done or 'another export is running, try again shortly'}")
+    stop()
+
+if 'admin' in st.query_params:
+    render_cache_admin()
 
 # ---------- Offer Banner ----------
 if OFFER_ENABLED and OFFER_TEXT:
@@ -657,10 +881,13 @@ if OFFER_ENABLED and OFFER_TEXT:
 st.markdown('<div class="sticky-top">', unsafe_allow_html=True)
 st.markdown('<h1 class="title">Jyoti Cards Stock Status</h1>', unsafe_allow_html=True)
 
-last_update_time = safe_file_mtime(stk_sum_file)
+# time of the stock file the served table was built from, not the file's current mtime
+stk_mtime = snapshot_version[0][0]
+last_update_time = datetime.datetime.fromtimestamp(stk_mtime, tz) if stk_mtime else None
 if last_update_time:
+    refreshing = ' · 🔄 नया डेटा लोड हो रहा है' if master_source().status()['stale'] else ''
     st.markdown(
-        f'<div class="last-panel">Last Updated: <b>{last_update_time.strftime("%d-%m-%Y %H:%M")}</b></div>',
+        f'<div class="last-panel">Last Updated: <b>{last_update_time.strftime("%d-%m-%Y %H:%M")}</b>{refreshing}</div>',
         unsafe_allow_html=True
     )
 
@@ -669,24 +896,76 @@ st.markdown('<div class="search-wrap">', unsafe_allow_html=True)
 # Search with reload button
 col1, col2 = st.columns([5, 1])
 with col1:
-    item_no = st.text_input(
+    item_no = canonical_query(st.text_input(
         "Search",
         value="",
         placeholder="🔍 कृपया आइटम नंबर यहाँ डालें",
         label_visibility="collapsed",
         key="item_no"
-    ).strip().replace(".0", "")
+    )).replace(".0", "")
 
 with col2:
-    if st.button("🔄", help="Reload data"):
-        build_master_df.clear()
-        get_image_path.clear()
-        st.rerun()
+    st.button("🔄", help="Reload data", on_click=request_reload)
 
 st.markdown('</div></div>', unsafe_allow_html=True)
 
+STATUS_BADGES = {
+    'In Stock': '<div class="status-badge status-in">✅ यह आइटम स्टॉक में उपलब्ध है</div>',
+    'Out of Stock': '<div class="status-badge status-out">❌ यह आइटम स्टॉक में उपलब्ध नहीं है</div>',
+    'Low Stock': '<div class="status-badge status-low">⚠️ यह आइटम कम स्टॉक में है</div>',
+}
+ALT_BADGES = {
+    'In Stock': '<span class="badge badge-in">In Stock</span>',
+    'Low Stock': '<span class="badge badge-low">Low Stock</span>',
+    'Out of Stock': '<span class="badge badge-out">Out of Stock</span>',
+    None: '<span class="badge badge-unk">Unknown</span>',
+}
+
+def fragment(kind: str, item: str, build) -> str:
+    cache = fragment_cache()
+    html = cache.get(snapshot_version, (kind, item))
+    if html is None:
+        html = build()
+        cache.put(snapshot_version, (kind, item), html)
+    return html
+
+def item_card_html(item: str, stock_status: str) -> str:
+    return (
+        f'<div class="item-caption">आइटम नंबर: <b style="font-size: 1.3rem;">{item}</b></div>'
+        f'<div class="status-container">{STATUS_BADGES[stock_status]}</div>'
+    )
+
+def alt_card_html(alt_item: str, alt_status) -> str:
+    return f'''
+        <div class="alt-body">
+            <div style="display: flex; align-items: center; justify-content: space-between;">
+                <div style="font-weight: 700; font-size: 1.1rem; color: #1e293b;">{alt_item}</div>
+                {ALT_BADGES[alt_status]}
+            </div>
+        </div>
+    '''
+
+@st.cache_resource
+def search_log() -> analytics.SearchLog | None:
+    """Process-wide search analytics writer (None when ANALYTICS_DB is empty)."""
+    return analytics.SearchLog(ANALYTICS_DB) if ANALYTICS_DB else None
+
+def log_search(query: str, item: str, stock_status: str | None, started: float):
+    """Record each distinct search once per session (widget reruns repeat the same query)."""
+    log = search_log()
+    if log is None or st.session_state.get('last_logged_search') == query:
+        return
+    st.session_state.last_logged_search = query
+    log.record(
+        "2", query, 'sku' if stock_status else 'none',
+        sku=item if stock_status else "",
+        status=stock_status,
+        latency_ms=(time.perf_counter() - started) * 1000,
+    )
+
 # ---------- Main Content ----------
 if item_no:
+    search_started = time.perf_counter()
     clean_item = as_clean_item_no(item_no)
     
     # Add to search history
@@ -694,95 +973,53 @@ if item_no:
         st.session_state.search_history.insert(0, clean_item)
         st.session_state.search_history = st.session_state.search_history[:5]  # Keep last 5
     
-    item_row = master_df[master_df['ITEM NO.'] == clean_item]
+    with metrics.span("lookup"):
+        item_row = catalogue.find_sku(clean_item) if clean_item else None
+    total, by_name = 0, []
+    if item_row is None and any(ch.isalpha() for ch in item_no):
+        # not an item number: match the stock file's labels, typed in Devanagari or romanized
+        with metrics.span("phonetic"):
+            total, by_name = catalogue.phonetic_matches(item_no, 6)
 
-    st.markdown('<div class="card">', unsafe_allow_html=True)
+    with st.container(key="card-item"):
+        if item_row is not None:
+            stock_status, percentage = get_stock_status(item_row['quantity'], item_row['reorder_level'])
 
-    if not item_row.empty:
-        quantity = pd.to_numeric(item_row['Quantity'].values[0], errors='coerce')
-        condition_value = pd.to_numeric(item_row['CONDITION'].values[0], errors='coerce') if 'CONDITION' in item_row.columns else float('nan')
-        stock_status, percentage = get_stock_status(quantity, condition_value)
-        
-        # Item Header
-        st.markdown(f'<div class="item-caption">आइटम नंबर: <b style="font-size: 1.3rem;">{clean_item}</b></div>', unsafe_allow_html=True)
-        
-        # Status Badge
-        st.markdown('<div class="status-container">', unsafe_allow_html=True)
-        
-        if stock_status == 'In Stock':
-            st.markdown('<div class="status-badge status-in">✅ यह आइटम स्टॉक में उपलब्ध है</div>', unsafe_allow_html=True)
-        elif stock_status == 'Out of Stock':
-            st.markdown('<div class="status-badge status-out">❌ यह आइटम स्टॉक में उपलब्ध नहीं है</div>', unsafe_allow_html=True)
-        else:  # Low Stock
-            st.markdown('<div class="status-badge status-low">⚠️ यह आइटम कम स्टॉक में है</div>', unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Image
-        img_path = get_image_path(clean_item)
-        if img_path:
-            st.markdown('<div class="img-container">', unsafe_allow_html=True)
-            st.image(img_path, use_container_width=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<p style="text-align: center; color: #94a3b8; padding: 40px 0;">📷 इस आइटम के लिए कोई छवि उपलब्ध नहीं है</p>', unsafe_allow_html=True)
-        
-        # Alternatives (only when out of stock or low stock)
-        if stock_status in ['Out of Stock', 'Low Stock']:
-            alt_row = alt_df[alt_df['ITEM NO.'] == clean_item]
-            if not alt_row.empty:
-                alts = [as_clean_item_no(alt_row.iloc[0].get(f'Alt{i}', '')) for i in [1, 2, 3]]
-                alts = [a for a in alts if a]
-                if alts:
+            # Item header + status badge in one element
+            st.markdown(fragment('card', clean_item, lambda: item_card_html(clean_item, stock_status)), unsafe_allow_html=True)
+
+            # Image
+            img_path = resolve_image(clean_item)
+            if not (img_path and show_image(img_path)):
+                st.markdown('<p style="text-align: center; color: #94a3b8; padding: 40px 0;">📷 इस आइटम के लिए कोई छवि उपलब्ध नहीं है</p>', unsafe_allow_html=True)
+
+            # Alternatives (only when out of stock or low stock): precomputed, out of stock ones
+            # replaced by their own alternates up to ALT_DEPTH hops
+            if stock_status in ['Out of Stock', 'Low Stock']:
+                with metrics.span("alternatives"):
+                    shown = []
+                    for alt_item, _, alt_status in alt_graph.get(clean_item, ()):
+                        alt_img = resolve_image(alt_item)
+                        if alt_status is None and not alt_img:
+                            continue  # not in the stock file and no photo
+                        shown.append((alt_item, alt_img, alt_status))
+
+                if shown:
                     st.markdown("<h3 style='margin-top: 30px;'>🔄 विकल्प</h3>", unsafe_allow_html=True)
-                    st.markdown('<div class="alt-grid">', unsafe_allow_html=True)
-                    
-                    for alt_item in alts[:3]:
-                        alt_master_row = master_df[master_df['ITEM NO.'] == alt_item]
-                        alt_img = get_image_path(alt_item)
-
-                        # Skip if alternate item is out of stock
-                        if not alt_master_row.empty:
-                            alt_qty = pd.to_numeric(alt_master_row['Quantity'].values[0], errors='coerce')
-                            alt_cond = pd.to_numeric(alt_master_row['CONDITION'].values[0], errors='coerce') if 'CONDITION' in alt_master_row.columns else float('nan')
-                            alt_status, _ = get_stock_status(alt_qty, alt_cond)
-                            if alt_status == 'Out of Stock':
-                                continue  # Don't show out of stock alternates
-                            
-                            # Set badge based on status
-                            if alt_status == 'In Stock':
-                                badge_html = '<span class="badge badge-in">In Stock</span>'
-                            elif alt_status == 'Low Stock':
-                                badge_html = '<span class="badge badge-low">Low Stock</span>'
-                            else:
-                                badge_html = '<span class="badge badge-out">Out of Stock</span>'
-                        else:
-                            badge_html = '<span class="badge badge-unk">Unknown</span>'
-
-                        if alt_master_row.empty and not alt_img:
-                            continue
-
-                        st.markdown('<div class="alt-card">', unsafe_allow_html=True)
-                        if alt_img:
-                            st.image(alt_img, use_container_width=True)
-                        else:
-                            st.markdown('<div style="height: 200px; display: flex; align-items: center; justify-content: center; background: #f1f5f9; color: #94a3b8;">No Image</div>', unsafe_allow_html=True)
-                        
-                        st.markdown(f'''
-                            <div class="alt-body">
-                                <div style="display: flex; align-items: center; justify-content: space-between;">
-                                    <div style="font-weight: 700; font-size: 1.1rem; color: #1e293b;">{alt_item}</div>
-                                    {badge_html}
-                                </div>
-                            </div>
-                        ''', unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<p style="text-align: center; color: #ef4444; font-size: 1.1rem; padding: 40px 0;">❌ मुख्य आइटम उपलब्ध नहीं है</p>', unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
+                    for i, (col, (alt_item, alt_img, alt_status)) in enumerate(zip(st.columns(len(shown)), shown)):
+                        with col, st.container(key=f"alt-card-{i}"):
+                            if not (alt_img and show_image(alt_img)):
+                                st.markdown('<div style="height: 200px; display: flex; align-items: center; justify-content: center; background: #f1f5f9; color: #94a3b8;">No Image</div>', unsafe_allow_html=True)
+                            st.markdown(fragment('alt', alt_item, lambda: alt_card_html(alt_item, alt_status)), unsafe_allow_html=True)
+        elif by_name:
+            st.markdown(f"<h3>🔎 नाम से मिले आइटम ({total})</h3>", unsafe_allow_html=True)
+            for row in by_name:
+                row_status = get_stock_status(row['quantity'], row['reorder_level'])[0]
+                st.markdown(fragment('alt', row['sku'], lambda: alt_card_html(row['sku'], row_status)), unsafe_allow_html=True)
+        else:
+            st.markdown('<p style="text-align: center; color: #ef4444; font-size: 1.1rem; padding: 40px 0;">❌ मुख्य आइटम उपलब्ध नहीं है</p>', unsafe_allow_html=True)
+
+    log_search(item_no, clean_item, None if item_row is None else stock_status, search_started)
 
 # Search History
 elif len(st.session_state.search_history) > 0:
@@ -792,7 +1029,7 @@ elif len(st.session_state.search_history) > 0:
     for hist_item in st.session_state.search_history:
         if st.button(f"#{hist_item}", key=f"hist_{hist_item}"):
             st.query_params["item"] = hist_item
-            st.rerun()
+            rerun()
     st.markdown('</div></div>', unsafe_allow_html=True)
 
 # ---------- Footer ----------
@@ -835,3 +1072,7 @@ if logo_b64:
 
 st.markdown('<p style="text-align:center; color: #94a3b8; font-size: 0.85rem; margin: 20px 0;">Powered by Jyoti Cards © 2026</p>', unsafe_allow_html=True)
 
+if 'memory_key' not in st.session_state:
+    st.session_state.memory_key = secrets.token_hex(8)
+memory.note_session(st.session_state.memory_key, st.session_state.to_dict())
+end_rerun()
@@ -3,14 +3,23 @@ import os
 import datetime
 import pytz
 import base64
-import re
-import sqlite3
+import hmac
+import secrets
 import json
+import threading
+import time
 import urllib.request
 import urllib.error
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from urllib.parse import quote
-from sqlalchemy import create_engine, text
+from stock import analytics, backends, caches, changes, export, fulltext, memory, metrics, profiling, pushdown, restock, snapshot, warmup
+from stock.caches import FileBytesCache, LRUCache, VersionedCache
+from stock.refresh import StaleWhileRevalidate
+from stock.reload import COOLDOWN, FAILED, DirWatch, ReloadGate
+from stock.images import StaticImages, fit_width, img_html
+from stock.rules import as_clean_item_no, find_image_path, get_stock_status
+from stock.search_index import canonical_query
 
 # ---------- Page + Theme ----------
 st.set_page_config(
@@ -22,6 +31,26 @@ st.set_page_config(
     }
 )
 
+metrics.start_server()
+metrics.begin_rerun("app")
+# PROFILE_SAMPLE of reruns, or every rerun of an admin who turned profiling on
+profiling.begin("app", force=st.session_state.get('admin_ok', False) and st.session_state.get('profile_reruns', False))
+
+def end_rerun():
+    """Close this rerun's timing and profile (at the end of the script, or before it is cut short)."""
+    metrics.end_rerun()
+    profiling.end()
+
+def stop():
+    """st.stop() that doesn't leave the rerun's profile running."""
+    end_rerun()
+    st.stop()
+
+def rerun():
+    """st.rerun() that doesn't leave the rerun's profile running."""
+    end_rerun()
+    st.rerun()
+
 # ---------- Constants ----------
 tz = pytz.timezone('Asia/Kolkata')
 DEFAULT_DB_PATHS = [
@@ -35,6 +64,22 @@ phone_number = "07312506986"
 META_ACCESS_TOKEN = os.environ.get("META_ACCESS_TOKEN", "").strip()
 META_PHONE_NUMBER_ID = os.environ.get("META_PHONE_NUMBER_ID", "").strip()
 META_API_VERSION = os.environ.get("META_API_VERSION", "v25.0").strip() or "v25.0"
+QUERY_CACHE_ENTRIES = int(os.environ.get("QUERY_CACHE_ENTRIES", "2048") or 2048)
+QUERY_CACHE_MB = int(os.environ.get("QUERY_CACHE_MB", "32") or 32)
+FRAGMENT_CACHE_MB = int(os.environ.get("FRAGMENT_CACHE_MB", "16") or 16)
+IMAGE_CACHE_MB = int(os.environ.get("IMAGE_CACHE_MB", "64") or 64)
+IMAGE_PATH_CACHE_ENTRIES = int(os.environ.get("IMAGE_PATH_CACHE_ENTRIES", "8192") or 8192)
+# ?admin=1 shows the cache admin view; disabled when unset
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "")
+# set when several Streamlit processes share a host: they memory-map one snapshot file
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "").strip()
+# kept next to ops.db so it survives deploys on the Render disk
+ANALYTICS_DB = os.environ.get("ANALYTICS_DB", os.path.join(os.path.dirname(DB_PATH) or ".", "search_analytics.db")).strip()
+CHANGES_DB = os.environ.get("CHANGES_DB", os.path.join(os.path.dirname(DB_PATH) or ".", "stock_changes.db")).strip()
+# back-in-stock subscriptions and the WhatsApp outbox; the sender needs META_* and CHANGES_DB
+RESTOCK_DB = os.environ.get("RESTOCK_DB", os.path.join(os.path.dirname(DB_PATH) or ".", "restock_queue.db")).strip()
+# static HTML/JSON copy of the catalogue, refreshed after every snapshot build
+STATIC_EXPORT_DIR = os.environ.get("STATIC_EXPORT_DIR", "").strip()
 
 
 def _normalize_wa_number(raw: str) -> str:
@@ -46,7 +91,7 @@ def _normalize_wa_number(raw: str) -> str:
     return digits
 
 
-@st.cache_data(ttl=600)
+@st.cache_data(ttl=600, max_entries=4)
 def _resolve_meta_whatsapp_number(meta_phone_number_id: str, meta_access_token: str, meta_api_version: str) -> str:
     if not meta_phone_number_id or not meta_access_token:
         return ""
@@ -85,26 +130,12 @@ if 'search_history' not in st.session_state:
     st.session_state.search_history = []
 if 'show_success' not in st.session_state:
     st.session_state.show_success = None
+if 'show_error' not in st.session_state:
+    st.session_state.show_error = None
 
 # ---------- Helper Functions ----------
-def db_mtime() -> Optional[datetime.datetime]:
-    if DATABASE_URL:
-        return datetime.datetime.now(tz)
-    try:
-        ts = os.path.getmtime(DB_PATH)
-        return datetime.datetime.fromtimestamp(ts, tz)
-    except Exception:
-        return None
-
-def db_signature() -> tuple[float, int]:
-    if DATABASE_URL:
-        now = datetime.datetime.now(tz)
-        return (float(int(now.timestamp() // 60)), 1)
-    try:
-        stt = os.stat(DB_PATH)
-        return (stt.st_mtime, stt.st_size)
-    except Exception:
-        return (0.0, 0)
+def db_signature() -> tuple:
+    return inventory_backend().signature()
 
 def get_base64_image(image_path: str) -> Optional[str]:
     if not os.path.exists(image_path):
@@ -112,158 +143,365 @@ def get_base64_image(image_path: str) -> Optional[str]:
     with open(image_path, 'rb') as f:
         return base64.b64encode(f.read()).decode()
 
-def as_clean_item_no(x) -> str:
-    if x is None:
-        return ""
-    s = str(x).strip()
-    if not s:
-        return ""
-    m = re.search(r'(\d+)', s)
-    if not m:
-        return s
-    return m.group(1)
-
-def _digits(s: str) -> str:
-    d = "".join(ch for ch in str(s) if ch.isdigit())
-    return d.lstrip('0') or d
+# ---------- Data Pipeline ----------
+@st.cache_resource(show_spinner=False)
+def _pg_engine(url: str):
+    """One pooled engine per DATABASE_URL; sqlalchemy is only imported in Postgres mode."""
+    from sqlalchemy import create_engine
+    return create_engine(url, pool_pre_ping=True)
 
-@st.cache_data(ttl=3600)
-def get_image_path(item_no: str) -> Optional[str]:
-    """Primary: images/{sku}.jpeg; fallback: recursive search by digits."""
-    if not item_no:
-        return None
-    # 1) direct lookup per spec
-    primary = os.path.join('images', f'{item_no}.jpeg')
-    if os.path.exists(primary):
-        return primary
-    for ext in ['jpg', 'png', 'JPG', 'JPEG', 'PNG']:
-        p = os.path.join('images', f'{item_no}.{ext}')
-        if os.path.exists(p):
-            return p
-    want = _digits(item_no)
-    if not want:
-        return None
-    exts = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
-    best, best_score = None, (999, 999999)
-    if os.path.isdir('images'):
-        for root, _, files in os.walk('images'):
-            for fname in files:
-                _, ext = os.path.splitext(fname)
-                if ext not in exts:
-                    continue
-                full = os.path.join(root, fname)
-                name_no_ext = os.path.splitext(fname)[0]
-                name_digits = _digits(name_no_ext)
-                score = None
-                if name_digits == want and name_no_ext == item_no:
-                    score = 0
-                elif name_digits == want:
-                    score = 1
-                elif want and want in _digits(fname):
-                    score = 2
-                if score is not None:
-                    cand = (score, len(full))
-                    if cand < best_score:
-                        best_score, best = cand, full
-    return best
-
-def get_stock_status(quantity, reorder_level):
-    """EXACT rules per spec:
-    - quantity == 0  -> Out of Stock
-    - 0 < qty <= reorder_level -> Low Stock
-    - quantity > reorder_level -> In Stock
-    """
+@st.cache_resource(show_spinner=False)
+def inventory_backend() -> backends.Backend:
+    """Postgres when DATABASE_URL is set, else the SQLite file; one per process."""
+    if DATABASE_URL:
+        return backends.PostgresBackend(_pg_engine(DATABASE_URL), tz)
+    return backends.SqliteBackend(DB_PATH)
+
+def pushdown_db():
+    return inventory_backend().db
+
+@st.cache_resource(show_spinner=False)
+def text_search() -> Optional[fulltext.FullText]:
+    """Ranked name + description search in the DB (FTS5 / tsvector) when TEXT_SEARCH=fulltext and
+    the index is installed (`python -m stock.fulltext --install`); checked once per process."""
+    return fulltext.open_search(pushdown_db())
+
+def build_inventory(sig):
+    """Rows + lookup indexes for one DB signature, shared by every session without copying.
+    With SNAPSHOT_PATH, one file per host is rebuilt once and memory-mapped by every worker.
+    Catalogues past PUSHDOWN_MIN_ROWS (or CATALOGUE_MODE=pushdown) stay in the DB instead."""
+    metrics.cache_miss("inventory")
+    db = pushdown_db()
+    if pushdown.wanted(pushdown.MODE, pushdown.MIN_ROWS, db.count_products):
+        db.check()  # read-only; the schema comes from `python -m stock.pushdown`
+        rows = caches.register("pushdown", pushdown.DbCatalogue(db, sig))
+    else:
+        rows = inventory_backend().load(sig, SNAPSHOT_PATH)
+    if CHANGES_DB:
+        change_feed_worker().submit(record_changes, sig, rows)
+    if STATIC_EXPORT_DIR and not isinstance(rows, pushdown.DbCatalogue):  # a page per product needs the snapshot
+        threading.Thread(target=export_static, args=(sig, rows), name="static-export", daemon=True).start()
+    return rows
+
+@st.cache_resource
+def change_feed_worker() -> ThreadPoolExecutor:
+    """One background writer, so change sets are recorded in snapshot order without holding up the build."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="change-feed")
+
+def record_changes(sig, rows):
+    """Add what changed since the previous snapshot to the stock change feed (CHANGES_DB)."""
     try:
-        q = int(quantity or 0)
+        with metrics.span("change_diff"):
+            if isinstance(rows, pushdown.DbCatalogue):
+                first = rows.stock_state()
+            else:
+                first = {}
+                for r in rows:
+                    sku = as_clean_item_no(r.get('sku'))
+                    if sku and sku not in first:  # first row per SKU, as find_by_sku shows it
+                        first[sku] = (r.get('quantity'), r.get('reorder_level', 0))
+            state = {sku: (get_stock_status(q or 0, level)[0], float(q or 0)) for sku, (q, level) in first.items()}
+            changes.ChangeLog(CHANGES_DB).record(sig, state)
     except Exception:
-        q = 0
+        metrics.count("stock_change_feed_errors_total")
+
+def export_static(sig, rows) -> Optional[dict]:
+    """Rewrite the static pages whose SKU changed (off the build thread, so the new snapshot isn't held up)."""
+    items = {}
+    for r in rows:
+        sku = as_clean_item_no(r.get('sku'))
+        if sku and sku not in items:
+            items[sku] = {
+                'sku': sku,
+                'name': r.get('name'),
+                'category': r.get('category'),
+                'status': get_stock_status(r.get('quantity', 0), r.get('reorder_level', 0))[0],
+                'image': get_image_path(str(r.get('sku') or '').strip()),
+            }
     try:
-        r = int(reorder_level or 0)
+        return export.export(items.values(), STATIC_EXPORT_DIR, sig,
+                             site={'title': 'Jyoti Cards Stock Status', 'whatsapp': wa_order_phone})
     except Exception:
-        r = 0
-    if q <= 0:
-        return 'Out of Stock', 0
-    if q <= r:
-        pct = min(100, int((q / max(r, 1)) * 100))
-        return 'Low Stock', pct
-    return 'In Stock', 100
-
-# ---------- SQLite Data Pipeline ----------
-@st.cache_data(show_spinner=False)
-def load_inventory(_sig):
-    """Load product+inventory rows from DB."""
-    rows_out = []
+        metrics.count("stock_static_export_errors_total")
+        return None
+
+@st.cache_resource
+def inventory_source() -> StaleWhileRevalidate:
+    """Keeps serving the current catalogue while a newer DB signature is built in the background."""
+    return StaleWhileRevalidate(build_inventory)
+
+def load_inventory(sig):
     try:
-        if DATABASE_URL:
-            engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-            query = text(
-                """
-                SELECT p.id,
-                       p.sku,
-                       p.name,
-                       p.website_description AS description,
-                       p.image_path,
-                       p.category,
-                       p.reorder_level,
-                       COALESCE(i.quantity_available, 0) AS quantity
-                FROM products p
-                LEFT JOIN inventory i ON i.product_id = p.id
-                WHERE COALESCE(p.active, TRUE) = TRUE
-                """
-            )
-            with engine.connect() as conn:
-                for r in conn.execute(query).mappings():
-                    rows_out.append(dict(r))
-        else:
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT p.id,
-                       p.sku,
-                       p.name,
-                       p.website_description AS description,
-                       p.image_path,
-                       p.category,
-                       p.reorder_level,
-                       COALESCE(i.quantity_available, 0) AS quantity
-                FROM products p
-                LEFT JOIN inventory i ON i.product_id = p.id
-                WHERE COALESCE(p.active, 1) = 1
-            """)
-            for r in cur.fetchall():
-                rows_out.append(dict(r))
-            conn.close()
+        return inventory_source().get(sig).value
     except Exception as e:
         st.error(f"⚠️ Database error: {e}")
-    return rows_out
+        # unique version so nothing computed against the empty snapshot is reused once the DB is back
+        return snapshot.Snapshot(snapshot.build([], ("unavailable", time.time())))
+
+def served_update_time() -> Optional[datetime.datetime]:
+    """When the data in the served snapshot changed (not the DB file's current mtime)."""
+    served = inventory_source().current
+    if served is None:
+        return None
+    if DATABASE_URL or not served.version[0]:
+        return datetime.datetime.fromtimestamp(served.built_at, tz)
+    return datetime.datetime.fromtimestamp(max(served.version[0::2]), tz)  # DB file and its -wal, if any
 
 def find_by_sku(rows, sku_query):
     """Match by exact SKU (cleaned digits or literal)."""
     if not sku_query:
         return None
-    clean = as_clean_item_no(sku_query)
-    for r in rows:
-        if str(r.get('sku', '')).strip() == sku_query.strip():
-            return r
-        if as_clean_item_no(r.get('sku')) == clean:
-            return r
-    return None
-
-def find_by_name(rows, name_query):
+    return rows.find_sku(as_clean_item_no(sku_query))
+
+def _served_hits(rows, total: int, found: list) -> tuple[int, list]:
+    """Full-text reads the live DB, but results are cached under the served snapshot's version:
+    show each hit as the snapshot has it (first row per SKU) and drop the ones it doesn't have yet."""
+    kept, seen = [], set()
+    for r in found:
+        sku = as_clean_item_no(r.get('sku'))
+        row = rows.find_sku(sku) if sku and sku not in seen else None
+        if row is not None:
+            seen.add(sku)
+            kept.append(row)
+    return max(total - (len(found) - len(kept)), len(kept)), kept
+
+def find_by_name(rows, name_query, limit: int = 10) -> tuple[int, list]:
+    """(total matches, best `limit` of them): full-text over name + description; when that
+    finds nothing, the substring match on the name with the snapshot's phonetic matches
+    (Devanagari and romanized spellings alike) added after it."""
     q = (name_query or '').strip().lower()
     if not q:
-        return []
-    out = []
-    for r in rows:
-        name = str(r.get('name') or '').lower()
-        if q in name:
-            out.append(r)
-    return out
+        return 0, []
+    fts = text_search()
+    if fts is not None:
+        try:
+            with metrics.span("fulltext"):
+                total, found = fts.search(q, limit)
+                if total and not isinstance(rows, pushdown.DbCatalogue):
+                    total, found = _served_hits(rows, total, found)
+            if total:
+                return total, found
+        except Exception:
+            metrics.count("stock_fulltext_errors_total")
+    with metrics.span("phonetic"):
+        total, found = rows.phonetic_matches(q, limit)  # name matches included
+    if total:
+        return total, found
+    return rows.name_matches(q, limit)  # pushdown: no phonetic index
+
+@st.cache_resource
+def image_path_cache() -> LRUCache:
+    """Process-wide SKU -> image path (None when there is no photo), re-checked hourly."""
+    return caches.register("image_path", LRUCache(IMAGE_PATH_CACHE_ENTRIES, ttl=3600))
+
+_NOT_CACHED = object()
+
+def get_image_path(item_no: str) -> Optional[str]:
+    cache = image_path_cache()
+    path = cache.get(item_no, _NOT_CACHED)
+    if path is _NOT_CACHED:
+        metrics.cache_miss("image_path")
+        path = find_image_path(item_no)
+        cache.put(item_no, path)
+    return path
+
+def resolve_image(sku: str) -> Optional[str]:
+    metrics.cache_request("image_path")
+    with metrics.span("image_resolve"):
+        return get_image_path(sku)
+
+@st.cache_resource
+def image_cache() -> FileBytesCache:
+    """Process-wide image bytes keyed by (path, mtime, size), shared by all sessions."""
+    return caches.register("image_bytes", FileBytesCache(max_bytes=IMAGE_CACHE_MB * 1024 * 1024, transform=fit_width))
+
+def image_bytes(path: str) -> Optional[bytes]:
+    cache = image_cache()
+    metrics.cache_request("image_bytes")
+    data = cache.get(path)
+    if data is None:
+        metrics.cache_miss("image_bytes")
+        with metrics.span("image_read"):
+            data = cache.load(path)
+    else:
+        metrics.count("stock_image_bytes_saved_total", len(data))
+    return data
+
+@st.cache_resource
+def static_images() -> Optional[StaticImages]:
+    """Resized photos published under ./static, or None when server.enableStaticServing is off."""
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    return caches.register("image_url", StaticImages(root))
+
+def show_image(path: str) -> bool:
+    """Render the photo at `path`: a stable static URL when served, else bytes through st.image."""
+    images = static_images()
+    if images is not None:
+        with metrics.span("image_url"):
+            url = images.url(path)
+        if url:
+            st.markdown(img_html(url), unsafe_allow_html=True)
+            return True
+    data = image_bytes(path)
+    if data:
+        st.image(data, width="stretch")
+    return bool(data)
+
+def prefetch_image(path: str):
+    """Do the slow part of show_image ahead of the first search (publish the copy, or load the bytes)."""
+    images = static_images()
+    if images is not None:
+        images.url(path)
+    else:
+        image_bytes(path)
+
+def _product_view(row: dict) -> dict:
+    sku = str(row.get('sku') or '').strip()
+    stock_status, percentage = get_stock_status(row.get('quantity', 0), row.get('reorder_level', 0))
+    return {
+        'product': row,
+        'status': stock_status,
+        'percentage': percentage,
+        'image': resolve_image(sku),
+    }
+
+def resolve_query(rows, query: str) -> dict:
+    """Everything the page needs for one search: matched products, their status,
+    in-stock alternatives and image paths. Rows are shared, never mutated."""
+    with metrics.span("lookup"):
+        product = find_by_sku(rows, query)
+        total, by_name = (0, []) if product else find_by_name(rows, query)
+    view = {'match': 'none', 'products': [], 'total': 0, 'alternatives': [], 'suggestions': [], 'completions': []}
+    if product:
+        view['match'] = 'sku'
+        view['products'] = [_product_view(product)]
+        view['total'] = 1
+        if view['products'][0]['status'] in ('Out of Stock', 'Low Stock'):
+            with metrics.span("alternatives"):
+                alts = rows.in_stock(product.get('category'), product.get('sku'), limit=3)
+            view['alternatives'] = [
+                {'product': alt, 'image': resolve_image(str(alt.get('sku') or ''))}
+                for alt in alts
+            ]
+    elif by_name:
+        view['match'] = 'name'
+        view['total'] = total
+        view['products'] = [_product_view(p) for p in by_name]
+    if not product:
+        with metrics.span("complete"):
+            view['completions'] = [_product_view(rows.find_sku(sku)) for sku in rows.prefix.complete(query, limit=6)]
+        if not by_name:
+            with metrics.span("fuzzy_lookup"):
+                close = rows.fuzzy.lookup(query, limit=5)
+            view['suggestions'] = [_product_view(rows.find_sku(sku)) for sku, _ in close]
+    return view
+
+@st.cache_resource
+def query_cache() -> VersionedCache:
+    """Process-wide (snapshot version, query) -> resolved view, shared by all sessions."""
+    return caches.register("query", VersionedCache(QUERY_CACHE_ENTRIES, QUERY_CACHE_MB * 1024 * 1024))
+
+@st.cache_resource
+def fragment_cache() -> VersionedCache:
+    """Pre-rendered card HTML per (snapshot version, product), shared by all sessions."""
+    return caches.register("fragment", VersionedCache(QUERY_CACHE_ENTRIES, FRAGMENT_CACHE_MB * 1024 * 1024))
+
+def cached_resolve(rows, version, query: str) -> dict:
+    key = canonical_query(query)
+    cache = query_cache()
+    metrics.cache_request("query_result")
+    view = cache.get(version, key)
+    if view is None:
+        metrics.cache_miss("query_result")
+        view = resolve_query(rows, key)
+        cache.put(version, key, view)
+    return view
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def warm_snapshot(version, _rows) -> dict:
+    """Build indexes and pre-resolve the most searched SKUs (views + images) once per snapshot."""
+    fallback = (_rows.first_skus(warmup.TOP_N) if isinstance(_rows, pushdown.DbCatalogue)
+                else (str(r.get('sku') or '') for r in _rows))
+    skus = warmup.top_skus(fallback, popular=analytics.popular_skus(ANALYTICS_DB))
+    views = []
+
+    def warm_images():
+        for view in views:
+            for v in view['products'] + view['alternatives']:
+                if v['image']:
+                    prefetch_image(v['image'])
+
+    images_watch()  # baseline for the reload button's "did images change" check
+    return warmup.run([
+        ("whatsapp", lambda: _resolve_meta_whatsapp_number(META_PHONE_NUMBER_ID, META_ACCESS_TOKEN, META_API_VERSION)),
+        ("queries", lambda: views.extend(cached_resolve(_rows, version, sku) for sku in skus)),
+        ("images", warm_images),
+    ])
+
+@st.cache_resource
+def reload_gate() -> ReloadGate:
+    return ReloadGate()
+
+@st.cache_resource
+def images_watch() -> DirWatch:
+    return DirWatch('images')
+
+def reload_all():
+    """Rebuild the snapshot once for every session, then drop what was derived from the old one."""
+    inventory_source().rebuild(db_signature())
+    query_cache().clear()
+    fragment_cache().clear()
+    if images_watch().changed():
+        image_path_cache().clear()
+        image_cache().clear()
+
+def request_reload():
+    """🔄 callback: concurrent clicks share one reload; repeats inside the cooldown do nothing."""
+    gate = reload_gate()
+    outcome = gate.request(reload_all)
+    if outcome == FAILED:
+        st.session_state.show_error = f"⚠️ Database error: {gate.last_error}"
+    elif outcome == COOLDOWN:
+        st.session_state.show_success = f"⏳ डेटा अभी-अभी रीलोड हुआ है, {int(gate.seconds_until_ready()) + 1}s बाद फिर कोशिश करें"
+    else:
+        st.session_state.show_success = "✅ डेटा रीलोड हो गया"
+
+@st.cache_resource
+def restock_queue() -> Optional[restock.RestockQueue]:
+    """Back-in-stock subscriptions (None when RESTOCK_DB or CHANGES_DB is empty)."""
+    return restock.RestockQueue(RESTOCK_DB) if RESTOCK_DB and CHANGES_DB else None
+
+@st.cache_resource
+def restock_notifier() -> Optional[restock.Notifier]:
+    """One background sender per process; claims in the queue keep workers from sending a message twice.
+    None without an approved template (RESTOCK_TEMPLATE): alerts go out long after the 24h service window."""
+    queue = restock_queue()
+    if queue is None or not restock.TEMPLATE or not META_ACCESS_TOKEN or not META_PHONE_NUMBER_ID:
+        return None
+    sender = restock.GraphSender(META_ACCESS_TOKEN, META_PHONE_NUMBER_ID, META_API_VERSION)
+    return restock.Notifier(queue, sender, CHANGES_DB).start()
+
+def subscribe_restock(sku: str):
+    """🔔 callback: remember the dealer's number for this SKU's next back-in-stock change."""
+    phone = _normalize_wa_number(st.session_state.get('restock_phone', ''))
+    if len(phone) < 11:
+        st.session_state.show_success = "⚠️ कृपया सही WhatsApp नंबर डालें"
+        return
+    if restock_queue().subscribe(as_clean_item_no(sku), phone):
+        st.session_state.show_success = f"🔔 {sku} स्टॉक में आते ही आपको WhatsApp पर बताया जाएगा"
+    else:
+        st.session_state.show_success = f"🔔 {sku} के लिए यह नंबर पहले से जुड़ा है"
+    st.session_state.restock_phone = ""
 
 # ---------- Load Data ----------
-with st.spinner('⏳ Loading data...'):
+with st.spinner('⏳ Loading data...'), metrics.span("data_load"):
+    metrics.cache_request("inventory")
     inv_rows = load_inventory(db_signature())
+    snapshot_version = inv_rows.version  # what is served, which may trail the DB while a refresh runs
+    warm_snapshot(snapshot_version, inv_rows)
+    restock_notifier()
 
 # ---------- Modern Styling ----------
 st.markdown("""
@@ -315,7 +553,7 @@ st.markdown("""
         background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white;
         animation: slideDown 0.3s ease-out; box-shadow: 0 4px 12px rgba(16, 185, 129, 0.3);
     }
-    .card {
+    .card, div[class*="st-key-card-"] {
         background: white; border-radius: 20px; padding: 24px; margin: 1.5rem auto;
         max-width: 720px; box-shadow: 0 4px 16px rgba(0, 0, 0, 0.08);
         animation: fadeIn 0.4s ease-out;
@@ -346,12 +584,13 @@ st.markdown("""
     .progress-in { background: linear-gradient(90deg, #10b981, #059669); }
     .progress-low { background: linear-gradient(90deg, #f59e0b, #d97706); }
     .progress-out { background: linear-gradient(90deg, #ef4444, #dc2626); }
-    .img-container {
+    .img-container, div[class*="st-key-card-"] [data-testid="stImage"], .card-img {
         border-radius: 16px; overflow: hidden; margin: 20px 0;
         box-shadow: 0 8px 24px rgba(0, 0, 0, 0.1);
         transition: transform 0.3s ease;
     }
     .img-container:hover { transform: scale(1.02); }
+    .card-img img { width: 100%; display: block; }
     .badge {
         display: inline-block; font-size: 0.8rem; font-weight: 700;
         padding: 4px 10px; border-radius: 8px;
@@ -360,6 +599,7 @@ st.markdown("""
     .badge-low { background: #fef3c7; color: #92400e; }
     .badge-out { background: #fee2e2; color: #991b1b; }
     .badge-unk { background: #e5e7eb; color: #374151; }
+    .alt-order { font-weight: 700; color: #128C7E; text-decoration: none; margin-left: 8px; }
     .sticky-footer {
         position: fixed; bottom: 0; left: 0; right: 0;
         background: rgba(255, 255, 255, 0.98); backdrop-filter: blur(10px);
@@ -389,7 +629,7 @@ st.markdown("""
     .page-bottom-spacer { height: 90px; }
     @media (max-width: 768px) {
         .title { font-size: 1.8em; }
-        .card { padding: 20px; margin: 1rem; }
+        .card, div[class*="st-key-card-"] { padding: 20px; margin: 1rem; }
         .status-badge { font-size: 0.95rem; padding: 12px 18px; }
         .link-btn { min-width: 120px; padding: 12px 20px; font-size: 0.95rem; width: 100%; }
         .footer-inner { flex-direction: column; gap: 10px; }
@@ -401,6 +641,111 @@ st.markdown("""
 if st.session_state.show_success:
     st.markdown(f'<div class="success-msg">{st.session_state.show_success}</div>', unsafe_allow_html=True)
     st.session_state.show_success = None
+if st.session_state.show_error:
+    st.error(st.session_state.show_error)
+    st.session_state.show_error = None
+
+# ---------- Admin: caches ----------
+def _fmt_bytes(n: Optional[int]) -> str:
+    if n is None:
+        return "–"
+    return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
+
+def _fmt_growth(n: Optional[int]) -> str:
+    if n is None:
+        return "–"
+    return ("+" if n >= 0 else "−") + _fmt_bytes(abs(n))
+
+def clear_cache(name: str):
+    if caches.clear(name):
+        st.session_state.show_success = f"🗑️ {name} cache cleared"
+
+def toggle_profiling():
+    st.session_state.profile_reruns = not st.session_state.get('profile_reruns', False)
+
+def leave_admin():
+    del st.query_params['admin']
+
+def render_hot_spots():
+    runs, hot = profiling.top(n=15)
+    if not runs:
+        return
+    lines = ["| Function | ms / rerun (cum.) | ms / rerun (own) | Calls |", "| --- | --- | --- | --- |"]
+    lines += [f"| `{h['function']}` | {h['cumtime_ms']:.1f} | {h['tottime_ms']:.1f} | {h['calls']} |" for h in hot]
+    st.markdown(f"### 🔬 Hot spots ({runs} profiled reruns)")
+    st.markdown("\n".join(lines))
+
+def render_memory_report(snapshots: dict):
+    """RSS, the largest consumers (snapshot, caches, session state) and growth across the last reloads."""
+    rep = memory.report(snapshots)
+    traced = f" · Python (tracemalloc): {_fmt_bytes(rep['traced'])}" if rep['traced'] is not None else ""
+    st.markdown("### 🧠 Memory")
+    st.markdown(f"RSS: **{_fmt_bytes(rep['rss'])}** · peak: {_fmt_bytes(rep['peak_rss'])}{traced}")
+    sessions = rep['sessions']
+    consumers = [(f"snapshot: {r['name']}", r['bytes'], "") for r in rep['snapshots']]
+    consumers += [(f"cache: {r['name']}", r['bytes'], r['entries']) for r in rep['caches']]
+    consumers.append((f"session state ({sessions['count']} sessions)", sessions['bytes'], ""))
+    consumers.sort(key=lambda c: c[1], reverse=True)
+    lines = ["| Consumer | Memory (est.) | Entries |", "| --- | --- | --- |"]
+    lines += [f"| {name} | {_fmt_bytes(size)} | {entries} |" for name, size, entries in consumers]
+    st.markdown("\n".join(lines))
+    if sessions['largest']:
+        big = sessions['largest'][0]
+        st.markdown(f"Largest session: {_fmt_bytes(big['bytes'])} in {big['keys']} keys, mostly `{big['largest_key']}`")
+    builds = rep['builds'][-5:]
+    if builds:
+        lines = ["| Build | Seconds | RSS before → after | Growth since previous build |", "| --- | --- | --- | --- |"]
+        lines += [f"| {b['label']} `{b['version'][:32]}` | {b['seconds']:.2f} | {_fmt_bytes(b['rss_before'])} → "
+                  f"{_fmt_bytes(b['rss_after'])} | {_fmt_growth(b['growth'])} |" for b in builds]
+        st.markdown("\n".join(lines))
+    if builds and builds[-1]['top_growth']:
+        lines = ["| Allocated at | Growth | Objects |", "| --- | --- | --- |"]
+        lines += [f"| `{g['where']}` | {_fmt_growth(g['bytes'])} | {g['count']:+d} |" for g in builds[-1]['top_growth']]
+        st.markdown("Live Python allocations that grew most since the previous build:")
+        st.markdown("\n".join(lines))
+
+def render_cache_admin():
+    """Size, hit rate, evictions and estimated memory of every registered cache, each with a clear button."""
+    if not ADMIN_PASSWORD:
+        st.error("Admin view is disabled (set ADMIN_PASSWORD).")
+        stop()
+    if not st.session_state.get('admin_ok'):
+        password = st.text_input("Admin password", type="password")
+        if not password:
+            stop()
+        if not hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode()):
+            st.error("❌ गलत पासवर्ड")
+            stop()
+        st.session_state.admin_ok = True
+    rows = caches.report()
+    lines = ["| Cache | Entries | Hit rate | Hits / misses | Evictions | Memory (est.) |",
+             "| --- | --- | --- | --- | --- | --- |"]
+    for r in rows:
+        lines.append(
+            f"| {r['name']} | {r['entries']} / {r['max_entries']} | {r['hit_rate']:.0%} | "
+            f"{r['hits']} / {r['misses']} | {r['evictions']} | {_fmt_bytes(r['bytes'])} / {_fmt_bytes(r['max_bytes'])} |"
+        )
+    st.markdown("### 🧰 Caches")
+    st.markdown("\n".join(lines))
+    clearable = [r['name'] for r in rows if r['clearable']]
+    for col, name in zip(st.columns(len(clearable) or 1), clearable):
+        col.button(f"🗑️ {name}", key=f"clear_cache_{name}", on_click=clear_cache, args=(name,))
+    render_memory_report({'inventory': inv_rows} if isinstance(inv_rows, snapshot.Snapshot) else {})
+    if 'profile' in st.query_params and 'profile_reruns' not in st.session_state:
+        st.session_state.profile_reruns = True
+    col_a, col_b = st.columns(2)
+    profiling_on = st.session_state.get('profile_reruns', False)
+    col_a.button(f"🔬 Profile my reruns: {'on' if profiling_on else 'off'}", key="profile_toggle", on_click=toggle_profiling)
+    col_b.button("← App", key="admin_back", on_click=leave_admin)
+    render_hot_spots()
+    if STATIC_EXPORT_DIR and isinstance(inv_rows, snapshot.Snapshot) and st.button("📦 Static export", key="static_export"):
+        with st.spinner("⏳ Exporting..."):
+            done = export_static(snapshot_version, inv_rows)
+        st.markdown(f"`{STATIC_EXPORT_DIR}`: {done or 'another export is running, try again shortly'}")
+    stop()
+
+if 'admin' in st.query_params:
+    render_cache_admin()
 
 # ---------- Offer Banner ----------
 if OFFER_ENABLED and OFFER_TEXT:
@@ -410,10 +755,11 @@ if OFFER_ENABLED and OFFER_TEXT:
 st.markdown('<div class="sticky-top">', unsafe_allow_html=True)
 st.markdown('<h1 class="title">Jyoti Cards Stock Status</h1>', unsafe_allow_html=True)
 
-last_update_time = db_mtime()
+last_update_time = served_update_time()
 if last_update_time:
+    refreshing = ' · 🔄 नया डेटा लोड हो रहा है' if inventory_source().status()['stale'] else ''
     st.markdown(
-        f'<div class="last-panel">Last Updated: <b>{last_update_time.strftime("%d-%m-%Y %H:%M")}</b></div>',
+        f'<div class="last-panel" title="snapshot {snapshot_version}">Last Updated: <b>{last_update_time.strftime("%d-%m-%Y %H:%M")}</b>{refreshing}</div>',
         unsafe_allow_html=True
     )
 
@@ -421,120 +767,179 @@ st.markdown('<div class="search-wrap">', unsafe_allow_html=True)
 
 col1, col2 = st.columns([5, 1])
 with col1:
-    item_no = st.text_input(
+    item_no = canonical_query(st.text_input(
         "Search",
         value="",
         placeholder="🔍 आइटम नंबर या नाम यहाँ डालें",
         label_visibility="collapsed",
         key="item_no"
-    ).strip().replace(".0", "")
+    )).replace(".0", "")
 
 with col2:
-    if st.button("🔄", help="Reload data"):
-        load_inventory.clear()
-        get_image_path.clear()
-        st.rerun()
+    st.button("🔄", help="Reload data", on_click=request_reload)
 
 st.markdown('</div></div>', unsafe_allow_html=True)
 
-def render_product_card(product: dict):
+STATUS_BADGES = {
+    'In Stock': '<div class="status-badge status-in">✅ यह आइटम स्टॉक में उपलब्ध है</div>',
+    'Out of Stock': '<div class="status-badge status-out">❌ यह आइटम स्टॉक में उपलब्ध नहीं है</div>',
+    'Low Stock': '<div class="status-badge status-low">⚠️ यह आइटम कम स्टॉक में है</div>',
+}
+
+def _fragment(kind: str, product: dict, build) -> str:
+    key = (kind, product.get('id'), str(product.get('sku') or '').strip())
+    cache = fragment_cache()
+    html = cache.get(snapshot_version, key)
+    if html is None:
+        html = build()
+        cache.put(snapshot_version, key, html)
+    return html
+
+def _card_html(view: dict) -> str:
+    """Static part of a product card (caption, name, description, badge, progress) as one fragment."""
+    product = view['product']
     sku = str(product.get('sku') or '').strip()
     name = str(product.get('name') or '').strip()
     description = str(product.get('description') or '').strip()
-    quantity = product.get('quantity', 0)
-    reorder_level = product.get('reorder_level', 0)
-    stock_status, percentage = get_stock_status(quantity, reorder_level)
-
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown(
-        f'<div class="item-caption">आइटम नंबर: <b style="font-size: 1.3rem;">{sku}</b></div>',
-        unsafe_allow_html=True
-    )
+    stock_status, percentage = view['status'], view['percentage']
+    prog_cls = 'progress-in' if stock_status == 'In Stock' else ('progress-low' if stock_status == 'Low Stock' else 'progress-out')
+    parts = [f'<div class="item-caption">आइटम नंबर: <b style="font-size: 1.3rem;">{sku}</b></div>']
     if name:
-        st.markdown(f'<div style="color:#1e293b;font-weight:600;margin:6px 0;">{name}</div>', unsafe_allow_html=True)
+        parts.append(f'<div style="color:#1e293b;font-weight:600;margin:6px 0;">{name}</div>')
     if description:
-        st.markdown(f'<div style="color:#64748b;font-size:0.95rem;margin-bottom:10px;">{description}</div>', unsafe_allow_html=True)
-
-    st.markdown('<div class="status-container">', unsafe_allow_html=True)
-    if stock_status == 'In Stock':
-        st.markdown('<div class="status-badge status-in">✅ यह आइटम स्टॉक में उपलब्ध है</div>', unsafe_allow_html=True)
-    elif stock_status == 'Out of Stock':
-        st.markdown('<div class="status-badge status-out">❌ यह आइटम स्टॉक में उपलब्ध नहीं है</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="status-badge status-low">⚠️ यह आइटम कम स्टॉक में है</div>', unsafe_allow_html=True)
-
-    prog_cls = 'progress-in' if stock_status == 'In Stock' else ('progress-low' if stock_status == 'Low Stock' else 'progress-out')
-    st.markdown(
-        f'<div class="progress-container"><div class="progress-bar {prog_cls}" style="width:{percentage}%;"></div></div>',
-        unsafe_allow_html=True
+        parts.append(f'<div style="color:#64748b;font-size:0.95rem;margin-bottom:10px;">{description}</div>')
+    parts.append(
+        f'<div class="status-container">{STATUS_BADGES[stock_status]}'
+        f'<div class="progress-container"><div class="progress-bar {prog_cls}" style="width:{percentage}%;"></div></div>'
+        f'</div>'
+    )
+    return ''.join(parts)
+
+def _alt_html(alt: dict) -> str:
+    alt_sku = str(alt.get('sku') or '')
+    alt_name = str(alt.get('name') or '')
+    wu = f"https://wa.me/{wa_order_phone}?text=" + quote(f"ORDER|SKU:{alt_sku}|QTY:1")
+    return (
+        f'<div><b>{alt_sku}</b> — {alt_name}</div>'
+        f'<div style="margin-top:6px;"><span class="badge badge-in">In Stock</span>'
+        f'<a class="alt-order" href="{wu}" target="_blank">Order Now</a></div>'
     )
-    st.markdown('</div>', unsafe_allow_html=True)
 
-    img_path = get_image_path(sku)
-    if img_path:
-        st.markdown('<div class="img-container">', unsafe_allow_html=True)
-        st.image(img_path, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.markdown(
-            '<p style="text-align: center; color: #94a3b8; padding: 40px 0;">📷 इस आइटम के लिए कोई छवि उपलब्ध नहीं है</p>',
-            unsafe_allow_html=True
-        )
+def render_product_card(view: dict, idx: int = 0):
+    product = view['product']
+    sku = str(product.get('sku') or '').strip()
+    with st.container(key=f"card-{idx}"):
+        st.markdown(_fragment('card', product, lambda: _card_html(view)), unsafe_allow_html=True)
 
-    wa_url = f"https://wa.me/{wa_order_phone}?text=" + quote(f"ORDER|SKU:{sku}|QTY:1")
-    st.link_button("🛒 Order Now via WhatsApp", wa_url, use_container_width=True)
+        if not (view['image'] and show_image(view['image'])):
+            st.markdown(
+                '<p style="text-align: center; color: #94a3b8; padding: 40px 0;">📷 इस आइटम के लिए कोई छवि उपलब्ध नहीं है</p>',
+                unsafe_allow_html=True
+            )
 
-    st.markdown('</div>', unsafe_allow_html=True)
+        wa_url = f"https://wa.me/{wa_order_phone}?text=" + quote(f"ORDER|SKU:{sku}|QTY:1")
+        st.link_button("🛒 Order Now via WhatsApp", wa_url, width="stretch")
+
+def render_restock_subscribe(sku: str):
+    with st.container(key="card-restock"):
+        st.markdown("<h3 style='margin-top: 0;'>🔔 स्टॉक में आने पर WhatsApp पर सूचना पाएं</h3>", unsafe_allow_html=True)
+        col_a, col_b = st.columns([3, 1])
+        with col_a:
+            st.text_input("WhatsApp", placeholder="📱 WhatsApp नंबर", label_visibility="collapsed", key="restock_phone")
+        with col_b:
+            st.button("🔔 बताएं", key="restock_subscribe", on_click=subscribe_restock, args=(sku,))
+
+STATUS_PILLS = {
+    'In Stock': '<span class="badge badge-in">In Stock</span>',
+    'Low Stock': '<span class="badge badge-low">Low Stock</span>',
+    'Out of Stock': '<span class="badge badge-out">Out of Stock</span>',
+}
+
+def _search_for(sku: str):
+    st.session_state.item_no = sku
+
+def render_suggestions(suggestions: list, title: str, key: str):
+    with st.container(key=f"card-{key}"):
+        st.markdown(f"<h3 style='margin-top: 0;'>{title}</h3>", unsafe_allow_html=True)
+        for sv in suggestions:
+            product = sv['product']
+            sku = str(product.get('sku') or '').strip()
+            name = str(product.get('name') or '').strip()
+            col_a, col_b = st.columns([1, 3])
+            with col_a:
+                st.button(f"#{sku}", key=f"{key}_{sku}", on_click=_search_for, args=(sku,))
+            with col_b:
+                st.markdown(f'{STATUS_PILLS[sv["status"]]} {name}', unsafe_allow_html=True)
+
+def render_alternatives(alternatives: list):
+    with st.container(key="card-alternatives"):
+        st.markdown("<h3 style='margin-top: 0;'>🔄 विकल्प (Alternatives)</h3>", unsafe_allow_html=True)
+        for alt_view in alternatives:
+            alt = alt_view['product']
+            col_a, col_b = st.columns([1, 2])
+            with col_a:
+                if alt_view['image']:
+                    show_image(alt_view['image'])
+            with col_b:
+                st.markdown(_fragment('alt', alt, lambda: _alt_html(alt)), unsafe_allow_html=True)
+
+@st.cache_resource
+def search_log() -> Optional[analytics.SearchLog]:
+    """Process-wide search analytics writer (None when ANALYTICS_DB is empty)."""
+    return analytics.SearchLog(ANALYTICS_DB) if ANALYTICS_DB else None
+
+def log_search(query: str, view: dict, started: float):
+    """Record each distinct search once per session (widget reruns repeat the same query)."""
+    log = search_log()
+    if log is None or st.session_state.get('last_logged_search') == query:
+        return
+    st.session_state.last_logged_search = query
+    first = view['products'][0] if view['products'] else None
+    log.record(
+        "app", query, view['match'],
+        sku=as_clean_item_no(first['product'].get('sku')) if view['match'] == 'sku' else "",
+        status=first['status'] if first else None,
+        latency_ms=(time.perf_counter() - started) * 1000,
+    )
 
 # ---------- Main Content ----------
 if item_no:
+    search_started = time.perf_counter()
     clean_item = as_clean_item_no(item_no)
 
     if clean_item and clean_item not in st.session_state.search_history:
         st.session_state.search_history.insert(0, clean_item)
         st.session_state.search_history = st.session_state.search_history[:5]
 
-    product = find_by_sku(inv_rows, item_no)
-
-    if product:
-        render_product_card(product)
-
-        if get_stock_status(product.get('quantity', 0), product.get('reorder_level', 0))[0] in ('Out of Stock', 'Low Stock'):
-            category = product.get('category')
-            alts = [r for r in inv_rows
-                    if r.get('category') == category
-                    and r.get('sku') != product.get('sku')
-                    and get_stock_status(r.get('quantity', 0), r.get('reorder_level', 0))[0] == 'In Stock']
-            if alts:
-                st.markdown('<div class="card">', unsafe_allow_html=True)
-                st.markdown("<h3 style='margin-top: 0;'>🔄 विकल्प (Alternatives)</h3>", unsafe_allow_html=True)
-                for alt in alts[:3]:
-                    alt_sku = str(alt.get('sku') or '')
-                    alt_name = str(alt.get('name') or '')
-                    col_a, col_b = st.columns([1, 2])
-                    with col_a:
-                        ap = get_image_path(alt_sku)
-                        if ap:
-                            st.image(ap, use_container_width=True)
-                    with col_b:
-                        st.markdown(f"**{alt_sku}** — {alt_name}")
-                        st.markdown('<span class="badge badge-in">In Stock</span>', unsafe_allow_html=True)
-                        wu = f"https://wa.me/{wa_order_phone}?text=" + quote(f"ORDER|SKU:{alt_sku}|QTY:1")
-                        st.link_button("Order Now", wu, key=f"alt_order_{alt_sku}")
-                st.markdown('</div>', unsafe_allow_html=True)
+    view = cached_resolve(inv_rows, snapshot_version, item_no)
+
+    if view['completions']:
+        with metrics.span("render"):
+            render_suggestions(view['completions'], "🔎 सुझाव (Suggestions)", "completions")
+
+    if view['match'] == 'sku':
+        with metrics.span("render"):
+            render_product_card(view['products'][0])
+            if view['products'][0]['status'] == 'Out of Stock' and restock_notifier() is not None:
+                render_restock_subscribe(str(view['products'][0]['product'].get('sku') or '').strip())
+
+        if view['alternatives']:
+            with metrics.span("render"):
+                render_alternatives(view['alternatives'])
+    elif view['match'] == 'name':
+        st.markdown(f'<div class="last-panel">Found {view["total"]} match(es) by name</div>', unsafe_allow_html=True)
+        with metrics.span("render"):
+            for idx, p in enumerate(view['products']):
+                render_product_card(p, idx)
     else:
-        by_name = find_by_name(inv_rows, item_no)
-        if by_name:
-            st.markdown(f'<div class="last-panel">Found {len(by_name)} match(es) by name</div>', unsafe_allow_html=True)
-            for p in by_name[:10]:
-                render_product_card(p)
-        else:
-            st.markdown('<div class="card">', unsafe_allow_html=True)
-            st.markdown(
-                '<p style="text-align: center; color: #ef4444; font-size: 1.1rem; padding: 40px 0;">❌ कोई आइटम नहीं मिला</p>',
-                unsafe_allow_html=True
-            )
-            st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown(
+            '<div class="card"><p style="text-align: center; color: #ef4444; font-size: 1.1rem; padding: 40px 0;">❌ कोई आइटम नहीं मिला</p></div>',
+            unsafe_allow_html=True
+        )
+        if view['suggestions']:
+            render_suggestions(view['suggestions'], "🤔 क्या आपका मतलब था? (Did you mean)", "suggestions")
+
+    log_search(item_no, view, search_started)
 
 elif len(st.session_state.search_history) > 0:
     st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -543,7 +948,7 @@ elif len(st.session_state.search_history) > 0:
     for hist_item in st.session_state.search_history:
         if st.button(f"#{hist_item}", key=f"hist_{hist_item}"):
             st.query_params["item"] = hist_item
-            st.rerun()
+            rerun()
     st.markdown('</div></div>', unsafe_allow_html=True)
 
 # ---------- Footer ----------
@@ -583,3 +988,8 @@ if logo_b64:
     )
 
 st.markdown('<p style="text-align:center; color: #94a3b8; font-size: 0.85rem; margin: 20px 0;">Powered by Jyoti Cards © 2026</p>', unsafe_allow_html=True)
+
+if 'memory_key' not in st.session_state:
+    st.session_state.memory_key = secrets.token_hex(8)
+memory.note_session(st.session_state.memory_key, st.session_state.to_dict())
+end_rerun()
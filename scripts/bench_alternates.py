@@ -0,0 +1,53 @@
+"""Alternates graph build time vs catalogue size and depth (should grow linearly with edges).
+
+    python scripts/bench_alternates.py --items 50000,100000,200000 --depth 1,2,3
+
+Synthetic ALTER LIST: every item has up to three alternates, mostly nearby
+item numbers (as in the real list), with a share of items out of stock.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stock import alternates  # noqa: E402
+
+
+def synthetic(n: int, out_share: float, seed: int = 5):
+    rng = random.Random(seed)
+    items = [str(10000 + i) for i in range(n)]
+    status = {it: ("Out of Stock" if rng.random() < out_share else rng.choice(["In Stock", "Low Stock"])) for it in items}
+    edges = {}
+    for i, it in enumerate(items):
+        k = rng.choice([0, 1, 2, 3, 3])
+        if k:
+            edges[it] = [items[min(n - 1, max(0, i + rng.randint(-50, 50)))] for _ in range(k)]
+    return edges, status
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", default="50000,100000,200000")
+    ap.add_argument("--depth", default="1,2,3")
+    ap.add_argument("--out-share", type=float, default=0.4)
+    args = ap.parse_args()
+
+    print(f"{'items':>8s} {'edges':>8s} {'depth':>5s} {'build s':>8s} {'µs/edge':>8s} {'items helped':>13s}")
+    for n in (int(x) for x in args.items.split(",")):
+        edges, status = synthetic(n, args.out_share)
+        n_edges = sum(len(v) for v in edges.values())
+        direct = alternates.build(edges, status, depth=1)
+        for depth in (int(x) for x in args.depth.split(",")):
+            t0 = time.perf_counter()
+            graph = alternates.build(edges, status, depth=depth)
+            secs = time.perf_counter() - t0
+            # items that have no direct in-stock alternate but get one through a deeper hop
+            helped = sum(1 for it in graph if it not in direct)
+            print(f"{n:8d} {n_edges:8d} {depth:5d} {secs:8.2f} {secs / n_edges * 1e6:8.2f} {helped:13d}")
+
+
+if __name__ == "__main__":
+    main()
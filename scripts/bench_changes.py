@@ -0,0 +1,65 @@
+"""Change feed: diff and record time vs catalogue size (should grow linearly).
+
+    python scripts/bench_changes.py --items 100000,200000,400000 --churn 0.02
+
+Synthetic consecutive snapshots where a `--churn` share of SKUs change
+quantity (some crossing into or out of stock) and a few are added/removed.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stock import changes  # noqa: E402
+
+STATUSES = [changes.IN_STOCK, changes.LOW_STOCK, changes.OUT_OF_STOCK]
+
+
+def synthetic(n: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    return {str(10000 + i): (rng.choice(STATUSES), float(rng.randint(0, 500))) for i in range(n)}
+
+
+def churn(state: dict, share: float, seed: int = 11) -> dict:
+    rng = random.Random(seed)
+    new = dict(state)
+    skus = list(state)
+    for sku in rng.sample(skus, int(len(skus) * share)):
+        new[sku] = (rng.choice(STATUSES), float(rng.randint(0, 500)))
+    for sku in rng.sample(skus, max(1, len(skus) // 1000)):
+        new.pop(sku, None)
+    for i in range(max(1, len(skus) // 1000)):
+        new[f"9{i:07d}"] = (changes.IN_STOCK, 10.0)
+    return new
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", default="100000,200000,400000")
+    ap.add_argument("--churn", type=float, default=0.02)
+    args = ap.parse_args()
+
+    print(f"{'items':>8s} {'changes':>8s} {'diff s':>8s} {'µs/item':>8s} {'record s':>9s}")
+    for n in (int(x) for x in args.items.split(",")):
+        old = synthetic(n)
+        new = churn(old, args.churn)
+        t0 = time.perf_counter()
+        changed = changes.diff(old, new)
+        secs = time.perf_counter() - t0
+        with tempfile.TemporaryDirectory() as tmp:
+            log = changes.ChangeLog(os.path.join(tmp, "stock_changes.db"))
+            log.record("v1", old)  # baseline
+            t0 = time.perf_counter()
+            stored = log.record("v2", new)
+            rec = time.perf_counter() - t0
+        assert stored == len(changed)
+        print(f"{n:8d} {len(changed):8d} {secs:8.3f} {secs / n * 1e6:8.2f} {rec:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
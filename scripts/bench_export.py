@@ -0,0 +1,63 @@
+"""Static export: full and incremental generation time, one process vs a pool.
+
+    python scripts/bench_export.py --items 50000 --workers 1,4 --churn 0.01
+
+Each run exports a synthetic catalogue into an empty directory, then exports
+again with a `--churn` share of statuses flipped; the second run should only
+rewrite those pages (and the categories that hold them).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stock import export  # noqa: E402
+
+STATUSES = list(export.STATUS_LABELS)
+
+
+def synthetic(n: int, seed: int = 9) -> list[dict]:
+    rng = random.Random(seed)
+    return [{
+        "sku": str(10000 + i),
+        "name": f"Card {10000 + i}",
+        "category": f"C{rng.randint(1, 40)}",
+        "status": rng.choice(STATUSES),
+        "image": None,
+    } for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=50_000)
+    ap.add_argument("--workers", default="1,4")
+    ap.add_argument("--churn", type=float, default=0.01)
+    args = ap.parse_args()
+
+    items = synthetic(args.items)
+    rng = random.Random(1)
+    changed = [dict(it) for it in items]
+    for it in rng.sample(changed, int(len(changed) * args.churn)):
+        it["status"] = rng.choice([s for s in STATUSES if s != it["status"]])
+
+    print(f"{'workers':>7s} {'full s':>8s} {'pages':>7s} {'incr s':>8s} {'pages':>7s} {'cats':>5s}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        with tempfile.TemporaryDirectory() as out:
+            t0 = time.perf_counter()
+            full = export.export(items, out, "v1", workers=workers)
+            full_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            incr = export.export(changed, out, "v2", workers=workers)
+            incr_s = time.perf_counter() - t0
+            assert len(os.listdir(os.path.join(out, "p"))) == args.items
+        print(f"{workers:7d} {full_s:8.2f} {full['pages_written']:7d} {incr_s:8.2f} {incr['pages_written']:7d} "
+              f"{incr['categories_written']:5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Name search: in-memory snapshot scan and SQL LIKE vs the FTS5 index, on a synthetic catalogue.
+
+    python scripts/bench_fulltext.py --products 100000
+
+For each query prints the number of matches and the median latency of the
+three ways a name search can run. Full-text matches every word as a prefix of
+a word in the name or description, so its counts differ from the substring
+scans (e.g. "foil" only appears in descriptions).
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import synthetic_db  # noqa: E402
+from stock import fulltext, pushdown, snapshot  # noqa: E402
+from bench_pushdown import read_rows  # noqa: E402
+
+QUERIES = ["wedding", "royal box", "shubh viv", "card 2001", "foil satin", "zzzz"]
+
+
+def median_us(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--products", type=int, default=100_000)
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--limit", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "ops.db")
+        synthetic_db.build(db_path, args.products)
+        snap = snapshot.Snapshot(snapshot.build(read_rows(db_path), "bench"))
+        db = pushdown.SqliteDb(db_path)
+        t0 = time.perf_counter()
+        try:
+            fulltext.FullText(db).install()
+        except sqlite3.OperationalError as e:
+            sys.exit(f"this SQLite build has no FTS5: {e}")
+        fts = fulltext.open_search(db, "fulltext")
+        print(f"{args.products} products, FTS5 index built in {time.perf_counter() - t0:.2f}s")
+
+        # the triggers keep the index in step with ops writes
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("UPDATE products SET name = 'Zzzz Trigger Check' WHERE id = 1")
+        conn.close()
+        assert fts.search("zzzz trig")[0] == 1, "FTS index not updated by trigger"
+
+        cat = pushdown.DbCatalogue(db, "bench", cache_entries=1)
+        print(f"{'query':12s} {'snapshot scan':>20s} {'sql LIKE':>20s} {'fts5':>20s}   (matches, median µs)")
+        for q in QUERIES:
+            cols = []
+            for fn in (lambda: snap.name_matches(q, args.limit),
+                       lambda: pushdown.DbCatalogue(db, "bench").name_matches(q, args.limit),
+                       lambda: fts.search(q, args.limit)):
+                total = fn()[0]
+                cols.append(f"{total:7d} {median_us(fn, args.runs):10.0f} µs")
+            print(f"{q:12s} {cols[0]:>20s} {cols[1]:>20s} {cols[2]:>20s}")
+        top = fts.search("royal box", 3)[1]
+        print("\ntop 'royal box':", [r["name"] for r in top])
+        del cat
+
+
+if __name__ == "__main__":
+    main()
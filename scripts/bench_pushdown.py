@@ -0,0 +1,121 @@
+"""Snapshot vs database pushdown on a synthetic catalogue: same answers, latency per lookup.
+
+    python scripts/bench_pushdown.py --products 200000
+
+Builds a synthetic ops.db, loads it both ways and runs the lookups a search
+makes (exact SKU, name match, in-stock alternatives, SKU completion, one-edit
+suggestions) against each, failing if the answers differ. Reports build time,
+per-lookup latency (pushdown with its LRU bypassed) and the row memory that
+pushdown avoids holding.
+"""
+import argparse
+import os
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import synthetic_db  # noqa: E402
+from stock import pushdown, snapshot  # noqa: E402
+from stock.search_index import clean_sku  # noqa: E402
+
+QUERY = """
+    SELECT p.id, p.sku, p.name, p.website_description AS description, p.image_path,
+           p.category, p.reorder_level, COALESCE(i.quantity_available, 0) AS quantity
+    FROM products p LEFT JOIN inventory i ON i.product_id = p.id
+    WHERE COALESCE(p.active, 1) = 1
+"""
+
+
+def read_rows(db_path: str) -> list[dict]:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(r) for r in conn.execute(QUERY)]
+    finally:
+        conn.close()
+
+
+def lookups(cat, skus: list[str], names: list[str], categories: list[str]) -> list:
+    out = []
+    for sku in skus:
+        out.append(("sku", sku, cat.find_sku(clean_sku(sku))))
+        out.append(("complete", sku[:-1], cat.prefix.complete(sku[:-1], limit=6) if sku[:-1].isdigit() else None))
+        out.append(("fuzzy", sku[:-1] + "9", cat.fuzzy.lookup(sku[:-1] + "9", limit=5, max_distance=1)))
+    for name in names:
+        out.append(("name", name, cat.name_matches(name, 10)))
+    for c in categories:
+        out.append(("in_stock", c, cat.in_stock(c, None, 3)))
+    return out
+
+
+def timed(cat, kind: str, args_list: list, n: int) -> float:
+    fn = {
+        "sku": lambda a: cat.find_sku(clean_sku(a)),
+        "name": lambda a: cat.name_matches(a, 10),
+        "in_stock": lambda a: cat.in_stock(a, None, 3),
+        "complete": lambda a: cat.prefix.complete(a, limit=6),
+        "fuzzy": lambda a: cat.fuzzy.lookup(a, limit=5, max_distance=1),
+    }[kind]
+    samples = []
+    for a in args_list[:n]:
+        if isinstance(cat, pushdown.DbCatalogue):
+            cat._cache.clear()
+        t0 = time.perf_counter()
+        fn(a)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--products", type=int, default=200_000)
+    ap.add_argument("--samples", type=int, default=200)
+    args = ap.parse_args()
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "ops.db")
+        synthetic_db.build(db_path, args.products)
+
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t0 = time.perf_counter()
+        snap = snapshot.Snapshot(snapshot.build(read_rows(db_path), "bench"))
+        snap_s = time.perf_counter() - t0
+        snap_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024
+
+        db = pushdown.SqliteDb(db_path)
+        t0 = time.perf_counter()
+        db.migrate()
+        prep_s = time.perf_counter() - t0
+        cat = pushdown.DbCatalogue(db, "bench")
+        print(f"{args.products} products: snapshot build {snap_s:.2f}s (+{snap_mb:.0f} MB peak RSS), "
+              f"pushdown migrate {prep_s:.2f}s (indexes + cleaned SKUs)")
+
+        all_skus = [r["sku"] for r in snap[::max(1, len(snap) // 5000)]]
+        skus = rng.sample(all_skus, min(args.samples, len(all_skus)))
+        names = ["wedding", "royal box", "card 2001", "zzzz", "laser"]
+        categories = sorted({snap.row(i)["category"] for i in range(0, len(snap), 97)})
+        a, b = lookups(snap, skus, names, categories), lookups(cat, skus, names, categories)
+        diffs = [(x, y) for x, y in zip(a, b) if x != y]
+        print(f"parity: {len(a) - len(diffs)}/{len(a)} lookups identical")
+        for x, y in diffs[:5]:
+            print(f"  {x[0]} {x[1]!r}:\n    snapshot {x[2]!r}\n    pushdown {y[2]!r}")
+
+        print(f"{'lookup':10s} {'snapshot':>10s} {'pushdown':>10s}   (median µs)")
+        for kind, sample in (("sku", skus), ("name", names * 20), ("in_stock", categories * 10),
+                             ("complete", [s[:-1] for s in skus]), ("fuzzy", [s[:-1] + "9" for s in skus])):
+            print(f"{kind:10s} {timed(snap, kind, sample, args.samples):10.0f} {timed(cat, kind, sample, args.samples):10.0f}")
+        sys.exit(1 if diffs else 0)
+
+
+if __name__ == "__main__":
+    main()
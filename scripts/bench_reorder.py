@@ -0,0 +1,71 @@
+"""Reorder recommendations: time for a year-scale sales history, checked against a dense pandas reference.
+
+    python scripts/bench_reorder.py --skus 10000 --days 100     # 1M SKU-days
+    python scripts/bench_reorder.py --skus 50000 --days 365
+
+Synthetic history: every SKU has its own Poisson daily rate, and most of
+the slow movers sell nothing on most days, so the history is sparse the way
+real sales are.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from stock import reorder  # noqa: E402
+
+
+def synthetic(skus: int, days: int, seed: int = 7) -> tuple[pd.DataFrame, list[dict]]:
+    rng = np.random.default_rng(seed)
+    rates = rng.gamma(0.6, 4.0, skus)
+    grid = rng.poisson(np.repeat(rates, days)).astype(np.float64)
+    sku_ids = np.repeat(np.arange(skus), days)
+    day = np.tile(np.arange(20000, 20000 + days), skus)
+    sold = grid > 0
+    names = np.array([str(100000 + i) for i in range(skus)], dtype=object)
+    sales = pd.DataFrame({"sku": names[sku_ids[sold]], "day": day[sold], "sold": grid[sold]})
+    rows = [{"sku": s, "quantity": int(q), "reorder_level": int(r)}
+            for s, q, r in zip(names, rng.integers(0, 2000, skus), rng.integers(0, 500, skus))]
+    return sales, rows
+
+
+def reference(sales: pd.DataFrame, days: int) -> pd.DataFrame:
+    """The same figures the slow way: a dense SKU x day table."""
+    dense = sales.pivot_table(index="sku", columns="day", values="sold", aggfunc="sum", fill_value=0)
+    dense = dense.reindex(columns=range(sales["day"].min(), sales["day"].min() + days), fill_value=0)
+    return pd.DataFrame({"sold": dense.sum(axis=1), "mean": dense.mean(axis=1), "std": dense.std(axis=1, ddof=0)})
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--skus", type=int, default=10000)
+    ap.add_argument("--days", type=int, default=100)
+    ap.add_argument("--no-check", action="store_true", help="skip the dense reference (large runs)")
+    args = ap.parse_args()
+
+    sales, rows = synthetic(args.skus, args.days)
+    print(f"{args.skus} SKUs x {args.days} days = {args.skus * args.days:,} SKU-days, {len(sales):,} sales rows")
+
+    t0 = time.perf_counter()
+    stats = reorder.demand(sales, args.days)
+    t1 = time.perf_counter()
+    proposal = reorder.recommend(rows, stats)
+    t2 = time.perf_counter()
+    print(f"demand {t1 - t0:.3f}s, recommend {t2 - t1:.3f}s, total {t2 - t0:.3f}s")
+    print(reorder.summary(proposal, n=3))
+
+    if not args.no_check:
+        ref = reference(sales, args.days)
+        got = stats.set_index("sku").loc[ref.index]
+        for col in ("sold", "mean", "std"):
+            assert np.allclose(got[col], ref[col]), col
+        print(f"matches the dense reference for {len(ref)} SKUs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Back-in-stock sender against a local stub of the WhatsApp Cloud API.
+
+    python scripts/bench_restock.py --subscribers 5000 --skus 200 --rate-limit 0.02 --errors 0.05
+
+The stub answers like the Graph API: mostly 200 with a message id, a share
+of 429s (with Retry-After) or error code 130429, and a share of 503s. Every
+subscriber should get exactly one accepted message however often requests
+are retried, and the sender should finish in a few drain passes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stock import changes, restock  # noqa: E402
+
+
+def stub_server(rate_limit: float, errors: float, latency: float, seed: int = 3):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    accepted = Counter()
+    seen = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _reply(self, status: int, body: dict, headers: dict = None):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.headers.get("Authorization") != "Bearer test-token":
+                return self._reply(401, {"error": {"code": 190, "message": "Invalid OAuth access token"}})
+            time.sleep(latency)
+            with lock:
+                seen["requests"] += 1
+                roll = rng.random()
+            if roll < rate_limit / 2:
+                return self._reply(429, {"error": {"code": 80007, "message": "rate limit"}}, {"Retry-After": "0.2"})
+            if roll < rate_limit:
+                return self._reply(400, {"error": {"code": 130429, "message": "throughput reached"}})
+            if roll < rate_limit + errors:
+                return self._reply(503, {"error": {"code": 2, "message": "service unavailable"}})
+            with lock:
+                accepted[body["biz_opaque_callback_data"]] += 1
+                n = sum(accepted.values())
+            self._reply(200, {"messaging_product": "whatsapp", "messages": [{"id": f"wamid.{n}"}]})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, accepted, seen
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--subscribers", type=int, default=5000)
+    ap.add_argument("--skus", type=int, default=200)
+    ap.add_argument("--rate-limit", type=float, default=0.02)
+    ap.add_argument("--errors", type=float, default=0.05)
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--concurrency", type=int, default=restock.CONCURRENCY)
+    args = ap.parse_args()
+
+    server, accepted, seen = stub_server(args.rate_limit, args.errors, args.latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as tmp:
+        changes_db = os.path.join(tmp, "stock_changes.db")
+        queue = restock.RestockQueue(os.path.join(tmp, "restock_queue.db"))
+        skus = [str(20000 + i) for i in range(args.skus)]
+        log = changes.ChangeLog(changes_db)
+        log.record("v1", {sku: (changes.OUT_OF_STOCK, 0.0) for sku in skus})
+        for i in range(args.subscribers):
+            queue.subscribe(skus[i % len(skus)], f"9198{i:08d}")
+        log.record("v2", {sku: (changes.IN_STOCK, 50.0) for sku in skus})
+
+        queued = queue.enqueue(changes_db)
+        assert queue.enqueue(changes_db) == 0, "restock queued twice"
+        sender = restock.GraphSender("test-token", "123", base_url=base_url)
+        t0 = time.perf_counter()
+        passes = 0
+        while queue.stats().get("pending", 0) + queue.stats().get("sending", 0):
+            passes += 1
+            counts = asyncio.run(restock.drain(queue, sender, concurrency=args.concurrency, max_attempts=50))
+            print(f"pass {passes}: {counts} at {time.perf_counter() - t0:.1f}s")
+            time.sleep(min(2.0, 0.5 * passes))  # let backoff delays come due
+            if passes > 30:
+                break
+        secs = time.perf_counter() - t0
+        stats = queue.stats()
+
+    server.shutdown()
+    dupes = sum(1 for n in accepted.values() if n > 1)
+    print(f"\nqueued {queued}, sent {stats.get('sent', 0)}, failed {stats.get('failed', 0)}, "
+          f"requests {seen['requests']}, duplicates {dupes}")
+    print(f"{secs:.1f}s, {stats.get('sent', 0) / secs:.0f} messages/s at concurrency {args.concurrency}")
+    assert stats.get("sent", 0) == queued == len(accepted) and not dupes
+
+
+if __name__ == "__main__":
+    main()
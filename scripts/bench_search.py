@@ -0,0 +1,75 @@
+"""Micro-benchmark for the per-snapshot search indexes.
+
+    python scripts/bench_search.py --skus 100000 --queries 2000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stock.search_index import FuzzySkuIndex, PrefixIndex  # noqa: E402
+
+
+def typo(sku: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(sku))
+    op = rnd.choice("sdit")
+    if op == "s":
+        return sku[:i] + rnd.choice("0123456789") + sku[i + 1:]
+    if op == "d":
+        return sku[:i] + sku[i + 1:]
+    if op == "i":
+        return sku[:i] + rnd.choice("0123456789") + sku[i:]
+    if i + 1 < len(sku):
+        return sku[:i] + sku[i + 1] + sku[i] + sku[i + 2:]
+    return sku
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--skus", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    skus = [str(1000 + i) for i in range(args.skus)]
+
+    t0 = time.perf_counter()
+    fuzzy = FuzzySkuIndex(skus)
+    print(f"fuzzy build: {time.perf_counter() - t0:.2f}s for {len(fuzzy)} skus, "
+          f"{len(fuzzy._keys) * 8 / 1e6:.1f} MB of keys")
+
+    queries = [typo(rnd.choice(skus), rnd) for _ in range(args.queries)]
+    timings, found = [], 0
+    for q in queries:
+        t = time.perf_counter()
+        found += bool(fuzzy.lookup(q))
+        timings.append((time.perf_counter() - t) * 1000)
+    print(f"fuzzy lookup: p50 {percentile(timings, 0.5):.3f} ms, p99 {percentile(timings, 0.99):.3f} ms, "
+          f"{found}/{len(queries)} with suggestions")
+
+    words = ["wedding", "shagun", "invitation", "royal", "floral", "golden", "kankotri", "card"]
+    t0 = time.perf_counter()
+    prefix = PrefixIndex((sku, f"{rnd.choice(words)} {rnd.choice(words)} {sku}") for sku in skus)
+    print(f"prefix build: {time.perf_counter() - t0:.2f}s")
+
+    prefixes = [rnd.choice(skus)[:rnd.randint(1, 4)] for _ in range(args.queries)]
+    prefixes += [rnd.choice(words)[:rnd.randint(2, 5)] for _ in range(args.queries)]
+    timings = []
+    for q in prefixes:
+        t = time.perf_counter()
+        prefix.complete(q)
+        timings.append((time.perf_counter() - t) * 1e6)
+    print(f"prefix complete: p50 {percentile(timings, 0.5):.1f} us, p99 {percentile(timings, 0.99):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Per-worker memory with N processes: private row lists vs one memory-mapped snapshot.
+
+    python scripts/bench_snapshot.py --products 100000 --workers 4
+
+Each worker loads the catalogue, builds the lookup indexes and touches every
+row (as the app would over time), then reports USS (private) and PSS (its
+share of shared pages) from /proc/self/smaps_rollup while all workers are
+alive. Linux only.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import synthetic_db  # noqa: E402
+from stock import snapshot  # noqa: E402
+from stock.search_index import FuzzySkuIndex, PrefixIndex, clean_sku  # noqa: E402
+
+QUERY = """
+    SELECT p.id, p.sku, p.name, p.website_description AS description, p.image_path,
+           p.category, p.reorder_level, COALESCE(i.quantity_available, 0) AS quantity
+    FROM products p LEFT JOIN inventory i ON i.product_id = p.id
+    WHERE COALESCE(p.active, 1) = 1
+"""
+
+
+def read_rows(db_path: str) -> list[dict]:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(r) for r in conn.execute(QUERY)]
+    finally:
+        conn.close()
+
+
+def memory_kb() -> dict:
+    out = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                out[parts[0].rstrip(":")] = int(parts[1])
+    out["Uss"] = out.pop("Private_Clean") + out.pop("Private_Dirty")
+    return out
+
+
+def worker(mode: str, db_path: str, snap_path: str, barrier, results):
+    base = memory_kb()
+    if mode == "rows":
+        rows = read_rows(db_path)
+        first = {}
+        for r in rows:
+            first.setdefault(clean_sku(r.get("sku")), r)
+        indexes = (first, FuzzySkuIndex(first), PrefixIndex((k, r.get("name")) for k, r in first.items()))
+        touched = sum(len(str(r.get("name"))) for r in rows)
+    else:
+        rows = snapshot.shared(snap_path, "bench", lambda: read_rows(db_path))
+        indexes = (rows.fuzzy, rows.prefix)
+        touched = sum(len(str(r.get("name"))) for r in rows)
+        rows.find_name("zzzz-no-match")
+        for sku in rows.fuzzy.skus[::97]:
+            rows.fuzzy.lookup(sku[:-1] + "0")
+    barrier.wait()
+    mem = memory_kb()
+    results.put((mode, os.getpid(), {k: mem[k] - base.get(k, 0) for k in mem}, touched, len(indexes)))
+    barrier.wait()
+
+
+def run(mode: str, workers: int, db_path: str, snap_path: str) -> list:
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, db_path, snap_path, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--products", type=int, default=100_000)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "ops.db")
+        snap_path = os.path.join(tmp, "inventory.snap")
+        synthetic_db.build(db_path, args.products)
+        rows = read_rows(db_path)
+
+        t0 = time.perf_counter()
+        snapshot.publish(rows, "bench", snap_path)
+        print(f"publish: {time.perf_counter() - t0:.2f}s, {os.path.getsize(snap_path) / 1e6:.1f} MB file")
+        t0 = time.perf_counter()
+        pickle.loads(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+        print(f"st.cache_data-style copy of the row list (old per-rerun cost): {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        for mode in ("rows", "snapshot"):
+            stats = run(mode, args.workers, db_path, snap_path)
+            uss = sum(s[2]["Uss"] for s in stats) / 1024
+            pss = sum(s[2]["Pss"] for s in stats) / 1024
+            print(f"{mode:8s} x{args.workers}: private {uss:7.1f} MB total ({uss / args.workers:6.1f}/worker), "
+                  f"pss {pss:7.1f} MB total")
+
+
+if __name__ == "__main__":
+    main()
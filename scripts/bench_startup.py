@@ -0,0 +1,104 @@
+"""Cold-start import benchmark for app.py and 2.py, based on `python -X importtime`.
+
+Runs each script's module-level imports in a fresh interpreter (several times,
+keeping the median), prints the heaviest top-level imports and fails if a
+module that must stay lazy shows up, or if the total goes over a budget:
+
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 7 --budget-ms 600 --top 15
+
+Default guards: app.py in SQLite mode must not import sqlalchemy or pandas.
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# script -> modules that must not be imported at module level
+FORBIDDEN = {
+    "app.py": ["sqlalchemy", "pandas"],
+    "2.py": ["sqlalchemy"],
+}
+
+
+def module_imports(script: Path) -> str:
+    """Source of the script's top-level import statements (function-local imports are lazy by design)."""
+    tree = ast.parse(script.read_text(encoding="utf-8"))
+    lines = [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(lines)
+
+
+def importtime(code: str) -> dict:
+    """Top-level module -> cumulative import time (us) for one fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import failed:\n{proc.stderr[-2000:]}")
+    out = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        if name.startswith("  "):
+            continue  # nested import, already counted in its parent
+        out[name.strip()] = out.get(name.strip(), 0) + int(cumulative)
+    return out
+
+
+def all_modules(code: str) -> set:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-c", code + "\nimport sys\nprint('\\n'.join(sys.modules))"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return set(proc.stdout.split())
+
+
+def bench(script: str, runs: int, top: int) -> tuple[float, list[str]]:
+    code = module_imports(ROOT / script)
+    startup = set(importtime("pass"))  # site, encodings, ...: paid by every interpreter
+    samples = [{k: v for k, v in importtime(code).items() if k not in startup} for _ in range(runs)]
+    per_module = {name: statistics.median(s.get(name, 0) for s in samples) for name in samples[0]}
+    total_ms = statistics.median(sum(s.values()) for s in samples) / 1000
+
+    print(f"\n{script}: {total_ms:.0f} ms in module-level imports (median of {runs})")
+    for name, us in sorted(per_module.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    loaded = all_modules(code)
+    leaked = [m for m in FORBIDDEN.get(script, []) if m in loaded]
+    return total_ms, leaked
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("scripts", nargs="*", default=["app.py", "2.py"])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--budget-ms", type=float, default=None, help="fail if any script's imports exceed this")
+    args = ap.parse_args()
+
+    failed = False
+    for script in args.scripts:
+        total_ms, leaked = bench(script, max(1, args.runs), args.top)
+        if leaked:
+            print(f"  FAIL: {script} imports {', '.join(leaked)} at module level")
+            failed = True
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            print(f"  FAIL: {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
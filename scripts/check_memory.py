@@ -0,0 +1,99 @@
+"""Reload-cycle leak check: N manual reloads must not keep growing the process.
+
+Runs the app in-process through streamlit.testing's AppTest, in a scratch
+copy of the working tree (app.py on a synthetic ops.db, 2.py on copies of
+its Excel files). Each cycle makes the data look new, clicks 🔄 and runs a
+few searches; after a few warmup cycles, live Python allocations
+(tracemalloc, after a full collection) must stay within a budget:
+
+    python scripts/check_memory.py
+    python scripts/check_memory.py --script 2.py --cycles 30 --budget-mb 1
+
+Exits non-zero when memory grew more than --budget-mb between the end of the
+warmup and the last cycle, printing the lines that grew most.
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import synthetic_db
+
+ROOT = synthetic_db.ROOT
+INPUTS = {"app.py": "ops.db", "2.py": os.path.join("data", "website stock.xlsx")}
+QUERIES = ["1002", "wedding", "zzzz", "1003"]
+
+
+def scratch_tree(tmp: str, script: str, products: int) -> str:
+    """Link everything but data/ into `tmp`; returns the input file whose mtime marks new data."""
+    for name in os.listdir(ROOT):
+        if name not in ("data", ".git") and not name.startswith("."):
+            os.symlink(os.path.join(ROOT, name), os.path.join(tmp, name))
+    shutil.copytree(os.path.join(ROOT, "data"), os.path.join(tmp, "data"))
+    if script == "app.py":
+        synthetic_db.build(os.path.join(tmp, "ops.db"), products=products)
+        os.environ.update(DB_PATH=os.path.join(tmp, "ops.db"), DATABASE_URL="")
+    return os.path.join(tmp, INPUTS[script])
+
+
+def cycle(at, source: str, n: int):
+    stamp = time.time() + n  # a new file signature, so the reload builds a new snapshot
+    os.utime(source, (stamp, stamp))
+    [b for b in at.button if b.label == "🔄"][0].click().run()
+    for q in QUERIES:
+        at.text_input(key="item_no").input(q).run()
+    if at.exception:
+        raise SystemExit(f"cycle {n}: {at.exception[0].message}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--script", choices=sorted(INPUTS), default="app.py")
+    ap.add_argument("--cycles", type=int, default=10)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--budget-mb", type=float, default=2.0)
+    ap.add_argument("--products", type=int, default=2000)
+    args = ap.parse_args()
+
+    tracemalloc.start()
+    os.environ["RELOAD_COOLDOWN_SECONDS"] = "0"
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+    from stock import memory
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = scratch_tree(tmp, args.script, args.products)
+        os.chdir(tmp)
+        try:
+            at = AppTest.from_file(os.path.join(tmp, args.script), default_timeout=120)
+            at.run()
+            traced, baseline = [], None
+            for n in range(args.warmup + args.cycles):
+                cycle(at, source, n)
+                gc.collect()
+                traced.append(tracemalloc.get_traced_memory()[0])
+                if n == args.warmup - 1:
+                    baseline = tracemalloc.take_snapshot()
+                rss = memory.rss()
+                print(f"cycle {n + 1:3d}{' (warmup)' if n < args.warmup else ''}: "
+                      f"python {traced[-1] / 1e6:7.2f} MB, rss {rss / 1e6 if rss else 0:7.1f} MB")
+            grown = tracemalloc.take_snapshot().compare_to(baseline, "lineno")
+        finally:
+            os.chdir(cwd)
+
+    growth = traced[-1] - traced[args.warmup - 1]
+    print(f"\n{args.cycles} reloads after warmup: {growth / 1e6:+.2f} MB of live Python allocations "
+          f"({growth / args.cycles / 1e3:+.1f} KB per reload, budget {args.budget_mb} MB)")
+    for stat in grown[:8]:
+        print(f"  {stat.size_diff / 1e3:+9.1f} KB {stat.count_diff:+7d}  {stat.traceback[0]}")
+    if growth > args.budget_mb * 1e6:
+        raise SystemExit("memory keeps growing across reloads")
+
+
+if __name__ == "__main__":
+    main()
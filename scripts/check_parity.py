@@ -0,0 +1,180 @@
+"""Behavioural parity of the inventory backends and the shared stock rules.
+
+    python scripts/check_parity.py
+    python scripts/check_parity.py --data data
+
+Checks, failing on the first mismatch:
+
+1. rules.get_stock_status against app.py's and 2.py's own copies, as they
+   were before the merge, over a grid of quantities and reorder levels
+   (None, NaN, text, zero, negatives, floats). A zero minimum stock, where
+   2.py's copy raised ZeroDivisionError, is listed, not failed.
+2. ExcelBackend against 2.py's old pandas merge of the same workbooks:
+   same items, quantities, minimum stock and alternates.
+3. The Excel catalogue copied into a SQLite ops.db: SqliteBackend must give
+   every SKU the same status, quantity and in-stock alternatives as
+   ExcelBackend, through the same Snapshot lookups.
+"""
+import argparse
+import math
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import pandas as pd  # noqa: E402
+
+from stock import backends, snapshot  # noqa: E402
+from stock.rules import get_stock_status  # noqa: E402
+
+
+# ---------- The rules as each app had them ----------
+def legacy_app_status(quantity, reorder_level):
+    try:
+        q = int(quantity or 0)
+    except Exception:
+        q = 0
+    try:
+        r = int(reorder_level or 0)
+    except Exception:
+        r = 0
+    if q <= 0:
+        return 'Out of Stock', 0
+    if q <= r:
+        return 'Low Stock', min(100, int((q / max(r, 1)) * 100))
+    return 'In Stock', 100
+
+
+def legacy_excel_status(quantity, condition_value):
+    if pd.isna(quantity) or quantity <= 0:
+        return 'Out of Stock', 0
+    if pd.isna(condition_value):
+        return 'In Stock', 100
+    percentage = min(100, int((quantity / condition_value) * 100))
+    if quantity > condition_value:
+        return 'In Stock', percentage
+    return 'Low Stock', percentage
+
+
+def legacy_item_no(x) -> str:
+    if pd.isna(x):
+        return ""
+    m = re.search(r'(\d+)', str(x).strip())
+    return m.group(1) if m else ""
+
+
+def legacy_master(folder: str) -> pd.DataFrame:
+    """2.py's build_master_df merge, without the graph and side effects."""
+    stk = pd.read_excel(os.path.join(folder, backends.STOCK_FILE), usecols=[0, 2]).iloc[8:].reset_index(drop=True)
+    stk.columns = ['ITEM NO.', 'Quantity']
+    stk['ITEM NO.'] = stk['ITEM NO.'].apply(legacy_item_no)
+    stk['Quantity'] = stk['Quantity'].astype(str).str.replace(' pcs', '', regex=False)
+    stk['Quantity'] = (pd.to_numeric(stk['Quantity'], errors='coerce').fillna(0) * 100).astype(int)
+    alt = pd.read_excel(os.path.join(folder, backends.ALTERNATES_FILE)).iloc[3:].reset_index(drop=True)
+    alt.columns = ['S.NO.', 'ITEM NO.', 'Alt1', 'Alt2', 'Alt3']
+    alt = alt[['ITEM NO.', 'Alt1', 'Alt2', 'Alt3']]
+    for c in alt.columns:
+        alt[c] = alt[c].apply(legacy_item_no)
+    cond = pd.read_excel(os.path.join(folder, backends.CONDITION_FILE), usecols=[1, 3])
+    cond.columns = ['ITEM NO.', 'CONDITION']
+    cond['ITEM NO.'] = cond['ITEM NO.'].apply(legacy_item_no)
+    cond['CONDITION'] = pd.to_numeric(cond['CONDITION'], errors='coerce')
+    keys = set(stk['ITEM NO.']) | set(alt['ITEM NO.']) | set(cond['ITEM NO.'])
+    base = pd.DataFrame({'ITEM NO.': sorted(k for k in keys if k)})
+    master = (base.merge(stk, on='ITEM NO.', how='left')
+              .merge(alt, on='ITEM NO.', how='left')
+              .merge(cond, on='ITEM NO.', how='left'))
+    master['Quantity'] = pd.to_numeric(master['Quantity'], errors='coerce').fillna(0).astype(int)
+    for c in ['Alt1', 'Alt2', 'Alt3']:
+        master[c] = master[c].fillna("").astype(str)
+    return master.drop_duplicates('ITEM NO.')  # the app showed the first row of an item
+
+
+# ---------- Checks ----------
+def check_rules() -> int:
+    quantities = [None, math.nan, "", "abc", "12", -5, 0, 1, 3, 9, 10, 11, 10.0, 10.7, 50, 1000]
+    levels = [None, math.nan, "", "abc", "12", -5, 0, 1, 3, 9, 10, 11, 10.0, 50]  # reorder_level is an INTEGER column
+    for q in quantities:
+        for r in levels:
+            assert get_stock_status(q, r) == legacy_app_status(q, r), (q, r)
+    checked = len(quantities) * len(levels)
+    # what the workbooks hold: whole quantities (pcs x 100) and a minimum stock or NaN
+    quantities = [math.nan, -5, 0, 1, 3, 9, 10, 11, 50, 1000]
+    minimums = [math.nan, 0, 1, 3, 10, 10.0, 12.5, 50]
+    raised = []
+    for q in quantities:
+        for c in minimums:
+            try:
+                old = legacy_excel_status(q, c)
+            except ZeroDivisionError:
+                raised.append(q)
+                continue
+            assert get_stock_status(q, c) == old, (q, c, get_stock_status(q, c), old)
+            checked += 1
+    if raised:
+        print(f"  2.py raised on minimum stock 0 (quantities {raised}); now {get_stock_status(raised[0], 0)}")
+    return checked
+
+
+def check_excel(folder: str) -> list[dict]:
+    rows = backends.ExcelBackend.in_dir(folder).fetch()
+    master = legacy_master(folder)
+    assert [r["sku"] for r in rows] == master["ITEM NO."].tolist(), "items differ"
+    for r, (_, m) in zip(rows, master.iterrows()):
+        assert r["quantity"] == m["Quantity"], (r["sku"], r["quantity"], m["Quantity"])
+        cond = None if pd.isna(m["CONDITION"]) else float(m["CONDITION"])
+        assert r["reorder_level"] == cond, (r["sku"], r["reorder_level"], cond)
+        assert r["alternates"] == [a for a in (m["Alt1"], m["Alt2"], m["Alt3"]) if a], r["sku"]
+        assert get_stock_status(r["quantity"], r["reorder_level"]) == legacy_excel_status(m["Quantity"], m["CONDITION"])
+    return rows
+
+
+def to_sqlite(rows: list[dict], path: str):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE products (id INTEGER PRIMARY KEY, sku TEXT NOT NULL, name TEXT, website_description TEXT,
+                               image_path TEXT, category TEXT, reorder_level INTEGER DEFAULT 0, active INTEGER DEFAULT 1);
+        CREATE TABLE inventory (product_id INTEGER NOT NULL, quantity_available INTEGER DEFAULT 0);
+    """)
+    conn.executemany("INSERT INTO products (id, sku, reorder_level) VALUES (?, ?, ?)",
+                     [(i, r["sku"], r["reorder_level"]) for i, r in enumerate(rows, 1)])
+    conn.executemany("INSERT INTO inventory VALUES (?, ?)", [(i, r["quantity"]) for i, r in enumerate(rows, 1)])
+    conn.commit()
+    conn.close()
+
+
+def check_backends(rows: list[dict]) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "ops.db")
+        to_sqlite(rows, db)
+        sqlite = backends.SqliteBackend(db)
+        a = snapshot.Snapshot(snapshot.build(rows, "excel"))
+        b = sqlite.load(sqlite.signature())
+    assert len(a) == len(b), (len(a), len(b))
+    for r in rows:
+        x, y = a.find_sku(r["sku"]), b.find_sku(r["sku"])
+        assert y is not None, r["sku"]
+        assert get_stock_status(x["quantity"], x["reorder_level"]) == get_stock_status(y["quantity"], y["reorder_level"]), r["sku"]
+        assert x["quantity"] == y["quantity"], r["sku"]
+        assert [s["sku"] for s in a.in_stock(None, r["sku"])] == [s["sku"] for s in b.in_stock(None, r["sku"])], r["sku"]
+    return len(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--data", default=str(ROOT / "data"), help="folder with 2.py's workbooks")
+    args = ap.parse_args()
+
+    print(f"status rules: {check_rules()} cases agree")
+    rows = check_excel(args.data)
+    print(f"excel backend: {len(rows)} items match 2.py's merge")
+    print(f"sqlite backend: {check_backends(rows)} SKUs agree with the excel backend")
+
+
+if __name__ == "__main__":
+    main()
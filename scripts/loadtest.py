@@ -0,0 +1,463 @@
+"""Drive N concurrent simulated dealer sessions through app.py and report rerun latency.
+
+Two modes:
+
+  server   start `streamlit run app.py` on a synthetic ops.db (or attach to --url)
+           and speak Streamlit's websocket protocol directly, one connection per
+           session. This is the realistic mode: it measures the single server
+           process under concurrent reruns and samples its RSS.
+  apptest  run the script in-process through streamlit.testing's AppTest. AppTest
+           swaps a process-global runtime on every run, so reruns are serialised;
+           use it to profile per-rerun cost without a server, not for saturation.
+
+Flows (weighted at random per step): SKU hit, SKU miss that falls through to
+the name search, out-of-stock SKU with alternatives, and a history click.
+
+    python scripts/loadtest.py --sessions 50 --duration 30
+    python scripts/loadtest.py --sweep 1,2,4,8,16,32,64 --duration 15
+    python scripts/loadtest.py --mode apptest --sessions 4 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+import synthetic_db
+
+ROOT = synthetic_db.ROOT
+APP = os.path.join(ROOT, "app.py")
+
+FLOWS = {
+    "sku_hit": 5,
+    "name_search": 2,
+    "out_of_stock": 2,
+    "history": 1,
+}
+
+
+# ---------- Workload ----------
+class Workload:
+    """Queries for each flow, picked from the synthetic catalogue."""
+
+    def __init__(self, rows: list[dict]):
+        by_cat = defaultdict(list)
+        for r in rows:
+            by_cat[r["category"]].append(r)
+        self.in_stock = [r["sku"] for r in rows if r["quantity"] > r["reorder_level"]]
+        self.out_of_stock = [
+            r["sku"] for r in rows
+            if r["quantity"] == 0 and any(o["quantity"] > o["reorder_level"] for o in by_cat[r["category"]])
+        ]
+        self.name_terms = sorted({w.lower() for w in synthetic_db.NAME_WORDS})
+
+    def query(self, flow: str, rng: random.Random) -> str:
+        if flow == "sku_hit":
+            return rng.choice(self.in_stock)
+        if flow == "out_of_stock":
+            return rng.choice(self.out_of_stock)
+        if flow == "name_search":
+            return rng.choice(self.name_terms)
+        raise ValueError(flow)
+
+
+def pick_flow(rng: random.Random) -> str:
+    return rng.choices(list(FLOWS), weights=list(FLOWS.values()))[0]
+
+
+# ---------- Stats ----------
+def percentile(sorted_vals: list[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(pct / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+def summarize(samples: list[tuple], elapsed: float) -> dict:
+    lat = sorted(s[1] for s in samples)
+    out = {
+        "reruns": len(lat),
+        "throughput": len(lat) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(lat, 50) * 1000,
+        "p95_ms": percentile(lat, 95) * 1000,
+        "p99_ms": percentile(lat, 99) * 1000,
+        "by_flow": {},
+    }
+    msgs = [s[2] for s in samples if s[2] is not None]
+    if msgs:
+        out["msgs_per_rerun"] = sum(msgs) / len(msgs)
+        out["kb_per_rerun"] = sum(s[3] for s in samples if s[3] is not None) / len(msgs) / 1024
+    flows = defaultdict(list)
+    for s in samples:
+        flows[s[0]].append(s[1])
+    for flow, vals in sorted(flows.items()):
+        vals.sort()
+        out["by_flow"][flow] = (len(vals), percentile(vals, 50) * 1000, percentile(vals, 95) * 1000)
+    return out
+
+
+def rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.peak = self.last = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.last = rss_kb(self.pid)
+            self.peak = max(self.peak, self.last)
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+        self.last = rss_kb(self.pid) or self.last
+        self.peak = max(self.peak, self.last)
+
+
+# ---------- Server mode ----------
+class WsSession:
+    """One browser tab, speaking BackMsg/ForwardMsg protobufs over the websocket."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.search_id = None
+        self.history_ids = []
+
+    @classmethod
+    async def open(cls, base_url: str):
+        from tornado.websocket import websocket_connect
+        ws_url = base_url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+        conn = await websocket_connect(ws_url, subprotocols=["streamlit"], max_message_size=64 * 1024 * 1024)
+        return cls(conn)
+
+    async def rerun(self, widget_states=()):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        for ws in widget_states:
+            msg.rerun_script.widget_states.widgets.append(ws)
+        t0 = time.perf_counter()
+        await self.conn.write_message(msg.SerializeToString(), binary=True)
+        n_msgs = n_bytes = 0
+        history_ids = []
+        while True:
+            raw = await self.conn.read_message()
+            if raw is None:
+                raise ConnectionError("server closed the websocket")
+            n_msgs += 1
+            n_bytes += len(raw)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                el = fwd.delta.new_element
+                el_kind = el.WhichOneof("type")
+                if el_kind == "text_input" and el.text_input.id.endswith("item_no"):
+                    self.search_id = el.text_input.id
+                elif el_kind == "button" and "hist_" in el.button.id:
+                    history_ids.append(el.button.id)
+            elif kind == "script_finished":
+                if fwd.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+        self.history_ids = history_ids
+        return time.perf_counter() - t0, n_msgs, n_bytes
+
+    def _search_state(self, value: str):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        ws = WidgetState()
+        ws.id = self.search_id
+        ws.string_value = value
+        return ws
+
+    async def search(self, query: str):
+        return await self.rerun([self._search_state(query)])
+
+    async def click_history(self, rng: random.Random):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        await self.rerun([self._search_state("")])
+        if not self.history_ids:
+            return None
+        ws = WidgetState()
+        ws.id = rng.choice(self.history_ids)
+        ws.trigger_value = True
+        return await self.rerun([self._search_state(""), ws])
+
+    def close(self):
+        self.conn.close()
+
+
+async def _server_session(base_url, workload, deadline, seed, samples, errors):
+    rng = random.Random(seed)
+    try:
+        s = await WsSession.open(base_url)
+        await s.rerun()
+    except Exception as e:
+        errors.append(repr(e))
+        return
+    try:
+        while time.perf_counter() < deadline:
+            flow = pick_flow(rng)
+            if flow == "history":
+                res = await s.click_history(rng)
+                if res is None:
+                    continue
+            else:
+                res = await s.search(workload.query(flow, rng))
+            samples.append((flow,) + res)
+    except Exception as e:
+        errors.append(repr(e))
+    finally:
+        s.close()
+
+
+def run_server_level(base_url, workload, sessions, duration, seed):
+    samples, errors = [], []
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[
+            _server_session(base_url, workload, deadline, seed + i, samples, errors)
+            for i in range(sessions)
+        ])
+
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - t0
+    out = summarize(samples, elapsed)
+    out["errors"] = errors
+    out["client_cpu"] = (time.process_time() - cpu0) / elapsed if elapsed else 0.0
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, port: int, extra_env=None) -> subprocess.Popen:
+    env = dict(os.environ, DB_PATH=db_path, DATABASE_URL="")
+    env.update(extra_env or {})
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", APP,
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--server.address", "127.0.0.1",
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    # a file, not a pipe: nobody reads a pipe during the run, and a full 64 KB pipe would stall the server
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    proc.log = log
+    health = f"http://127.0.0.1:{port}/_stcore/health"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited early: {log_tail(proc)}")
+        try:
+            with urllib.request.urlopen(health, timeout=1) as resp:
+                if resp.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"streamlit did not become healthy within 60s: {log_tail(proc)}")
+
+
+def log_tail(proc: subprocess.Popen, size: int = 2000) -> str:
+    """The last `size` bytes the server wrote to stderr."""
+    log = proc.log
+    log.seek(0, os.SEEK_END)
+    log.seek(max(0, log.tell() - size))
+    return log.read().decode(errors="replace")
+
+
+# ---------- AppTest mode ----------
+_APPTEST_LOCK = threading.Lock()
+
+
+def _apptest_session(workload, deadline, seed, samples, errors):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    try:
+        at = AppTest.from_file(APP, default_timeout=60)
+        with _APPTEST_LOCK:
+            at.run()
+        while time.perf_counter() < deadline:
+            flow = pick_flow(rng)
+            with _APPTEST_LOCK:
+                if flow == "history":
+                    at.text_input(key="item_no").input("")
+                    at.run()
+                    hist = [b for b in at.button if str(b.key or "").startswith("hist_")]
+                    if not hist:
+                        continue
+                    rng.choice(hist).click()
+                else:
+                    at.text_input(key="item_no").input(workload.query(flow, rng))
+                t0 = time.perf_counter()
+                at.run()
+                latency = time.perf_counter() - t0
+            if at.exception:
+                errors.append(at.exception[0].message)
+            samples.append((flow, latency, None, None))
+    except Exception as e:
+        errors.append(repr(e))
+
+
+def run_apptest_level(workload, sessions, duration, seed):
+    samples, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_apptest_session, args=(workload, deadline, seed + i, samples, errors))
+        for i in range(sessions)
+    ]
+    sampler = RssSampler(os.getpid())
+    sampler.start()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    sampler.stop()
+    out = summarize(samples, elapsed)
+    out["errors"] = errors
+    out["rss_peak_mb"] = sampler.peak / 1024
+    out["rss_end_mb"] = sampler.last / 1024
+    return out
+
+
+# ---------- Reporting ----------
+def print_level(sessions: int, res: dict):
+    line = (
+        f"sessions={sessions:<4} reruns={res['reruns']:<6} thr={res['throughput']:7.1f}/s  "
+        f"p50={res['p50_ms']:7.1f}ms p95={res['p95_ms']:7.1f}ms p99={res['p99_ms']:7.1f}ms  "
+        f"rss_peak={res.get('rss_peak_mb', 0):6.1f}MB rss_end={res.get('rss_end_mb', 0):6.1f}MB"
+    )
+    if "msgs_per_rerun" in res:
+        line += f"  msgs/rerun={res['msgs_per_rerun']:.1f} kB/rerun={res['kb_per_rerun']:.1f}"
+    print(line)
+    for flow, (n, p50, p95) in res["by_flow"].items():
+        print(f"    {flow:<13} n={n:<6} p50={p50:7.1f}ms p95={p95:7.1f}ms")
+    if res.get("client_cpu", 0) > 0.9:
+        print("    warning: load generator is CPU-bound; numbers understate server capacity")
+    if res["errors"]:
+        print(f"    errors: {len(res['errors'])} (first: {res['errors'][0]})")
+
+
+def find_saturation(levels: list[tuple[int, dict]], min_gain: float = 0.10):
+    """First concurrency whose throughput gain over the previous level is below min_gain."""
+    for (c_prev, prev), (c, cur) in zip(levels, levels[1:]):
+        if prev["throughput"] and cur["throughput"] < prev["throughput"] * (1 + min_gain):
+            return c_prev, prev
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=["server", "apptest"], default="server")
+    ap.add_argument("--sessions", type=int, default=10, help="concurrent sessions (ignored with --sweep)")
+    ap.add_argument("--sweep", default="", help="comma-separated concurrency levels, e.g. 1,2,4,8,16")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    ap.add_argument("--products", type=int, default=2000, help="size of the synthetic catalogue")
+    ap.add_argument("--db", default="", help="existing ops.db to use instead of a synthetic one")
+    ap.add_argument("--url", default="", help="attach to a running server instead of starting one")
+    ap.add_argument("--pid", type=int, default=0, help="server pid for RSS sampling with --url")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="jyoti-loadtest-")
+    db_path = args.db or os.path.join(tmpdir, "ops.db")
+    if args.db:
+        import sqlite3
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        rows = [dict(r) for r in conn.execute(
+            "SELECT p.sku, p.category, p.reorder_level, COALESCE(i.quantity_available, 0) AS quantity "
+            "FROM products p LEFT JOIN inventory i ON i.product_id = p.id")]
+        conn.close()
+    else:
+        rows = synthetic_db.build(db_path, args.products)
+    workload = Workload(rows)
+    levels = [int(x) for x in args.sweep.split(",") if x.strip()] or [args.sessions]
+    print(f"mode={args.mode} products={len(rows)} db={db_path}")
+
+    proc = None
+    results = []
+    try:
+        if args.mode == "apptest":
+            os.environ["DB_PATH"] = db_path
+            os.environ["DATABASE_URL"] = ""
+            os.chdir(ROOT)
+            for c in levels:
+                res = run_apptest_level(workload, c, args.duration, args.seed)
+                print_level(c, res)
+                results.append((c, res))
+        else:
+            if args.url:
+                base_url, pid = args.url, args.pid
+            else:
+                port = _free_port()
+                proc = start_server(db_path, port)
+                base_url, pid = f"http://127.0.0.1:{port}", proc.pid
+            for c in levels:
+                sampler = RssSampler(pid) if pid else None
+                if sampler:
+                    sampler.start()
+                res = run_server_level(base_url, workload, c, args.duration, args.seed)
+                if sampler:
+                    sampler.stop()
+                    res["rss_peak_mb"] = sampler.peak / 1024
+                    res["rss_end_mb"] = sampler.last / 1024
+                print_level(c, res)
+                results.append((c, res))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            if proc.returncode not in (0, -15, None):
+                print(f"server stderr:\n{log_tail(proc)}")
+            proc.log.close()
+
+    if len(results) > 1:
+        sat = find_saturation(results)
+        if sat:
+            c, res = sat
+            print(f"saturation: throughput stops scaling past ~{c} sessions ({res['throughput']:.1f} reruns/s, p95 {res['p95_ms']:.0f}ms)")
+        else:
+            print("saturation: not reached in the tested range")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Build a synthetic ops.db (products + inventory) for load tests and benchmarks.
+
+    python scripts/synthetic_db.py /tmp/ops.db --products 5000
+"""
+import argparse
+import os
+import random
+import sqlite3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NAME_WORDS = [
+    "Wedding", "Shubh Vivah", "Golden", "Royal", "Floral", "Kankotri", "Invitation",
+    "Laser Cut", "Box", "Scroll", "Ganesh", "Peacock", "Velvet", "Designer", "Premium",
+]
+DESC_WORDS = ["foil", "embossed", "handmade", "glitter", "satin", "ribbon", "insert", "envelope"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    sku TEXT NOT NULL,
+    name TEXT,
+    website_description TEXT,
+    image_path TEXT,
+    category TEXT,
+    reorder_level INTEGER DEFAULT 0,
+    active INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    product_id INTEGER NOT NULL,
+    quantity_available INTEGER DEFAULT 0
+);
+"""
+
+
+def image_skus() -> list[str]:
+    """SKUs that have a photo in images/, so image resolution is exercised realistically."""
+    out = []
+    img_dir = os.path.join(ROOT, "images")
+    if os.path.isdir(img_dir):
+        for fname in sorted(os.listdir(img_dir)):
+            stem, ext = os.path.splitext(fname)
+            if ext.lower() in (".jpeg", ".jpg", ".png") and stem.isdigit():
+                out.append(stem)
+    return out
+
+
+def build(path: str, products: int = 2000, categories: int = 20, seed: int = 7) -> list[dict]:
+    """(Re)create `path` and return the generated product rows."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    skus = image_skus()[:products]
+    next_sku = 20000
+    while len(skus) < products:
+        skus.append(str(next_sku))
+        next_sku += 1
+
+    rows = []
+    for i, sku in enumerate(skus, start=1):
+        reorder = rng.choice([5, 10, 20, 50])
+        roll = rng.random()
+        if roll < 0.2:
+            qty = 0
+        elif roll < 0.35:
+            qty = rng.randint(1, reorder)
+        else:
+            qty = rng.randint(reorder + 1, reorder * 20)
+        rows.append({
+            "id": i,
+            "sku": sku,
+            "name": f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} Card {sku}",
+            "description": " ".join(rng.sample(DESC_WORDS, 3)),
+            "category": f"CAT{i % categories:02d}",
+            "reorder_level": reorder,
+            "quantity": qty,
+        })
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO products (id, sku, name, website_description, category, reorder_level, active) "
+            "VALUES (:id, :sku, :name, :description, :category, :reorder_level, 1)",
+            rows,
+        )
+        conn.executemany("INSERT INTO inventory (product_id, quantity_available) VALUES (:id, :quantity)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path")
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--categories", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rows = build(args.path, args.products, args.categories, args.seed)
+    print(f"wrote {len(rows)} products to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
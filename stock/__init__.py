@@ -0,0 +1 @@
+"""Shared helpers for the Jyoti Cards stock apps (app.py and 2.py)."""
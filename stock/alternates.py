@@ -0,0 +1,61 @@
+"""Transitive alternates: substitutes reachable through the ALTER LIST, precomputed per snapshot.
+
+Each item lists up to three alternates, and those have alternates of their
+own. build() walks that graph breadth-first from every item, up to `depth`
+hops, skipping items it has already seen (so cycles end the walk). It keeps
+the first `limit` substitutes that are not out of stock: nearest hop first,
+then ALTER LIST order. Render is then one dict lookup.
+
+Each walk stops after `limit` finds or `depth` hops, so the work per item
+is bounded by the out-degree (3) and depth. The whole build is linear in
+the number of edges.
+
+    ALT_DEPTH=2   1 = only the item's own alternates (the old behaviour)
+"""
+import os
+from typing import Mapping, Optional, Sequence
+
+DEPTH = max(1, int(os.environ.get("ALT_DEPTH", "2") or 2))
+LIMIT = 3
+OUT_OF_STOCK = "Out of Stock"
+
+
+def substitutes(item: str, edges: Mapping[str, Sequence[str]], status: Mapping[str, str],
+                depth: int = DEPTH, limit: int = LIMIT) -> tuple:
+    """((alt, hops, status), ...) for one item, nearest first.
+
+    Alternates missing from the stock file (status None) are only offered as
+    direct alternates, as before; further out nothing vouches for them.
+    """
+    seen = {item}
+    frontier = [item]
+    found = []
+    for hop in range(1, depth + 1):
+        nxt = []
+        for node in frontier:
+            for alt in edges.get(node, ()):
+                if alt in seen:
+                    continue
+                seen.add(alt)
+                nxt.append(alt)
+                alt_status = status.get(alt)
+                if alt_status == OUT_OF_STOCK or (alt_status is None and hop > 1):
+                    continue
+                found.append((alt, hop, alt_status))
+                if len(found) == limit:
+                    return tuple(found)
+        if not nxt:
+            break
+        frontier = nxt
+    return tuple(found)
+
+
+def build(edges: Mapping[str, Sequence[str]], status: Mapping[str, str], depth: int = DEPTH,
+          limit: int = LIMIT, items: Optional[Sequence[str]] = None) -> dict:
+    """item -> substitutes(item) for every item with alternates (or just `items`); empty results are left out."""
+    out = {}
+    for item in (edges if items is None else items):
+        found = substitutes(item, edges, status, depth, limit)
+        if found:
+            out[item] = found
+    return out
@@ -0,0 +1,236 @@
+"""Search analytics: an in-process ring buffer flushed to SQLite off the request thread.
+
+`record()` is an O(1) append; a daemon thread writes the buffer out in one
+transaction every few seconds over a connection it keeps open. If the writer
+falls behind, the ring drops the oldest events (counted in `dropped`) rather
+than slowing a rerun down. Once an hour the same thread deletes events older
+than ANALYTICS_KEEP_DAYS, so the file stops growing.
+
+    ANALYTICS_DB=path/to/search_analytics.db   ("" disables logging)
+    ANALYTICS_FLUSH_SECONDS=2
+    ANALYTICS_KEEP_DAYS=90                     (0 keeps everything)
+
+Reports for warmup/caching, or from the command line:
+
+    python -m stock.analytics data/search_analytics.db --top 20 --days 30
+"""
+import argparse
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger("stock.analytics")
+
+FLUSH_SECONDS = float(os.environ.get("ANALYTICS_FLUSH_SECONDS", "2") or 2)
+KEEP_DAYS = float(os.environ.get("ANALYTICS_KEEP_DAYS", "90") or 0)
+PRUNE_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_events (
+    ts REAL NOT NULL,
+    script TEXT NOT NULL,
+    query TEXT NOT NULL,
+    sku TEXT,
+    outcome TEXT NOT NULL,
+    status TEXT,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_search_events_ts ON search_events (ts);
+"""
+
+COLUMNS = ("ts", "script", "query", "sku", "outcome", "status", "latency_ms")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(str(query or "").split()).lower()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SearchLog:
+    """Ring buffer of search events with a background batch writer."""
+
+    def __init__(self, path: str, capacity: int = 10000, flush_seconds: float = FLUSH_SECONDS,
+                 keep_days: float = KEEP_DAYS):
+        self.path = path
+        self._ring = deque(maxlen=max(1, int(capacity)))
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # the flush thread and the atexit flush share _conn
+        self._conn: Optional[sqlite3.Connection] = None
+        self.flush_seconds = flush_seconds
+        self.keep_days = keep_days
+        self._next_prune = 0.0
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.pruned = 0
+        self._thread = threading.Thread(target=self._run, name="search-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def record(self, script: str, query: str, outcome: str, sku: str = "",
+               status: Optional[str] = None, latency_ms: Optional[float] = None):
+        event = (time.time(), script, normalize_query(query), sku or None, outcome, status,
+                 None if latency_ms is None else round(latency_ms, 3))
+        with self._lock:
+            if len(self._ring) == self._ring.maxlen:
+                self.dropped += 1
+            self._ring.append(event)
+            self.recorded += 1
+
+    def _drain(self) -> list:
+        with self._lock:
+            batch = list(self._ring)
+            self._ring.clear()
+        return batch
+
+    def flush(self) -> int:
+        """Write everything buffered so far in one transaction; returns rows written."""
+        batch = self._drain()
+        if not batch:
+            return 0
+        with self._write_lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO search_events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        batch,
+                    )
+            except sqlite3.Error as e:
+                logger.warning("search log flush failed, %d events lost: %s", len(batch), e)
+                self._close()
+                self.dropped += len(batch)
+                return 0
+        self.written += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    def prune(self, keep_days: Optional[float] = None) -> int:
+        """Delete events older than `keep_days` (default: the log's own); returns rows deleted."""
+        keep_days = self.keep_days if keep_days is None else keep_days
+        if not keep_days or keep_days <= 0:
+            return 0
+        with self._write_lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    n = conn.execute("DELETE FROM search_events WHERE ts < ?",
+                                     (time.time() - keep_days * 86400,)).rowcount
+            except sqlite3.Error as e:
+                logger.warning("search log prune failed: %s", e)
+                self._close()
+                return 0
+        self.pruned += n
+        if n:
+            logger.info("search log: pruned %d events older than %g days", n, keep_days)
+        return n
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = _connect(self.path)
+        return self._conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + PRUNE_SECONDS
+                self.prune()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "buffered": len(self._ring),
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "pruned": self.pruned,
+        }
+
+    # ---------- Reports ----------
+    def top_queries(self, n: int = 20, days: float = 30, outcome: Optional[str] = None) -> list[tuple[str, int]]:
+        return top_queries(self.path, n, days, outcome)
+
+    def popular_skus(self, n: int = 50, days: float = 30) -> list[str]:
+        return popular_skus(self.path, n, days)
+
+
+def _query(path: str, sql: str, params=()) -> list:
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("search log query failed: %s", e)
+        return []
+
+
+def top_queries(path: str, n: int = 20, days: float = 30, outcome: Optional[str] = None) -> list[tuple[str, int]]:
+    """Most frequent normalized queries in the window; outcome="none" gives the unmatched ones."""
+    since = time.time() - days * 86400
+    sql = "SELECT query, COUNT(*) AS c FROM search_events WHERE ts >= ?"
+    params = [since]
+    if outcome:
+        sql += " AND outcome = ?"
+        params.append(outcome)
+    sql += " GROUP BY query ORDER BY c DESC, MAX(ts) DESC LIMIT ?"
+    params.append(int(n))
+    return [(q, c) for q, c in _query(path, sql, params)]
+
+
+def popular_skus(path: str, n: int = 50, days: float = 30) -> list[str]:
+    """SKUs most often shown as an exact hit: what warmup and the caches should keep hot."""
+    since = time.time() - days * 86400
+    rows = _query(
+        path,
+        "SELECT sku FROM search_events WHERE ts >= ? AND sku IS NOT NULL "
+        "GROUP BY sku ORDER BY COUNT(*) DESC, MAX(ts) DESC LIMIT ?",
+        (since, int(n)),
+    )
+    return [r[0] for r in rows]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Popular and unmatched searches.")
+    ap.add_argument("db", nargs="?", default=os.environ.get("ANALYTICS_DB", "data/search_analytics.db"))
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--days", type=float, default=30)
+    args = ap.parse_args()
+
+    print(f"Popular SKUs (last {args.days:g} days):")
+    for sku in popular_skus(args.db, args.top, args.days):
+        print(f"  {sku}")
+    for title, outcome in (("Top queries", None), ("Unmatched queries", "none")):
+        print(f"\n{title}:")
+        for q, c in top_queries(args.db, args.top, args.days, outcome):
+            print(f"  {c:6d}  {q}")
+
+
+if __name__ == "__main__":
+    main()
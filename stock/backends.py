@@ -0,0 +1,219 @@
+"""Inventory sources behind one interface, all producing the same snapshot.Snapshot.
+
+    signature()           cheap value that changes whenever the data may have
+    fetch()               the catalogue as snapshot rows (id, sku, name, description,
+                          image_path, category, reorder_level, quantity)
+    load(version, path)   fetch() built into a Snapshot with its lookup indexes;
+                          with `path`, one memory-mapped file shared by every worker
+
+ExcelBackend reads 2.py's three workbooks. The stock file gives the
+quantity and, as the name, the item's label ("1002 PATRIKA (DCU)"). The ALTER
+LIST gives the alternates (an extra `alternates` key on each row) and PORTAL
+MINIMUM STOCK gives the reorder level. Each workbook is
+parsed once per file signature, so when only the stock file changes, the
+other two are not read again.
+
+SqliteBackend and PostgresBackend run app.py's products x inventory join
+through the pushdown module's connections. SQLite's signature includes the
+-wal file, so a write that is not yet checkpointed still counts. Postgres
+has no file to stat, so it moves on once a minute.
+
+Since every source builds the same indexed Snapshot, the lookups, caches and
+renderers written against it work for all of them. Status, SKU and photo
+rules are in stock.rules.
+
+    python -m stock.backends data             # the Excel workbooks in data/
+    python -m stock.backends /data/ops.db
+"""
+import abc
+import argparse
+import datetime
+import os
+import threading
+from collections import Counter
+from typing import Callable, Optional
+
+from stock import pushdown, snapshot
+from stock.rules import as_clean_item_no, get_stock_status
+
+STOCK_FILE = "website stock.xlsx"
+ALTERNATES_FILE = "ALTER LIST 2026.xlsx"
+CONDITION_FILE = "PORTAL MINIMUM STOCK.xlsx"
+
+_FETCH_SQL = """SELECT {columns}
+FROM products p
+LEFT JOIN inventory i ON i.product_id = p.id
+WHERE {active}"""
+
+
+def file_signature(path: str) -> tuple[float, int]:
+    """(mtime, size), or (0.0, 0) for a missing file."""
+    try:
+        stt = os.stat(path)
+        return (stt.st_mtime, stt.st_size)
+    except OSError:
+        return (0.0, 0)
+
+
+class Backend(abc.ABC):
+    name = "backend"
+
+    @abc.abstractmethod
+    def signature(self) -> tuple:
+        ...
+
+    @abc.abstractmethod
+    def fetch(self) -> list[dict]:
+        ...
+
+    def load(self, version, path: str = "") -> snapshot.Snapshot:
+        if path:
+            return snapshot.shared(path, version, self.fetch)
+        return snapshot.Snapshot(snapshot.build(self.fetch(), version))
+
+
+class SqliteBackend(Backend):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = pushdown.SqliteDb(path)
+
+    def signature(self) -> tuple:
+        wal = file_signature(f"{self.path}-wal")
+        sig = file_signature(self.path)
+        return sig if wal == (0.0, 0) else sig + wal
+
+    def fetch(self) -> list[dict]:
+        return self.db.rows(_FETCH_SQL.format(columns=pushdown.COLUMNS, active=self.db.active), {})
+
+
+class PostgresBackend(Backend):
+    name = "postgres"
+
+    def __init__(self, engine, tz: Optional[datetime.tzinfo] = None):
+        self.db = pushdown.PostgresDb(engine)
+        self.tz = tz
+
+    def signature(self) -> tuple:
+        now = datetime.datetime.now(self.tz)
+        return (float(int(now.timestamp() // 60)), 1)
+
+    def fetch(self) -> list[dict]:
+        return self.db.rows(_FETCH_SQL.format(columns=pushdown.COLUMNS, active=self.db.active), {})
+
+
+def _item_no(x) -> str:
+    """Workbook item number: its digits, or "" for headers, totals and blank cells."""
+    s = as_clean_item_no(x)
+    return s if s.isdigit() else ""
+
+
+class ExcelBackend(Backend):
+    name = "excel"
+
+    def __init__(self, stock_file: str, alternates_file: str, condition_file: str):
+        self.files = {"stock": stock_file, "alternates": alternates_file, "condition": condition_file}
+        self._parsed = {}  # kind -> (file signature, parsed workbook)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def in_dir(cls, folder: str) -> "ExcelBackend":
+        return cls(os.path.join(folder, STOCK_FILE), os.path.join(folder, ALTERNATES_FILE),
+                   os.path.join(folder, CONDITION_FILE))
+
+    def signature(self) -> tuple:
+        return tuple(file_signature(p) for p in self.files.values())
+
+    def _read_stock(self, path: str) -> dict:
+        import pandas as pd
+        df = pd.read_excel(path, usecols=[0, 2])
+        df = df.iloc[8:]  # data starts at row 8
+        out = {}
+        for item, qty in zip(df.iloc[:, 0], df.iloc[:, 1]):
+            label = str(item).strip()
+            item = _item_no(item)
+            if item and item not in out:
+                qty = pd.to_numeric(str(qty).replace(" pcs", ""), errors="coerce")
+                out[item] = (0 if pd.isna(qty) else int(qty * 100), label)
+        return out
+
+    def _read_alternates(self, path: str) -> dict:
+        import pandas as pd
+        df = pd.read_excel(path)
+        df = df.iloc[3:]
+        out = {}
+        for item, *alts in zip(df.iloc[:, 1], df.iloc[:, 2], df.iloc[:, 3], df.iloc[:, 4]):
+            item = _item_no(item)
+            if item and item not in out:
+                out[item] = [a for a in (_item_no(a) for a in alts) if a]
+        return out
+
+    def _read_condition(self, path: str) -> dict:
+        import pandas as pd
+        df = pd.read_excel(path, usecols=[1, 3])
+        out = {}
+        for item, cond in zip(df.iloc[:, 0], df.iloc[:, 1]):
+            item = _item_no(item)
+            if item and item not in out:
+                cond = pd.to_numeric(cond, errors="coerce")
+                out[item] = None if pd.isna(cond) else float(cond)
+        return out
+
+    def _part(self, kind: str, read: Callable[[str], dict]) -> dict:
+        path = self.files[kind]
+        sig = file_signature(path)
+        cached = self._parsed.get(kind)
+        if cached is None or cached[0] != sig:
+            cached = (sig, read(path))
+            self._parsed[kind] = cached
+        return cached[1]
+
+    def fetch(self) -> list[dict]:
+        """One row per item found in any of the workbooks, in item order."""
+        with self._lock:
+            stock = self._part("stock", self._read_stock)
+            alternates = self._part("alternates", self._read_alternates)
+            condition = self._part("condition", self._read_condition)
+        rows = []
+        for item in sorted(set(stock) | set(alternates) | set(condition)):
+            quantity, label = stock.get(item, (0, None))
+            rows.append({
+                "id": None,
+                "sku": item,
+                "name": label,
+                "description": None,
+                "image_path": None,
+                "category": None,
+                "reorder_level": condition.get(item),
+                "quantity": quantity,
+                "alternates": alternates.get(item, []),
+            })
+        return rows
+
+
+def open_backend(source: str) -> Backend:
+    """A folder holds the Excel workbooks, a postgres:// URL is Postgres, anything else a SQLite file."""
+    if source.startswith(("postgres://", "postgresql://", "postgresql+")):
+        from sqlalchemy import create_engine
+        return PostgresBackend(create_engine(source, pool_pre_ping=True))
+    if os.path.isdir(source):
+        return ExcelBackend.in_dir(source)
+    return SqliteBackend(source)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rows and stock status counts from one inventory source.")
+    ap.add_argument("source", help="folder with the Excel workbooks, SQLite file or Postgres URL")
+    args = ap.parse_args()
+
+    backend = open_backend(args.source)
+    rows = backend.fetch()
+    statuses = Counter(get_stock_status(r["quantity"], r["reorder_level"])[0] for r in rows)
+    print(f"{backend.name}: {len(rows)} rows, signature {backend.signature()}")
+    for status, n in statuses.most_common():
+        print(f"  {status:14s} {n}")
+
+
+if __name__ == "__main__":
+    main()
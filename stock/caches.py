@@ -0,0 +1,307 @@
+"""Process-wide, thread-safe caches shared by every Streamlit session.
+
+Every cache is bounded by entries and by (estimated) bytes, evicting least
+recently used first. Caches registered with register() are listed, with their
+stats and a clear button, on the admin view of both apps.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+def approx_size(obj, _seen: Optional[set] = None) -> int:
+    """Rough deep size in bytes of plain data (dicts, lists, tuples, sets, str, bytes, numbers).
+    Objects reachable twice are counted once."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, _seen) + approx_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v, _seen) for v in obj)
+    return size
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and hit/miss counters.
+
+    `max_bytes` caps the summed `sizeof(key, value)` estimate; `ttl` (seconds)
+    makes entries expire so the slow path re-runs now and then.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None, ttl: Optional[float] = None,
+                 sizeof: Callable[[object, object], int] = lambda k, v: approx_size(k) + approx_size(v)):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = None if max_bytes is None else max(0, int(max_bytes))
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data = OrderedDict()   # key -> (value, size, expires)
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, size, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and time.monotonic() >= expires:
+                del self._data[key]
+                self.size -= size
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._sizeof(key, value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._data[key] = (value, size, expires)
+            self.size += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self.size > self.max_bytes):
+                _, (_, dropped, _) = self._data.popitem(last=False)
+                self.size -= dropped
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def items(self) -> list[tuple]:
+        """(key, value) of every unexpired entry, least recently used first; doesn't count as hits."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (v, _, expires) in self._data.items() if expires is None or now < expires]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class VersionedCache:
+    """LRU cache scoped to one inventory snapshot version.
+
+    Entries are only valid for the version they were computed against. When a
+    caller presents a new version the whole generation is swapped out under the
+    lock, so no reader can mix results from two snapshots. Reruns still
+    finishing on the version just replaced bypass the cache for `grace`
+    seconds instead of swapping back to it: a stale-while-revalidate swap
+    would otherwise thrash between the two.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None, grace: float = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._version = None
+        self._previous = None
+        self._swapped_at = 0.0
+        self._lru = LRUCache(max_entries, max_bytes)
+        self.invalidations = 0
+        self.bypassed = 0
+
+    def _generation(self, version) -> Optional[LRUCache]:
+        """The LRU for `version`, or None for the version just replaced (not cached)."""
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if version == self._previous and time.monotonic() - self._swapped_at < self.grace:
+                        self.bypassed += 1
+                        return None
+                    hits, misses, evictions = self._lru.hits, self._lru.misses, self._lru.evictions
+                    self._lru = LRUCache(self.max_entries, self.max_bytes)
+                    # keep lifetime counters across snapshots
+                    self._lru.hits, self._lru.misses, self._lru.evictions = hits, misses, evictions
+                    if self._version is not None:
+                        self.invalidations += 1
+                    self._previous, self._version = self._version, version
+                    self._swapped_at = time.monotonic()
+        return self._lru
+
+    def get(self, version, key, default=None):
+        lru = self._generation(version)
+        return default if lru is None else lru.get(key, default)
+
+    def put(self, version, key, value):
+        lru = self._generation(version)
+        # a newer snapshot may have been installed while the value was computed
+        if lru is not None and self._version == version:
+            lru.put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    @property
+    def version(self):
+        return self._version
+
+    def stats(self) -> dict:
+        out = self._lru.stats()
+        out["version"] = self._version
+        out["invalidations"] = self.invalidations
+        out["bypassed"] = self.bypassed
+        return out
+
+
+class FileBytesCache:
+    """File contents keyed by (path, mtime, size), evicted LRU once over a byte budget.
+
+    A hit costs one stat() instead of a read; replacing a file changes its
+    mtime/size and so its key, and the stale entry ages out. `transform` runs
+    once per load (e.g. downscaling an image) and its output is what is cached.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, transform: Optional[Callable[[bytes], bytes]] = None,
+                 max_entries: int = 4096):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(1, int(max_entries))
+        self.transform = transform
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def _key(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def get(self, path: str) -> Optional[bytes]:
+        """Cached bytes for the file as it is on disk now, or None."""
+        key = self._key(path)
+        with self._lock:
+            data = self._data.get(key) if key else None
+            if data is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(data)
+            return data
+
+    def load(self, path: str) -> Optional[bytes]:
+        """Read (and transform) the file, store it within the budget and return it."""
+        key = self._key(path)
+        if key is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if self.transform is not None:
+            data = self.transform(data)
+        if len(data) > self.max_bytes:
+            return data
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes or len(self._data) > self.max_entries:
+                _, dropped = self._data.popitem(last=False)
+                self.size -= len(dropped)
+                self.evictions += 1
+        return data
+
+    def read(self, path: str) -> Optional[bytes]:
+        data = self.get(path)
+        return data if data is not None else self.load(path)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+# ---------- Registry (admin view) ----------
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register(name: str, cache, clearable: bool = True):
+    """List `cache` (anything with stats(), and clear() if clearable) on the admin view; returns it.
+    Registering a name again replaces the old entry."""
+    with _registry_lock:
+        _registry[name] = (cache, clearable)
+    return cache
+
+
+def report() -> list[dict]:
+    """One stats row per registered cache, sorted by name."""
+    with _registry_lock:
+        items = sorted(_registry.items())
+    rows = []
+    for name, (cache, clearable) in items:
+        row = {"name": name, "clearable": clearable}
+        row.update(cache.stats())
+        rows.append(row)
+    return rows
+
+
+def clear(name: str) -> bool:
+    with _registry_lock:
+        cache, clearable = _registry.get(name, (None, False))
+    if not clearable:
+        return False
+    cache.clear()
+    return True
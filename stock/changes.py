@@ -0,0 +1,232 @@
+"""Stock change feed: what changed between one snapshot and the next.
+
+Every new snapshot's per-SKU (status, quantity) is hash-joined on SKU with
+the previous snapshot's, in O(n). The previous state is kept in the same
+SQLite file, so after a restart the diff is still against the last recorded
+snapshot. Only SKUs whose status or quantity moved are written, as one change
+set under the new snapshot version:
+
+    kind            old status -> new status
+    added/removed   SKU appeared / disappeared (the missing side is NULL)
+    out_of_stock    any -> Out of Stock
+    back_in_stock   Out of Stock -> In Stock / Low Stock
+    low_stock       In Stock -> Low Stock (fell to reorder_level)
+    restocked       Low Stock -> In Stock
+    quantity        same status, quantity changed
+
+    CHANGES_DB=path/to/stock_changes.db   ("" disables the feed)
+    CHANGES_KEEP=1000                     change sets kept
+
+Newest first, from Python (feed()) or the command line:
+
+    python -m stock.changes data/stock_changes.db --limit 50 --kind back_in_stock
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from typing import Iterable, Mapping, Optional
+
+logger = logging.getLogger("stock.changes")
+
+KEEP = int(os.environ.get("CHANGES_KEEP", "1000") or 1000)
+IN_STOCK, LOW_STOCK, OUT_OF_STOCK = "In Stock", "Low Stock", "Out of Stock"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS change_sets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    version TEXT NOT NULL UNIQUE,
+    prev_version TEXT,
+    ts REAL NOT NULL,
+    n_changes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stock_changes (
+    set_id INTEGER NOT NULL,
+    sku TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    old_status TEXT,
+    new_status TEXT,
+    old_qty REAL,
+    new_qty REAL
+);
+CREATE INDEX IF NOT EXISTS idx_stock_changes_set ON stock_changes (set_id);
+CREATE INDEX IF NOT EXISTS idx_stock_changes_sku ON stock_changes (sku, set_id);
+-- the last recorded snapshot, diffed against the next one
+CREATE TABLE IF NOT EXISTS stock_state (
+    sku TEXT PRIMARY KEY,
+    status TEXT,
+    quantity REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stock_state_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version TEXT NOT NULL
+);
+"""
+
+COLUMNS = ("set_id", "version", "ts", "sku", "kind", "old_status", "new_status", "old_qty", "new_qty")
+
+
+def kind(old_status: Optional[str], new_status: Optional[str]) -> str:
+    if old_status is None:
+        return "added"
+    if new_status is None:
+        return "removed"
+    if old_status == new_status:
+        return "quantity"
+    if new_status == OUT_OF_STOCK:
+        return "out_of_stock"
+    if old_status == OUT_OF_STOCK:
+        return "back_in_stock"
+    if old_status == IN_STOCK and new_status == LOW_STOCK:
+        return "low_stock"
+    if old_status == LOW_STOCK and new_status == IN_STOCK:
+        return "restocked"
+    return "status"
+
+
+def diff(old: Mapping[str, tuple], new: Mapping[str, tuple]) -> list[tuple]:
+    """(sku, kind, old_status, new_status, old_qty, new_qty) for every SKU whose
+    (status, quantity) differs between the two states, sorted by SKU."""
+    out = []
+    for sku, cur in new.items():
+        prev = old.get(sku)
+        if prev is None:
+            out.append((sku, "added", None, cur[0], None, cur[1]))
+        elif prev != cur:
+            out.append((sku, kind(prev[0], cur[0]), prev[0], cur[0], prev[1], cur[1]))
+    for sku, prev in old.items():
+        if sku not in new:
+            out.append((sku, "removed", prev[0], None, prev[1], None))
+    out.sort()
+    return out
+
+
+def _version_key(version) -> str:
+    return str(version)
+
+
+class ChangeLog:
+    """Records one change set per snapshot version (once, even with several workers)."""
+
+    def __init__(self, path: str, keep: int = KEEP):
+        self.path = path
+        self.keep = max(1, int(keep))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def record(self, version, state: Mapping[str, tuple]) -> Optional[int]:
+        """Diff `state` (sku -> (status, quantity)) with the last recorded snapshot and store
+        the changes. Returns how many were stored; None if this version was already recorded
+        or the write failed (the feed is best-effort and never fails a reload)."""
+        v = _version_key(version)
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.warning("change feed unavailable: %s", e)
+            return None
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # one writer at a time, so each version is diffed once
+            row = conn.execute("SELECT version FROM stock_state_version WHERE id = 1").fetchone()
+            prev_version = row[0] if row else None
+            seen = conn.execute("SELECT 1 FROM change_sets WHERE version = ?", (v,)).fetchone()
+            if prev_version == v or seen:
+                conn.execute("ROLLBACK")
+                return None
+            old = {sku: (status, qty) for sku, status, qty in conn.execute("SELECT sku, status, quantity FROM stock_state")}
+            # the first snapshot ever recorded is the baseline, not a catalogue full of "added"
+            changed = diff(old, state) if prev_version is not None else []
+            set_id = conn.execute(
+                "INSERT INTO change_sets (version, prev_version, ts, n_changes) VALUES (?, ?, ?, ?)",
+                (v, prev_version, time.time(), len(changed)),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO stock_changes (set_id, sku, kind, old_status, new_status, old_qty, new_qty) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((set_id,) + c for c in changed),
+            )
+            if prev_version is None:
+                conn.execute("DELETE FROM stock_state")
+                conn.executemany("INSERT INTO stock_state VALUES (?, ?, ?)",
+                                 ((sku, s, q) for sku, (s, q) in state.items()))
+            else:
+                # only the changed SKUs need writing
+                conn.executemany("DELETE FROM stock_state WHERE sku = ?",
+                                 ((c[0],) for c in changed if c[1] == "removed"))
+                conn.executemany("INSERT OR REPLACE INTO stock_state VALUES (?, ?, ?)",
+                                 ((c[0], c[3], c[5]) for c in changed if c[1] != "removed"))
+            conn.execute("INSERT OR REPLACE INTO stock_state_version (id, version) VALUES (1, ?)", (v,))
+            conn.execute("DELETE FROM stock_changes WHERE set_id <= ?", (set_id - self.keep,))
+            conn.execute("DELETE FROM change_sets WHERE id <= ?", (set_id - self.keep,))
+            conn.execute("COMMIT")
+            return len(changed)
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.warning("change set for %s not recorded: %s", v, e)
+            return None
+        finally:
+            conn.close()
+
+
+def _query(path: str, sql: str, params=()) -> list:
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("change feed query failed: %s", e)
+        return []
+
+
+def feed(path: str, limit: int = 100, since: int = 0, kinds: Iterable[str] = (), sku: str = "") -> list[dict]:
+    """Changes newest first. Pass the highest set_id already handled as `since` to get only newer ones."""
+    sql = ("SELECT c.set_id, s.version, s.ts, c.sku, c.kind, c.old_status, c.new_status, c.old_qty, c.new_qty "
+           "FROM stock_changes c JOIN change_sets s ON s.id = c.set_id WHERE c.set_id > ?")
+    params = [int(since)]
+    kinds = list(kinds)
+    if kinds:
+        sql += f" AND c.kind IN ({', '.join('?' * len(kinds))})"
+        params += kinds
+    if sku:
+        sql += " AND c.sku = ?"
+        params.append(sku)
+    sql += " ORDER BY c.set_id DESC, c.sku LIMIT ?"
+    params.append(int(limit))
+    return [dict(zip(COLUMNS, r)) for r in _query(path, sql, params)]
+
+
+def change_sets(path: str, limit: int = 20) -> list[tuple]:
+    """(set_id, version, ts, n_changes) of the latest change sets, newest first."""
+    return _query(path, "SELECT id, version, ts, n_changes FROM change_sets ORDER BY id DESC LIMIT ?", (int(limit),))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stock changes between snapshots, newest first.")
+    ap.add_argument("db", nargs="?", default=os.environ.get("CHANGES_DB", "data/stock_changes.db"))
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--since", type=int, default=0, help="only change sets after this id")
+    ap.add_argument("--kind", action="append", default=[], help="e.g. back_in_stock (repeatable)")
+    ap.add_argument("--sku", default="")
+    args = ap.parse_args()
+
+    print("Change sets:")
+    for set_id, version, ts, n in change_sets(args.db, 5):
+        print(f"  #{set_id:<5d} {time.strftime('%Y-%m-%d %H:%M', time.localtime(ts))}  {n:6d} changes  {version}")
+    print("\nChanges:")
+    for c in feed(args.db, args.limit, args.since, args.kind, args.sku):
+        delta = "" if c["old_qty"] is None or c["new_qty"] is None else f"{c['new_qty'] - c['old_qty']:+g}"
+        print(f"  #{c['set_id']:<5d} {c['sku']:>10s}  {c['kind']:14s} {c['old_status'] or '-'} -> "
+              f"{c['new_status'] or '-'}  {delta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Static export: the catalogue as plain HTML + JSON that any web server can serve.
+
+    out/
+      index.html           categories with item counts
+      c/<category>.html    every item of a category with its status
+      p/<sku>.html         one small page per SKU (status, photo, order link)
+      images/<file>        product photos, copied when they change
+      status.json          {"version", "generated_at", "items": {sku: status}}
+      manifest.json        digest per page, for the next incremental run
+
+Items come from the app's served snapshot with the status already decided by
+the app's get_stock_status, so the site and the app always agree. Pages are
+rendered by a process pool. Only pages whose digest changed are rewritten:
+the digest covers the item's fields, its photo's mtime and size, and
+TEMPLATE_VERSION. Pages of SKUs that are gone are deleted. Every file is
+written to a temp name and renamed, so a server never sees a half-written
+page.
+
+    STATIC_EXPORT_DIR=         export after every snapshot build ("" = off)
+    STATIC_EXPORT_WORKERS=     processes (default: CPU count; 1 renders in-process)
+"""
+import hashlib
+import html
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, exports just don't overlap there
+    fcntl = None
+
+logger = logging.getLogger("stock.export")
+
+WORKERS = int(os.environ.get("STATIC_EXPORT_WORKERS", "") or os.cpu_count() or 1)
+TEMPLATE_VERSION = 1
+CHUNK = 500
+UNCATEGORIZED = "Other"
+
+STATUS_LABELS = {
+    "In Stock": ("in", "✅ स्टॉक में उपलब्ध"),
+    "Low Stock": ("low", "⚠️ कम स्टॉक"),
+    "Out of Stock": ("out", "❌ स्टॉक में उपलब्ध नहीं"),
+}
+
+CSS = """
+body { font-family: 'Segoe UI', sans-serif; background: #f5f7fa; color: #1e293b; margin: 0; padding: 16px; }
+main { max-width: 720px; margin: 0 auto; background: white; border-radius: 16px; padding: 20px; }
+h1 { font-size: 1.5rem; margin: 0 0 8px 0; } a { color: #4f46e5; }
+.badge { display: inline-block; padding: 6px 12px; border-radius: 8px; font-weight: 700; }
+.in { background: #d1fae5; color: #065f46; } .low { background: #fef3c7; color: #92400e; }
+.out { background: #fee2e2; color: #991b1b; }
+img { max-width: 100%; border-radius: 12px; margin: 12px 0; }
+table { width: 100%; border-collapse: collapse; } td { padding: 6px 4px; border-bottom: 1px solid #e2e8f0; }
+.order { display: inline-block; margin-top: 12px; padding: 10px 18px; border-radius: 10px;
+         background: #25D366; color: white; text-decoration: none; font-weight: 700; }
+"""
+
+
+def slug(text: str) -> str:
+    s = re.sub(r"[^\w-]+", "-", str(text or "").strip().lower()).strip("-")
+    return s or "item"
+
+
+def _category(item: dict) -> str:
+    return str(item.get("category") or "").strip() or UNCATEGORIZED
+
+
+def _photo_stamp(path: Optional[str]):
+    try:
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except (OSError, TypeError):
+        return None
+
+
+def digest(item: dict) -> str:
+    payload = json.dumps([TEMPLATE_VERSION, item, _photo_stamp(item.get("image"))], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _write(path: str, text: str):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _page(title: str, body: str, depth: int) -> str:
+    up = "../" * depth
+    back = f'<p><a href="{up}index.html">← सभी श्रेणियाँ</a></p>' if depth else ""
+    return (f'<!doctype html><html lang="hi"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f'<title>{html.escape(title)}</title><link rel="stylesheet" href="{up}style.css"></head>'
+            f'<body><main>{body}{back}</main></body></html>')
+
+
+def _badge(status: str) -> str:
+    cls, label = STATUS_LABELS.get(status, ("out", status))
+    return f'<span class="badge {cls}">{html.escape(label)}</span>'
+
+
+def render_item(item: dict, site: dict) -> str:
+    sku = str(item["sku"])
+    parts = [f"<h1>#{html.escape(sku)}</h1>"]
+    if item.get("name"):
+        parts.append(f"<p>{html.escape(str(item['name']))}</p>")
+    parts.append(_badge(item["status"]))
+    if item.get("image"):
+        parts.append(f'<img src="../images/{quote(os.path.basename(item["image"]))}" alt="{html.escape(sku)}" loading="lazy">')
+    alts = item.get("alternates") or ()
+    if alts:
+        links = ", ".join(f'<a href="{quote(slug(a))}.html">#{html.escape(a)}</a>' for a in alts)
+        parts.append(f"<p>विकल्प: {links}</p>")
+    cat = _category(item)
+    parts.append(f'<p>श्रेणी: <a href="../c/{quote(slug(cat))}.html">{html.escape(cat)}</a></p>')
+    if site.get("whatsapp"):
+        wa = f"https://wa.me/{site['whatsapp']}?text=" + quote(f"ORDER|SKU:{sku}|QTY:1")
+        parts.append(f'<a class="order" href="{wa}">🛒 Order via WhatsApp</a>')
+    return _page(f"{sku} · {site.get('title', '')}", "".join(parts), 1)
+
+
+def render_category(name: str, items: list[dict], site: dict) -> str:
+    rows = "".join(
+        f'<tr><td><a href="../p/{quote(slug(it["sku"]))}.html">#{html.escape(str(it["sku"]))}</a></td>'
+        f'<td>{html.escape(str(it.get("name") or ""))}</td><td>{_badge(it["status"])}</td></tr>'
+        for it in items
+    )
+    return _page(f"{name} · {site.get('title', '')}", f"<h1>{html.escape(name)}</h1><table>{rows}</table>", 1)
+
+
+def render_index(counts: dict, site: dict, generated_at: str) -> str:
+    rows = "".join(
+        f'<tr><td><a href="c/{quote(slug(name))}.html">{html.escape(name)}</a></td><td>{n}</td></tr>'
+        for name, n in sorted(counts.items())
+    )
+    body = (f"<h1>{html.escape(site.get('title', 'Stock'))}</h1>"
+            f"<p>Last Updated: <b>{html.escape(generated_at)}</b></p><table>{rows}</table>")
+    return _page(site.get("title", "Stock"), body, 0)
+
+
+def _write_items(out_dir: str, items: list[dict], site: dict) -> int:
+    """Pool task: render and write one chunk of SKU pages."""
+    for item in items:
+        _write(os.path.join(out_dir, "p", f"{slug(item['sku'])}.html"), render_item(item, site))
+    return len(items)
+
+
+def _copy_photo(src: str, dst: str) -> bool:
+    try:
+        s = os.stat(src)
+        d = os.stat(dst)
+        if d.st_size == s.st_size and d.st_mtime_ns == s.st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        pass
+    tmp = f"{dst}.tmp{os.getpid()}"
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+    return True
+
+
+def export(items: Iterable[dict], out_dir: str, version="", site: Optional[dict] = None,
+           workers: int = WORKERS) -> Optional[dict]:
+    """Bring `out_dir` up to date with `items` (dicts with sku, status and optional name,
+    category, image, alternates). Returns what was written, or None if another process
+    is exporting into the same directory right now."""
+    site = site or {}
+    t0 = time.perf_counter()
+    for sub in ("p", "c", "images"):
+        os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+    with open(os.path.join(out_dir, ".export.lock"), "a+b") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:  # a sibling worker is exporting the same snapshot
+                return None
+        return _export(list(items), out_dir, version, site, workers, t0)
+
+
+def _export(items: list[dict], out_dir: str, version, site: dict, workers: int, t0: float) -> dict:
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            old = json.load(f)
+    except (OSError, ValueError):
+        old = {}
+    old_pages, old_cats = old.get("pages", {}), old.get("categories", {})
+    if old.get("site") != site:  # new title / WhatsApp number: every page changes
+        old_pages, old_cats = {}, {}
+
+    by_sku = {}
+    for item in items:
+        by_sku.setdefault(str(item["sku"]), item)
+    pages = {sku: digest(item) for sku, item in by_sku.items()}
+    todo = [by_sku[sku] for sku, d in pages.items() if old_pages.get(sku) != d]
+
+    if todo:
+        chunks = [todo[i:i + CHUNK] for i in range(0, len(todo), CHUNK)]
+        if workers > 1 and len(chunks) > 1:
+            # spawn: the caller may be a threaded server process, where fork is unsafe
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as pool:
+                list(pool.map(_write_items, [out_dir] * len(chunks), chunks, [site] * len(chunks)))
+        else:
+            for chunk in chunks:
+                _write_items(out_dir, chunk, site)
+
+    photos = 0
+    for item in todo:
+        if item.get("image") and os.path.exists(item["image"]):
+            photos += _copy_photo(item["image"], os.path.join(out_dir, "images", os.path.basename(item["image"])))
+
+    removed = [sku for sku in old_pages if sku not in pages]
+    for sku in removed:
+        try:
+            os.remove(os.path.join(out_dir, "p", f"{slug(sku)}.html"))
+        except FileNotFoundError:
+            pass
+
+    grouped = {}
+    for sku, item in sorted(by_sku.items()):
+        grouped.setdefault(_category(item), []).append(item)
+    cats = {name: hashlib.blake2b("".join(pages[str(it["sku"])] for it in members).encode(), digest_size=12).hexdigest()
+            for name, members in grouped.items()}
+    cats_written = 0
+    for name, members in grouped.items():
+        if old_cats.get(name) != cats[name]:
+            _write(os.path.join(out_dir, "c", f"{slug(name)}.html"), render_category(name, members, site))
+            cats_written += 1
+    for name in old_cats:
+        if name not in cats:
+            try:
+                os.remove(os.path.join(out_dir, "c", f"{slug(name)}.html"))
+            except FileNotFoundError:
+                pass
+
+    generated_at = time.strftime("%d-%m-%Y %H:%M")
+    _write(os.path.join(out_dir, "style.css"), CSS)
+    _write(os.path.join(out_dir, "index.html"), render_index({n: len(m) for n, m in grouped.items()}, site, generated_at))
+    _write(os.path.join(out_dir, "status.json"), json.dumps({
+        "version": str(version),
+        "generated_at": generated_at,
+        "items": {sku: item["status"] for sku, item in by_sku.items()},
+    }, ensure_ascii=False))
+    _write(manifest_path, json.dumps({"version": str(version), "site": site, "pages": pages, "categories": cats}))
+    stats = {
+        "items": len(pages),
+        "pages_written": len(todo),
+        "pages_removed": len(removed),
+        "categories_written": cats_written,
+        "photos_copied": photos,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    logger.info("static export of %s: %s", version, stats)
+    return stats
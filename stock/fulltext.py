@@ -0,0 +1,191 @@
+"""Ranked full-text search over product name and description, inside the database.
+
+SQLite: an FTS5 table over products(name, website_description), external
+content keyed by products.id and kept in sync by triggers, so ops writes
+update it. Postgres: a GIN index on a weighted tsvector (name A, description
+B), plus a pg_trgm index that speeds up the plain substring search.
+
+Every word typed is a prefix ("shub viv" finds "Shubh Vivah"); results are
+ranked with name hits ahead of description hits, then table order.
+
+The app never creates the index: it only checks for it at startup. Install
+it once per database (the SQLite fill reads every product):
+
+    python -m stock.fulltext --install /data/ops.db
+    DATABASE_URL=postgresql://... python -m stock.fulltext --install
+
+    TEXT_SEARCH=scan   scan (the in-memory / LIKE substring match only) | fulltext
+"""
+import argparse
+import logging
+import os
+import re
+import sqlite3
+from typing import Optional
+
+from stock.pushdown import COLUMNS, SHARED_INDEXES
+
+logger = logging.getLogger("stock.fulltext")
+
+MODE = (os.environ.get("TEXT_SEARCH", "scan").strip().lower() or "scan")
+
+SQLITE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, website_description,
+    content='products', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, website_description) VALUES (new.id, new.name, new.website_description);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, website_description)
+    VALUES ('delete', old.id, old.name, old.website_description);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, website_description)
+    VALUES ('delete', old.id, old.name, old.website_description);
+    INSERT INTO products_fts (rowid, name, website_description) VALUES (new.id, new.name, new.website_description);
+END;
+"""
+# column weights: a name hit counts ten times a description hit
+SQLITE_RANK = "bm25(products_fts, 10.0, 1.0)"
+OVERFETCH = 4
+
+PG_TSV = ("setweight(to_tsvector('simple', COALESCE({p}name, '')), 'A') || "
+          "setweight(to_tsvector('simple', COALESCE({p}website_description, '')), 'B')")
+PG_SCHEMA = (
+    f"CREATE INDEX IF NOT EXISTS idx_products_fts ON products USING GIN (({PG_TSV.format(p='')}))",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN (lower(name) gin_trgm_ops)",
+)
+
+
+def terms(query: str) -> list[str]:
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def fts5_query(query: str) -> str:
+    """Every word as a quoted prefix term, all required."""
+    return " ".join(f'"{t}"*' for t in terms(query))
+
+
+def tsquery(query: str) -> str:
+    return " & ".join(f"{t}:*" for t in terms(query))
+
+
+class FullText:
+    """Ranked name + description search for a pushdown.SqliteDb / PostgresDb."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def install(self):
+        """Create the index (and on SQLite fill it once). Needs write access; run from the CLI."""
+        if self.db.dialect == "sqlite":
+            self._install_sqlite()
+        else:
+            self._install_postgres()
+
+    def installed(self) -> bool:
+        """Whether the index exists (read-only)."""
+        if self.db.dialect == "sqlite":
+            sql = "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+        else:
+            sql = "SELECT 1 FROM pg_indexes WHERE indexname = 'idx_products_fts'"
+        return bool(self.db.rows(sql, {}))
+
+    def _install_sqlite(self):
+        conn = sqlite3.connect(self.db.path, timeout=30)
+        try:
+            # each match joins inventory by product_id, which needs its index in snapshot mode too
+            for sql in SHARED_INDEXES:
+                conn.execute(sql)
+            conn.commit()
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+            if exists:
+                return
+            with conn:
+                conn.executescript(SQLITE_SCHEMA)
+                conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+        finally:
+            conn.close()
+
+    def _install_postgres(self):
+        from sqlalchemy import text
+        with self.db.engine.begin() as conn:
+            for sql in SHARED_INDEXES + PG_SCHEMA[:1]:
+                conn.execute(text(sql))
+        try:
+            with self.db.engine.begin() as conn:
+                for sql in PG_SCHEMA[1:]:
+                    conn.execute(text(sql))
+        except Exception as e:  # pg_trgm needs CREATE on the database; full-text still works
+            logger.warning("pg_trgm index not created, substring search will scan: %s", e)
+
+    def search(self, query: str, limit: int = 10) -> tuple[int, list[dict]]:
+        """(total, best `limit` rows) matching every word of `query` as a prefix."""
+        db = self.db
+        if db.dialect == "sqlite":
+            match = fts5_query(query)
+            # rank inside the FTS table first, then join only the top few; a few extra
+            # are fetched in case some of them are inactive
+            source = (f"(SELECT rowid AS id, {SQLITE_RANK} AS score FROM products_fts WHERE products_fts MATCH :q "
+                      f"ORDER BY score, rowid LIMIT :top) f CROSS JOIN products p ON p.id = f.id")
+            where, rank = "1 = 1", "f.score"
+            count = "products_fts f CROSS JOIN products p ON p.id = f.rowid WHERE products_fts MATCH :q"
+        else:
+            match = tsquery(query)
+            tsv = PG_TSV.format(p="p.")
+            source = "products p"
+            where, rank = f"({tsv}) @@ to_tsquery('simple', :q)", f"-ts_rank({tsv}, to_tsquery('simple', :q))"
+            count = f"products p WHERE {where}"
+        if not match:
+            return 0, []
+        rows = db.rows(
+            f"SELECT {COLUMNS} FROM {source} LEFT JOIN inventory i ON i.product_id = p.id "
+            f"WHERE {where} AND {db.active} ORDER BY {rank}, p.id LIMIT :limit",
+            {"q": match, "limit": int(limit), "top": int(limit) * OVERFETCH},
+        )
+        if len(rows) < limit:
+            return len(rows), rows
+        # matching active products (not product x warehouse rows)
+        total = db.rows(f"SELECT COUNT(*) AS n FROM {count} AND {db.active}", {"q": match})[0]["n"]
+        return total, rows
+
+
+def open_search(db, mode: str = MODE) -> Optional[FullText]:
+    """A FullText for `db` when enabled and installed, else None (substring search)."""
+    if mode != "fulltext":
+        return None
+    fts = FullText(db)
+    try:
+        if fts.installed():
+            return fts
+        logger.warning("full-text index not installed, using substring search; run: python -m stock.fulltext --install")
+    except Exception as e:
+        logger.warning("full-text search unavailable, using substring search: %s", e)
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Full-text index over product name and description.")
+    ap.add_argument("db", nargs="?", default=os.environ.get("DB_PATH", "/data/ops.db"))
+    ap.add_argument("--install", action="store_true", help="create (and fill) the index; safe to re-run")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    from stock.pushdown import PostgresDb, SqliteDb
+    url = os.environ.get("DATABASE_URL", "").strip()
+    if url:
+        from sqlalchemy import create_engine
+        db = PostgresDb(create_engine(url))
+    else:
+        db = SqliteDb(args.db)
+    fts = FullText(db)
+    if args.install:
+        fts.install()
+    print(f"full-text index {'installed' if fts.installed() else 'not installed (use --install)'}")
+
+
+if __name__ == "__main__":
+    main()
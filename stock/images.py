@@ -0,0 +1,114 @@
+"""Product images, prepared once per file.
+
+fit_width() shrinks a photo the way st.image would. StaticImages publishes
+the shrunk copy under Streamlit's static folder (server.enableStaticServing,
+see .streamlit/config.toml). Pages then point an <img> at a stable URL, so a
+rerun reads, hashes and registers nothing with the media file manager, and
+browsers cache the photo across reruns and sessions.
+"""
+import glob
+import hashlib
+import io
+import os
+import threading
+from typing import Optional
+
+from stock import metrics
+from stock.caches import LRUCache
+
+# st.image re-encodes anything wider than this on every call
+MAX_WIDTH = 1460
+
+
+def fit_width(data: bytes, max_width: int = MAX_WIDTH) -> bytes:
+    """Downscale an image wider than max_width the way Streamlit would; otherwise return it unchanged."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if img.width <= max_width:
+                return data
+            fmt = "JPEG" if img.format == "JPEG" else "PNG"
+            height = int(1.0 * img.height * max_width / img.width)
+            small = img.resize((max_width, height), resample=Image.BILINEAR)
+            if fmt == "JPEG" and small.mode not in ("RGB", "L"):
+                small = small.convert("RGB")
+            out = io.BytesIO()
+            small.save(out, format=fmt, quality=90)
+            return out.getvalue()
+    except Exception:
+        return data
+
+
+class StaticImages:
+    """Source photo path -> URL of its resized copy under `root` (Streamlit's static folder).
+
+    Copies are named by the source path and its (mtime, size), so a replaced
+    photo gets a new URL and the old copy is deleted. URLs are kept per path
+    for `recheck` seconds; within that time a hit doesn't even stat the
+    source file.
+    """
+
+    def __init__(self, root: str = "static", url_prefix: str = "app/static", subdir: str = "img",
+                 recheck: float = 60, max_entries: int = 8192):
+        self.dir = os.path.join(root, subdir)
+        self.url_prefix = f"{url_prefix}/{subdir}"
+        self._urls = LRUCache(max_entries, ttl=recheck, sizeof=lambda k, v: 0)  # path -> (url, bytes)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def url(self, path: str) -> Optional[str]:
+        hit = self._urls.get(path)
+        if hit is not None:
+            metrics.count("stock_image_bytes_saved_total", hit[1])
+            return hit[0]
+        hit = self._publish(path)
+        if hit is not None:
+            self._urls.put(path, hit)
+        return hit[0] if hit else None
+
+    def _publish(self, path: str) -> Optional[tuple[str, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stem = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        ext = os.path.splitext(path)[1].lower() or ".jpg"
+        name = f"{stem}-{st.st_mtime_ns:x}-{st.st_size:x}{ext}"
+        target = os.path.join(self.dir, name)
+        with self._lock:
+            if not os.path.exists(target):
+                try:
+                    with open(path, "rb") as f:
+                        data = fit_width(f.read())
+                    os.makedirs(self.dir, exist_ok=True)
+                    tmp = f"{target}.tmp{os.getpid()}"
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, target)
+                except OSError:
+                    return None
+                self.published += 1
+                for old in glob.glob(os.path.join(self.dir, f"{stem}-*")):
+                    if old != target:
+                        try:
+                            os.remove(old)
+                        except OSError:
+                            pass
+            size = os.path.getsize(target)
+        return f"{self.url_prefix}/{name}", size
+
+    def stats(self) -> dict:
+        out = self._urls.stats()
+        out["published"] = self.published
+        return out
+
+    def clear(self):
+        """Forget the URLs (the files stay and are reused while their source is unchanged)."""
+        self._urls.clear()
+
+
+def img_html(url: str, alt: str = "") -> str:
+    return f'<div class="card-img"><img src="{url}" alt="{alt}" loading="lazy"></div>'
@@ -0,0 +1,183 @@
+"""Memory accounting: what the process holds, and whether reloads give it back.
+
+Every snapshot / master table build runs inside measure() (see
+stock.refresh), which records the process RSS before and after it. Growth between reloads compares the
+readings taken at the *start* of consecutive builds, when exactly one
+snapshot is served, so the old and new copies that overlap during a build
+don't count as a leak. With tracemalloc on, each build also records its
+peak of traced Python allocations and the source lines whose live
+allocations grew most since the previous build's start.
+
+    PYTHONTRACEMALLOC=1    Python's own switch: trace allocations from startup
+                           (slower; for hunting a leak, not for every day)
+    MEMORY_HISTORY=20      builds kept in the report
+    MEMORY_SESSION_TTL=3600  a session not seen for this long drops out of the report
+
+report() adds the registered caches and the per-session state sizes noted
+by note_session(); both apps show it on the admin view. A reload-cycle leak
+check runs with:
+
+    python scripts/check_memory.py --cycles 10
+"""
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from stock import caches
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("stock.memory")
+
+HISTORY = int(os.environ.get("MEMORY_HISTORY", "20") or 20)
+SESSION_TTL = float(os.environ.get("MEMORY_SESSION_TTL", "3600") or 3600)
+TOP = 10
+
+# allocations made by the accounting itself, or that no source line owns
+_IGNORE = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY)
+_baseline = {}  # label -> tracemalloc snapshot taken at the start of its previous build
+# session key -> (bytes, keys, largest key); bounded so abandoned sessions can't pile up
+_sessions = caches.LRUCache(4096, ttl=SESSION_TTL, sizeof=lambda k, v: 0)
+
+
+def rss() -> Optional[int]:
+    """Resident set size of this process in bytes (None where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak * 1024 if os.uname().sysname == "Linux" else peak  # kB on Linux, bytes on macOS
+
+
+def deep_size(obj) -> int:
+    """Bytes of every object reachable from `obj` through the garbage collector's references,
+    each counted once; modules, classes and functions are shared code, not data, and are skipped.
+    Memory-mapped buffers count only their Python wrapper: their pages belong to the page cache."""
+    seen = set()
+    todo = [obj]
+    size = 0
+    while todo:
+        nxt = []
+        for o in todo:
+            if id(o) in seen or isinstance(o, (type, type(os), type(deep_size))):
+                continue
+            seen.add(id(o))
+            try:
+                size += sys.getsizeof(o)
+            except TypeError:
+                continue
+            if not hasattr(type(o), "memory_usage"):  # pandas objects already report their deep size
+                nxt.append(o)
+        todo = gc.get_referents(*nxt) if nxt else []
+    return size
+
+
+def _top(stats, n: int = TOP) -> list[dict]:
+    return [{
+        "where": f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+        "bytes": s.size_diff,
+        "count": s.count_diff,
+    } for s in stats[:n] if s.size_diff > 0]
+
+
+@contextmanager
+def measure(label: str, version=None):
+    """Record RSS (and, when tracing, Python allocations) around one build of `label`."""
+    gc.collect()
+    t0 = time.perf_counter()
+    rss0 = rss()
+    snap = None
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        snap = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+    try:
+        yield
+    finally:
+        row = {
+            "label": label,
+            "version": str(version),
+            "at": time.time(),
+            "seconds": time.perf_counter() - t0,
+            "rss_before": rss0,
+            "rss_after": rss(),
+            "growth": None,
+            "traced_peak": tracemalloc.get_traced_memory()[1] if snap is not None else None,
+            "top_growth": [],
+        }
+        with _lock:
+            prev = next((r for r in reversed(_history) if r["label"] == label), None)
+            if prev is not None and rss0 is not None and prev["rss_before"] is not None:
+                row["growth"] = rss0 - prev["rss_before"]
+            if snap is not None and label in _baseline:
+                row["top_growth"] = _top(snap.compare_to(_baseline[label], "lineno"))
+            if snap is not None:
+                _baseline[label] = snap
+            _history.append(row)
+        logger.info("%s build %s: rss %s -> %s (growth since last build %s)",
+                    label, version, rss0, row["rss_after"], row["growth"])
+
+
+def history(label: str = "") -> list[dict]:
+    """Measured builds, oldest first."""
+    with _lock:
+        return [r for r in _history if not label or r["label"] == label]
+
+
+def note_session(key: str, state: dict):
+    """Remember the size of one session's state (called once per rerun)."""
+    sizes = {k: caches.approx_size(v) for k, v in state.items()}
+    largest = max(sizes, key=sizes.get) if sizes else ""
+    _sessions.put(key, (sum(sizes.values()), len(sizes), largest))
+
+
+def sessions(n: int = TOP) -> dict:
+    """Count and total size of the sessions seen within MEMORY_SESSION_TTL, and the `n` largest."""
+    live = _sessions.items()
+    live.sort(key=lambda kv: kv[1][0], reverse=True)
+    return {
+        "count": len(live),
+        "bytes": sum(v[0] for _, v in live),
+        "largest": [{"session": k[:8], "bytes": b, "keys": keys, "largest_key": big} for k, (b, keys, big) in live[:n]],
+    }
+
+
+def report(snapshots: Optional[dict] = None, n: int = TOP) -> dict:
+    """Largest consumers: served snapshots (name -> object, sized with deep_size), registered
+    caches, session state, plus process RSS and the recent builds."""
+    traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+    return {
+        "rss": rss(),
+        "peak_rss": peak_rss(),
+        "traced": traced[0] if traced else None,
+        "snapshots": sorted(({"name": name, "bytes": deep_size(obj)} for name, obj in (snapshots or {}).items()),
+                            key=lambda r: r["bytes"], reverse=True),
+        "caches": sorted(({"name": r["name"], "entries": r["entries"], "bytes": r.get("bytes") or 0}
+                          for r in caches.report()), key=lambda r: r["bytes"], reverse=True),
+        "sessions": sessions(n),
+        "builds": history(),
+    }
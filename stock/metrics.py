@@ -0,0 +1,271 @@
+"""In-process timing spans, counters and a Prometheus text endpoint.
+
+Everything here is a no-op unless METRICS_ENABLED is set, so the hot path
+only pays for a flag check and a shared null context manager.
+
+    METRICS_ENABLED=1      turn on spans + counters
+    METRICS_PORT=9464      local HTTP port serving /metrics (0 disables it)
+    METRICS_HOST=127.0.0.1 bind address for the endpoint
+    METRICS_LOG_JSON=1     log one JSON line per rerun with its span timings
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+ENABLED = _env_flag("METRICS_ENABLED")
+LOG_JSON = ENABLED and _env_flag("METRICS_LOG_JSON")
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1").strip() or "127.0.0.1"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464") or 0)
+
+# Seconds; tuned for a Streamlit rerun (sub-ms lookups up to multi-second loads).
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("stock.metrics")
+if LOG_JSON and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket histogram; cumulative counts are produced at render time."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                idx = i
+                break
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class Registry:
+    """Process-wide store of histograms and counters keyed by (name, labels)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        h = self._histograms.get(key)
+        if h is None:
+            with self._lock:
+                h = self._histograms.setdefault(key, Histogram())
+        return h
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_num(value)}")
+        for (name, labels), h in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            counts, total, count = h.snapshot()
+            running = 0
+            for bound, c in zip(h.buckets, counts):
+                running += c
+                lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', _fmt_num(bound)),))} {running}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(total)}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _fmt_num(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+REGISTRY = Registry()
+_local = threading.local()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        REGISTRY.histogram("stock_span_seconds", span=self.name).observe(elapsed)
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans[self.name] = spans.get(self.name, 0.0) + elapsed
+        return False
+
+
+def span(name: str):
+    """Time a block: `with metrics.span("lookup"): ...`."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def count(name: str, value: float = 1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, value, **labels)
+
+
+def cache_request(cache: str):
+    """Count a lookup against one of the app caches (call at the call site)."""
+    if ENABLED:
+        REGISTRY.inc("stock_cache_requests_total", 1, cache=cache)
+
+
+def cache_miss(cache: str):
+    """Count a miss (call inside the cached function body, which only runs on a miss)."""
+    if ENABLED:
+        REGISTRY.inc("stock_cache_misses_total", 1, cache=cache)
+
+
+def begin_rerun(script: str):
+    """Start collecting spans for the current script run (thread-local)."""
+    if not ENABLED:
+        return
+    _local.spans = {}
+    _local.script = script
+    _local.started = time.perf_counter()
+
+
+def end_rerun():
+    """Close the current script run: record its total time and optionally log it."""
+    if not ENABLED:
+        return
+    spans = getattr(_local, "spans", None)
+    if spans is None:
+        return
+    total = time.perf_counter() - _local.started
+    script = _local.script
+    _local.spans = None
+    REGISTRY.histogram("stock_rerun_seconds", script=script).observe(total)
+    if LOG_JSON:
+        logger.info(json.dumps({
+            "event": "rerun",
+            "script": script,
+            "total_ms": round(total * 1000, 3),
+            "spans_ms": {k: round(v * 1000, 3) for k, v in spans.items()},
+        }))
+
+
+# ---------- HTTP endpoint ----------
+_server: Optional[ThreadingHTTPServer] = None
+_bind_failed = False  # the port was taken (e.g. another worker has it): don't retry every rerun
+_server_lock = threading.Lock()
+ROUTES = {}
+
+
+def route(path: str):
+    """Register an extra GET handler on the metrics server: fn() -> (status, content_type, body)."""
+    def deco(fn):
+        ROUTES[path] = fn
+        return fn
+    return deco
+
+
+@route("/metrics")
+def _metrics_route():
+    return 200, "text/plain; version=0.0.4; charset=utf-8", REGISTRY.render_prometheus()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        fn = ROUTES.get(self.path.split("?", 1)[0])
+        if fn is None:
+            status, ctype, body = 404, "text/plain; charset=utf-8", "not found\n"
+        else:
+            status, ctype, body = fn()
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Start the endpoint once per process; later calls are no-ops, also after a failed bind."""
+    global _server, _bind_failed
+    if not ENABLED or not port or _bind_failed:
+        return None
+    if _server is not None:
+        return _server
+    with _server_lock:
+        if _server is None and not _bind_failed:
+            try:
+                srv = ThreadingHTTPServer((host, port), _Handler)
+            except OSError as e:
+                _bind_failed = True
+                logger.warning("metrics endpoint not started on %s:%s: %s", host, port, e)
+                return None
+            srv.daemon_threads = True
+            threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+            _server = srv
+    return _server
@@ -0,0 +1,137 @@
+"""Opt-in CPU profiling of whole script reruns, for finding where a slow rerun spends its time.
+
+begin() / end() go around the script body, like metrics.begin_rerun /
+end_rerun. A sampled rerun runs under cProfile and is written as a .pstats
+file to a rotating directory; top() adds every saved profile together.
+
+    PROFILE_SAMPLE=0       fraction of reruns profiled (0 = off, 1 = every rerun)
+    PROFILE_DIR=profiles   where the .pstats files go
+    PROFILE_KEEP=200       newest files kept
+
+An admin can also profile every rerun of their own session, whatever the
+sample rate: open `?admin=1&profile=1` (or use the toggle on the admin
+view), then go back to the app. Only one rerun per process is
+profiled at a time: Python 3.12+ allows a single active profiler, and
+overlapping reruns would blur each other's numbers. The apps call end()
+before st.stop() / st.rerun() too. A rerun that raises never reaches end();
+its profile is dropped when the next sample begins.
+
+    python -m stock.profiling profiles --top 30 --script app
+    python -m stock.profiling profiles --sort tottime
+"""
+import argparse
+import cProfile
+import glob
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("stock.profiling")
+
+SAMPLE = float(os.environ.get("PROFILE_SAMPLE", "0") or 0)
+DIR = os.environ.get("PROFILE_DIR", "profiles").strip() or "profiles"
+KEEP = int(os.environ.get("PROFILE_KEEP", "200") or 200)
+
+_lock = threading.Lock()
+_active = None  # (thread, profiler, script) of the rerun being profiled
+
+
+def begin(script: str, force: bool = False, sample: float = SAMPLE) -> bool:
+    """Start profiling this rerun if it is sampled (or forced) and no other rerun is being profiled."""
+    global _active
+    if not force and (sample <= 0 or random.random() >= sample):
+        return False
+    with _lock:
+        if _active is not None:
+            thread, prof, _ = _active
+            if thread.is_alive() and thread is not threading.current_thread():
+                return False
+            prof.disable()  # its rerun ended without end()
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError as e:  # another profiler is already active (3.12+)
+            logger.warning("rerun not profiled: %s", e)
+            return False
+        _active = (threading.current_thread(), prof, script)
+    return True
+
+
+def end(out_dir: str = DIR, keep: int = KEEP) -> Optional[str]:
+    """Stop this thread's profile (if any) and save it; returns the file written."""
+    global _active
+    with _lock:
+        if _active is None or _active[0] is not threading.current_thread():
+            return None
+        _, prof, script = _active
+        prof.disable()
+        _active = None
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{script}-{int(time.time() * 1000)}-{os.getpid()}.pstats")
+    prof.dump_stats(path)
+    _rotate(out_dir, keep)
+    return path
+
+
+def _rotate(out_dir: str, keep: int):
+    files = sorted(glob.glob(os.path.join(out_dir, "*.pstats")), key=os.path.getmtime)
+    for old in files[:-keep] if keep > 0 else files:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+
+def profiles(out_dir: str = DIR, script: str = "") -> list[str]:
+    return sorted(glob.glob(os.path.join(out_dir, f"{script}-*.pstats" if script else "*.pstats")))
+
+
+def top(out_dir: str = DIR, n: int = 25, script: str = "", sort: str = "cumulative") -> tuple[int, list[dict]]:
+    """(profiles aggregated, the `n` heaviest functions across them) with per-rerun averages."""
+    files = profiles(out_dir, script)
+    if not files:
+        return 0, []
+    stats, runs = None, 0
+    for f in files:
+        try:
+            if stats is None:
+                stats = pstats.Stats(f, stream=io.StringIO())
+            else:
+                stats.add(f)
+        except (OSError, EOFError, TypeError, ValueError):  # rotated away or half-written
+            continue
+        runs += 1
+    if stats is None:
+        return 0, []
+    col = {"calls": 0, "tottime": 1, "cumulative": 2}[sort]
+    rows = [(nc, tt, ct, f"{os.path.basename(filename)}:{line}({func})")
+            for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items()]
+    rows.sort(key=lambda r: r[col], reverse=True)
+    return runs, [
+        {"function": where, "calls": nc, "tottime_ms": tt * 1000 / runs, "cumtime_ms": ct * 1000 / runs}
+        for nc, tt, ct, where in rows[:n]
+    ]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Heaviest functions across saved rerun profiles.")
+    ap.add_argument("dir", nargs="?", default=DIR)
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--script", default="", help="app or 2")
+    ap.add_argument("--sort", choices=["cumulative", "tottime", "calls"], default="cumulative")
+    args = ap.parse_args()
+
+    runs, rows = top(args.dir, args.top, args.script, args.sort)
+    print(f"{runs} profiled reruns in {args.dir} (ms per rerun)")
+    print(f"{'cum ms':>9s} {'own ms':>9s} {'calls':>9s}  function")
+    for r in rows:
+        print(f"{r['cumtime_ms']:9.2f} {r['tottime_ms']:9.2f} {r['calls']:9d}  {r['function']}")
+
+
+if __name__ == "__main__":
+    main()
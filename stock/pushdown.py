@@ -0,0 +1,368 @@
+"""Database pushdown: answer the page's lookups with indexed SQL instead of a snapshot.
+
+A snapshot holds every active product x inventory row in memory. For very
+large (e.g. multi-warehouse) catalogues DbCatalogue serves the same lookups
+a search needs (exact SKU, name matches, in-stock alternatives, SKU
+completion, one-edit "did you mean") as parameterized queries against
+SQLite or Postgres, each answered from an index, with a small LRU per
+catalogue version in front.
+
+    CATALOGUE_MODE=auto        auto | snapshot | pushdown
+    PUSHDOWN_MIN_ROWS=500000   auto switches to pushdown at this many active products
+    PUSHDOWN_CACHE_ENTRIES=512
+    PUSHDOWN_CACHE_MB=16
+
+The app only reads the database. Its supporting indexes (and, for SQLite,
+the product_sku_clean lookup table) are created by an explicit migration,
+re-run after bulk product imports so new SKUs are findable:
+
+    python -m stock.pushdown /data/ops.db
+    DATABASE_URL=postgresql://... python -m stock.pushdown
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from stock import metrics
+from stock.caches import LRUCache
+from stock.search_index import clean_sku, sku_prefix
+
+logger = logging.getLogger("stock.pushdown")
+
+MODE = (os.environ.get("CATALOGUE_MODE", "auto").strip().lower() or "auto")
+MIN_ROWS = int(os.environ.get("PUSHDOWN_MIN_ROWS", "500000") or 500000)
+CACHE_ENTRIES = int(os.environ.get("PUSHDOWN_CACHE_ENTRIES", "512") or 512)
+CACHE_MB = int(os.environ.get("PUSHDOWN_CACHE_MB", "16") or 16)
+
+COLUMNS = """p.id, p.sku, p.name, p.website_description AS description, p.image_path,
+       p.category, p.reorder_level, COALESCE(i.quantity_available, 0) AS quantity"""
+
+# quantity lives in inventory, so the category+quantity index spans the join:
+# walk products by (category, id), probe inventory by (product_id, quantity)
+SHARED_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_products_sku ON products (sku)",
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products (category, id)",
+    "CREATE INDEX IF NOT EXISTS idx_inventory_product_qty ON inventory (product_id, quantity_available)",
+)
+
+# SQLite has no regex to index the cleaned SKU by, so it is kept in a side table
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS product_sku_clean (
+    product_id INTEGER PRIMARY KEY,
+    sku TEXT,
+    clean TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_product_sku_clean ON product_sku_clean (clean);
+"""
+
+# same normalisation as search_index.clean_sku: first run of digits, else the trimmed text
+PG_CLEAN = r"COALESCE(substring(p.sku from '\d+'), btrim(p.sku))"
+PG_INDEXES = (f"CREATE INDEX IF NOT EXISTS idx_products_sku_clean ON products (({PG_CLEAN}))",)
+
+
+def wanted(mode: str, min_rows: int, count_products) -> bool:
+    """Whether to serve from the database; `count_products` is only called in auto mode."""
+    if mode == "pushdown":
+        return True
+    if mode == "snapshot":
+        return False
+    return count_products() >= min_rows
+
+
+def _like(q: str) -> str:
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def one_edit_variants(sku: str) -> set:
+    """Digit strings one delete, insert, substitution or adjacent swap away from `sku`."""
+    digits = "0123456789"
+    out = set()
+    for i in range(len(sku) + 1):
+        for d in digits:
+            out.add(sku[:i] + d + sku[i:])
+        if i < len(sku):
+            out.add(sku[:i] + sku[i + 1:])
+            for d in digits:
+                out.add(sku[:i] + d + sku[i + 1:])
+        if i < len(sku) - 1:
+            out.add(sku[:i] + sku[i + 1] + sku[i] + sku[i + 2:])
+    out.discard(sku)
+    return out
+
+
+class SqliteDb:
+    """Read-only connections per thread; the cleaned-SKU side table is synced by migrate()."""
+
+    dialect = "sqlite"
+    active = "COALESCE(p.active, 1) = 1"
+    clean = "c.clean"
+    clean_join = "JOIN product_sku_clean c ON c.product_id = p.id"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def rows(self, sql: str, params: dict) -> list[dict]:
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def count_products(self) -> int:
+        return self.rows(f"SELECT COUNT(*) AS n FROM products p WHERE {self.active}", {})[0]["n"]
+
+    def ensure_schema(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            for sql in SHARED_INDEXES:
+                conn.execute(sql)
+            conn.executescript(SQLITE_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sync(self) -> int:
+        """Bring product_sku_clean up to date with products; writes only rows that changed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            changed = [
+                (pid, sku, clean_sku(sku))
+                for pid, sku in conn.execute(
+                    "SELECT p.id, p.sku FROM products p LEFT JOIN product_sku_clean c ON c.product_id = p.id "
+                    "WHERE c.product_id IS NULL OR c.sku IS NOT p.sku"
+                )
+            ]
+            gone = conn.execute(
+                "SELECT c.product_id FROM product_sku_clean c LEFT JOIN products p ON p.id = c.product_id "
+                "WHERE p.id IS NULL"
+            ).fetchall()
+            if changed or gone:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO product_sku_clean (product_id, sku, clean) VALUES (?, ?, ?)", changed)
+                    conn.executemany("DELETE FROM product_sku_clean WHERE product_id = ?", gone)
+            return len(changed) + len(gone)
+        finally:
+            conn.close()
+
+    def migrate(self) -> int:
+        """Create the indexes and side table and sync it; returns cleaned SKUs written."""
+        self.ensure_schema()
+        return self.sync()
+
+    def check(self):
+        """Read-only runtime check: fail without the side table, warn when products outran it."""
+        if not self.rows("SELECT name FROM sqlite_master WHERE name = 'product_sku_clean'", {}):
+            raise RuntimeError(f"pushdown tables missing, run: python -m stock.pushdown {self.path}")
+        stale = self.rows(
+            "SELECT COUNT(*) AS n FROM products p LEFT JOIN product_sku_clean c ON c.product_id = p.id "
+            "WHERE c.product_id IS NULL OR c.sku IS NOT p.sku", {},
+        )[0]["n"]
+        if stale:
+            logger.warning("%d products not in product_sku_clean, SKU lookups will miss them; "
+                           "run: python -m stock.pushdown %s", stale, self.path)
+
+
+class PostgresDb:
+    """Pooled sqlalchemy engine; the cleaned SKU is an expression index, nothing to sync."""
+
+    dialect = "postgres"
+    active = "COALESCE(p.active, TRUE) = TRUE"
+    clean = PG_CLEAN
+    clean_join = ""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def rows(self, sql: str, params: dict) -> list[dict]:
+        from sqlalchemy import text
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(text(sql), params).mappings()]
+
+    def count_products(self) -> int:
+        return self.rows(f"SELECT COUNT(*) AS n FROM products p WHERE {self.active}", {})[0]["n"]
+
+    def migrate(self) -> int:
+        """Create the indexes (needs CREATE privilege); nothing to sync."""
+        from sqlalchemy import text
+        with self.engine.begin() as conn:
+            for sql in SHARED_INDEXES + PG_INDEXES:
+                conn.execute(text(sql))
+        return 0
+
+    def check(self):
+        """Warn when the cleaned-SKU index is missing: queries still work, just slower."""
+        if not self.rows("SELECT 1 FROM pg_indexes WHERE indexname = 'idx_products_sku_clean'", {}):
+            logger.warning("pushdown indexes missing, SKU lookups will scan; run: python -m stock.pushdown")
+
+
+class _SqlPrefix:
+    def __init__(self, catalogue: "DbCatalogue"):
+        self._cat = catalogue
+
+    def complete(self, prefix: str, limit: int = 8) -> list[str]:
+        """Cleaned SKUs starting with a single typed word (name-word completion needs the snapshot)."""
+        lo = sku_prefix((prefix or "").strip().lower().split())
+        if not lo:
+            return []
+        hi = lo[:-1] + chr(ord(lo[-1]) + 1)
+        db = self._cat.db
+        return self._cat.cached("complete", (lo, limit), lambda: [r["clean"] for r in db.rows(
+            f"SELECT DISTINCT {db.clean} AS clean FROM products p {db.clean_join} "
+            f"WHERE {db.clean} >= :lo AND {db.clean} < :hi AND {db.active} ORDER BY clean LIMIT :limit",
+            {"lo": lo, "hi": hi, "limit": int(limit)},
+        )])
+
+
+class _SqlFuzzy:
+    min_query_len = 3
+
+    def __init__(self, catalogue: "DbCatalogue"):
+        self._cat = catalogue
+
+    def lookup(self, query: str, limit: int = 5, max_distance: Optional[int] = None) -> list[tuple[str, int]]:
+        """Existing SKUs one edit from a numeric query, as (sku, 1): one IN probe on the cleaned-SKU index."""
+        q = clean_sku(query)
+        if len(q) < self.min_query_len or not q.isdigit():
+            return []
+
+        def run():
+            variants = sorted(one_edit_variants(q))
+            params = {f"v{i}": v for i, v in enumerate(variants)}
+            db = self._cat.db
+            found = [r["clean"] for r in db.rows(
+                f"SELECT DISTINCT {db.clean} AS clean FROM products p {db.clean_join} "
+                f"WHERE {db.clean} IN ({', '.join(':' + k for k in params)}) AND {db.active}",
+                params,
+            )]
+            found.sort(key=lambda s: (abs(len(s) - len(q)), s))
+            return [(s, 1) for s in found[:limit]]
+
+        return self._cat.cached("fuzzy", (q, limit), run)
+
+
+class DbCatalogue:
+    """The lookups resolve_query needs, answered by the database for one catalogue version."""
+
+    def __init__(self, db, version, cache_entries: int = CACHE_ENTRIES, cache_mb: int = CACHE_MB):
+        self.db = db
+        self.version = version
+        self._cache = LRUCache(cache_entries, cache_mb * 1024 * 1024)
+        self.prefix = _SqlPrefix(self)
+        self.fuzzy = _SqlFuzzy(self)
+
+    def cached(self, kind: str, key, compute):
+        metrics.cache_request("pushdown")
+        value = self._cache.get((kind, key), self._cache)
+        if value is self._cache:
+            metrics.cache_miss("pushdown")
+            with metrics.span(f"sql_{kind}"):
+                value = compute()
+            self._cache.put((kind, key), value)
+        return value
+
+    def _select(self, where: str, params: dict, tail: str = "", join: str = "") -> list[dict]:
+        db = self.db
+        return db.rows(
+            f"SELECT {COLUMNS} FROM products p {join} LEFT JOIN inventory i ON i.product_id = p.id "
+            f"WHERE {where} AND {db.active} {tail}",
+            params,
+        )
+
+    def find_sku(self, clean: str) -> Optional[dict]:
+        if not clean:
+            return None
+        db = self.db
+        rows = self.cached("sku", clean, lambda: self._select(
+            f"{db.clean} = :clean", {"clean": clean}, "ORDER BY p.id LIMIT 1", db.clean_join,
+        ))
+        return rows[0] if rows else None
+
+    def name_matches(self, query: str, limit: int) -> tuple[int, list[dict]]:
+        """(total, first `limit` rows) whose lowercase name contains `query`; counts only when there are more."""
+        needle = query.lower()
+        if not needle:
+            return 0, []
+
+        def run():
+            rows = self._select(
+                "lower(p.name) LIKE :pat ESCAPE '\\'", {"pat": _like(needle), "limit": int(limit)},
+                "ORDER BY p.id LIMIT :limit",
+            )
+            if not rows:
+                return 0, []
+            total = self.db.rows(
+                f"SELECT COUNT(*) AS n FROM products p LEFT JOIN inventory i ON i.product_id = p.id "
+                f"WHERE lower(p.name) LIKE :pat ESCAPE '\\' AND {self.db.active}",
+                {"pat": _like(needle)},
+            )[0]["n"] if len(rows) == limit else len(rows)
+            return total, rows
+
+        return self.cached("name", (needle, limit), run)
+
+    def phonetic_matches(self, query: str, limit: int) -> tuple[int, list[dict]]:
+        """No phonetic index here (it is built per snapshot); names match literally via name_matches."""
+        return 0, []
+
+    def in_stock(self, category, exclude_sku=None, limit: int = 3) -> list[dict]:
+        """In Stock (quantity > 0 and above the reorder level) rows of `category`, in table order."""
+        return self.cached("in_stock", (category, exclude_sku, limit), lambda: self._select(
+            "p.category = :category AND (:exclude IS NULL OR p.sku <> :exclude) "
+            "AND COALESCE(i.quantity_available, 0) > 0 "
+            "AND COALESCE(i.quantity_available, 0) > COALESCE(p.reorder_level, 0)",
+            {"category": category, "exclude": exclude_sku, "limit": int(limit)},
+            "ORDER BY p.id LIMIT :limit",
+        ))
+
+    def stock_state(self) -> dict:
+        """sku -> (quantity, reorder_level) of the first row per cleaned SKU, in one query (the change feed's input)."""
+        db = self.db
+        if db.dialect == "postgres":
+            sql = (f"SELECT DISTINCT ON (1) {db.clean} AS sku, COALESCE(i.quantity_available, 0) AS quantity, "
+                   f"p.reorder_level FROM products p LEFT JOIN inventory i ON i.product_id = p.id "
+                   f"WHERE {db.active} ORDER BY 1, p.id")
+        else:  # SQLite takes the bare columns from the row that MIN(p.id) picked
+            sql = (f"SELECT {db.clean} AS sku, MIN(p.id) AS id, COALESCE(i.quantity_available, 0) AS quantity, "
+                   f"p.reorder_level FROM products p {db.clean_join} LEFT JOIN inventory i ON i.product_id = p.id "
+                   f"WHERE {db.active} GROUP BY {db.clean}")
+        with metrics.span("sql_stock_state"):
+            return {r["sku"]: (r["quantity"], r["reorder_level"]) for r in db.rows(sql, {}) if r["sku"]}
+
+    def first_skus(self, limit: int) -> list[str]:
+        """SKUs of the first `limit` active products in table order (warmup's fallback)."""
+        if limit <= 0:
+            return []
+        return [r["sku"] for r in self.db.rows(
+            f"SELECT p.sku FROM products p WHERE {self.db.active} ORDER BY p.id LIMIT :limit", {"limit": int(limit)},
+        )]
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def clear(self):
+        self._cache.clear()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Create or update the pushdown indexes (SQLite ops.db, or DATABASE_URL).")
+    ap.add_argument("db", nargs="?", default=os.environ.get("DB_PATH", "/data/ops.db"))
+    args = ap.parse_args()
+    url = os.environ.get("DATABASE_URL", "").strip()
+    if url:
+        from sqlalchemy import create_engine
+        db = PostgresDb(create_engine(url))
+    else:
+        db = SqliteDb(args.db)
+    synced = db.migrate()
+    print(f"indexes ready, {synced} cleaned SKUs synced, {db.count_products()} active products")
+
+
+if __name__ == "__main__":
+    main()
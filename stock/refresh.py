@@ -0,0 +1,113 @@
+"""Stale-while-revalidate holder for the inventory snapshot / master table.
+
+Only the very first load blocks. Afterwards, when the source version moves
+on, get() keeps returning the current value while one background thread
+builds the new one and swaps it in with a single reference assignment, so
+a rerun never waits on a rebuild and never sees a half-built value.
+
+    MAX_STALE_SECONDS=300   longest a stale value is served; past that (e.g. the
+                            background build keeps failing) the next get() rebuilds inline
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from stock import memory, metrics
+
+logger = logging.getLogger("stock.refresh")
+
+MAX_STALE_SECONDS = float(os.environ.get("MAX_STALE_SECONDS", "300") or 0)
+RETRY_SECONDS = 30.0
+
+
+class Served(NamedTuple):
+    version: Any
+    value: Any
+    built_at: float
+
+
+class StaleWhileRevalidate:
+    def __init__(self, build: Callable[[Any], Any], max_stale: float = MAX_STALE_SECONDS, name: str = "inventory"):
+        self._build = build
+        self.max_stale = max_stale
+        self.name = name
+        self._current: Optional[Served] = None
+        self._lock = threading.Lock()        # guards the bookkeeping below
+        self._build_lock = threading.Lock()  # one build at a time
+        self._pending = None
+        self._behind_since = None
+        self._retry_at = 0.0
+        self.latest = None
+        self.last_error: Optional[str] = None
+        self.swaps = 0
+
+    def get(self, version) -> Served:
+        """The value for `version` if built, else the current one while `version` builds in the background."""
+        self.latest = version
+        cur = self._current
+        if cur is not None and cur.version == version:
+            return cur
+        if cur is None:
+            return self._build_now(version)
+        now = time.monotonic()
+        with self._lock:
+            if self._behind_since is None:
+                self._behind_since = now
+            behind = now - self._behind_since
+            start = self._pending is None and now >= self._retry_at
+            if start:
+                self._pending = version
+        if start:
+            threading.Thread(target=self._revalidate, args=(version,), name=f"refresh-{self.name}", daemon=True).start()
+        if self.max_stale and behind > self.max_stale:
+            return self._build_now(version)
+        metrics.count("stock_stale_serves_total", source=self.name)
+        return cur
+
+    def rebuild(self, version) -> Served:
+        """Build `version` now even if it is already current (manual reload)."""
+        return self._build_now(version, force=True)
+
+    def _build_now(self, version, force: bool = False) -> Served:
+        with self._build_lock:
+            cur = self._current
+            if not force and cur is not None and cur.version == version:
+                return cur
+            with metrics.span(f"build_{self.name}"), memory.measure(self.name, version):
+                value = self._build(version)
+            served = Served(version, value, time.time())
+            with self._lock:
+                self._current = served
+                self._behind_since = None
+                self.last_error = None
+                self.swaps += 1
+            return served
+
+    def _revalidate(self, version):
+        try:
+            self._build_now(version)
+        except Exception as e:
+            logger.warning("background %s refresh failed, still serving %r: %r", self.name, self._current.version, e)
+            with self._lock:
+                self.last_error = repr(e)
+                self._retry_at = time.monotonic() + RETRY_SECONDS
+        finally:
+            with self._lock:
+                self._pending = None
+
+    @property
+    def current(self) -> Optional[Served]:
+        return self._current
+
+    def status(self) -> dict:
+        cur = self._current
+        return {
+            "version": cur.version if cur else None,
+            "built_at": cur.built_at if cur else None,
+            "stale": cur is not None and cur.version != self.latest,
+            "refreshing": self._pending is not None,
+            "last_error": self.last_error,
+            "swaps": self.swaps,
+        }
@@ -0,0 +1,104 @@
+"""Process-wide reload coordination for the 🔄 button.
+
+ReloadGate is single-flight: one caller runs the reload while concurrent
+callers wait for that same run instead of starting their own, and clicks
+within the cooldown after a successful reload are answered without doing
+any work. A reload that raises is reported as FAILED to its caller and to
+everyone who joined it, and starts no cooldown, so the next click retries.
+DirWatch tells whether a directory tree (the images folder) changed since
+the last reload, so image caches are only dropped when they could be stale.
+
+    RELOAD_COOLDOWN_SECONDS=30
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from stock import metrics
+
+COOLDOWN_SECONDS = float(os.environ.get("RELOAD_COOLDOWN_SECONDS", "30") or 0)
+
+RAN = "ran"
+JOINED = "joined"
+COOLDOWN = "cooldown"
+FAILED = "failed"
+
+
+class ReloadGate:
+    def __init__(self, cooldown: float = COOLDOWN_SECONDS):
+        self.cooldown = cooldown
+        self._cond = threading.Condition()
+        self._running = False
+        self._finished_at = None
+        self.runs = 0
+        self.failures = 0
+        self.last_error: Optional[BaseException] = None
+
+    def request(self, reload: Callable[[], None]) -> str:
+        """Run `reload` unless one is in flight (wait for it) or one just succeeded.
+        Returns RAN/JOINED/COOLDOWN, or FAILED (see last_error) when the run raised."""
+        with self._cond:
+            if self._running:
+                while self._running:
+                    self._cond.wait()
+                outcome = JOINED if self.last_error is None else FAILED
+            elif self._finished_at is not None and time.monotonic() - self._finished_at < self.cooldown:
+                outcome = COOLDOWN
+            else:
+                self._running = True
+                outcome = RAN
+        if outcome == RAN:
+            error = None
+            try:
+                with metrics.span("reload"):
+                    reload()
+            except Exception as e:
+                error = e
+                outcome = FAILED
+            finally:
+                with self._cond:
+                    self._running = False
+                    self.last_error = error
+                    if error is None:
+                        self._finished_at = time.monotonic()
+                        self.runs += 1
+                    else:
+                        self.failures += 1
+                    self._cond.notify_all()
+        metrics.count("stock_reload_requests_total", outcome=outcome)
+        return outcome
+
+    def seconds_until_ready(self) -> float:
+        if self._finished_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._finished_at))
+
+
+def dir_signature(root: str) -> tuple:
+    """(relative dir, mtime_ns) for every directory under root. Adding, removing or renaming a file bumps its dir's mtime."""
+    out = []
+    if not os.path.isdir(root):
+        return ()
+    for path, _, _ in os.walk(root):
+        try:
+            out.append((os.path.relpath(path, root), os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+    return tuple(sorted(out))
+
+
+class DirWatch:
+    def __init__(self, root: str):
+        self.root = root
+        self._sig = dir_signature(root)
+        self._lock = threading.Lock()
+
+    def changed(self) -> bool:
+        """True (once) if the tree changed since the last call."""
+        sig = dir_signature(self.root)
+        with self._lock:
+            if sig == self._sig:
+                return False
+            self._sig = sig
+            return True
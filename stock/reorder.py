@@ -0,0 +1,256 @@
+"""Recommended reorder levels from sales velocity and lead time.
+
+Stock status only means something when reorder_level (2.py: PORTAL MINIMUM
+STOCK) does. This batch job proposes a level for every SKU:
+
+    level = ceil(mean daily demand x lead time + z x std of daily demand x sqrt(lead time))
+
+z comes from the service level (0.95 -> 1.645): the share of lead times the
+level should cover without running out. Demand comes from one of:
+
+- the stock change feed (stock.changes), where a quantity drop between two
+  snapshots counts as units sold on that day;
+- a CSV export with columns sku, date, sold;
+- the stock workbook's Sales column: total sales over the period in its
+  header ("1-Jul-25 to 27-Apr-26"). It has no daily spread, so the standard
+  deviation is taken as Poisson (sqrt of the mean).
+
+The arithmetic is whole-array numpy: (sku, day) totals and per-SKU sums of
+squares are bincounts. A million SKU-days take well under a second
+(scripts/bench_reorder.py). Nothing is applied; the proposal is written
+next to the current levels:
+
+- an Excel folder gets "proposed reorder levels.xlsx";
+- a SQLite database gets a table proposed_reorder_levels;
+- --out writes .csv / .xlsx / .db anywhere.
+
+Each row holds the current and proposed level, their difference, the
+demand figures, and the status the SKU has now and would have.
+
+    REORDER_LEAD_DAYS=14        days from ordering to stock on the shelf
+    REORDER_SERVICE_LEVEL=0.95
+    REORDER_WINDOW_DAYS=90      history used (change feed / CSV)
+
+    python -m stock.reorder data                                    # workbook Sales column
+    python -m stock.reorder data --history data/stock_changes.db
+    python -m stock.reorder /data/ops.db --history /data/stock_changes.db
+    python -m stock.reorder /data/ops.db --history sales.csv --out proposed.csv
+"""
+import argparse
+import datetime
+import logging
+import os
+import re
+import sqlite3
+import time
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from stock import backends
+from stock.rules import IN_STOCK, LOW_STOCK, OUT_OF_STOCK, as_clean_item_no
+
+logger = logging.getLogger("stock.reorder")
+
+LEAD_DAYS = float(os.environ.get("REORDER_LEAD_DAYS", "14") or 14)
+SERVICE_LEVEL = float(os.environ.get("REORDER_SERVICE_LEVEL", "0.95") or 0.95)
+WINDOW_DAYS = int(os.environ.get("REORDER_WINDOW_DAYS", "90") or 90)
+
+TABLE = "proposed_reorder_levels"
+EXCEL_OUT = "proposed reorder levels.xlsx"
+SHEET_UNITS = 100  # the stock workbook counts hundreds of pieces; ExcelBackend scales quantities the same way
+DAY = 86400
+_PERIOD = re.compile(r"(\d{1,2}-[A-Za-z]{3}-\d{2,4})\s+to\s+(\d{1,2}-[A-Za-z]{3}-\d{2,4})")
+
+
+def sales_from_changes(path: str, window_days: int = WINDOW_DAYS, now: Optional[float] = None) -> tuple[pd.DataFrame, int]:
+    """(sku, day, sold) from the change feed's quantity drops in the last `window_days`,
+    and the number of days the feed covers in that window."""
+    now = time.time() if now is None else now
+    since = now - window_days * DAY
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+    try:
+        first = conn.execute("SELECT MIN(ts) FROM change_sets WHERE ts >= ?", (since,)).fetchone()[0]
+        sales = pd.read_sql_query(
+            "SELECT c.sku, s.ts, c.old_qty - c.new_qty AS sold "
+            "FROM stock_changes c JOIN change_sets s ON s.id = c.set_id "
+            "WHERE s.ts >= ? AND c.new_qty < c.old_qty", conn, params=(since,))
+    finally:
+        conn.close()
+    sales["day"] = (sales.pop("ts") // DAY).astype(np.int64)
+    days = 0 if first is None else int(now // DAY - first // DAY) + 1
+    return sales, days
+
+
+def sales_from_csv(path: str, window_days: int = WINDOW_DAYS) -> tuple[pd.DataFrame, int]:
+    """(sku, day, sold) from a CSV with columns sku, date, sold, cut to the last `window_days`."""
+    sales = pd.read_csv(path, dtype={"sku": str})
+    sales["day"] = pd.to_datetime(sales.pop("date")).to_numpy().astype("datetime64[D]").astype(np.int64)
+    if sales.empty:
+        return sales, 0
+    last = int(sales["day"].max())
+    sales = sales[sales["day"] > last - window_days]
+    return sales, int(min(window_days, last - sales["day"].min() + 1))
+
+
+def demand(sales: pd.DataFrame, days: int) -> pd.DataFrame:
+    """Per SKU over `days` days (a day without a row sold nothing): units sold and the
+    mean and standard deviation of daily demand."""
+    raw_codes, raw = pd.factorize(sales["sku"], use_na_sentinel=False)
+    clean_codes, skus = pd.factorize(np.array([as_clean_item_no(s) for s in raw], dtype=object), sort=True)
+    codes = clean_codes[raw_codes]  # clean each distinct SKU once, not every row
+    n = len(skus)
+    if not n or days <= 0:
+        return pd.DataFrame({"sku": [], "sold": [], "mean": [], "std": []})
+    day = sales["day"].to_numpy(np.int64)
+    sold = sales["sold"].to_numpy(np.float64)
+    # several snapshots (or CSV lines) on one day add up to that day's demand
+    first_day = day.min()
+    key = codes.astype(np.int64) * (day.max() - first_day + 1) + (day - first_day)
+    cells, cell = np.unique(key, return_inverse=True)
+    daily = np.bincount(cell, weights=sold)
+    owner = cells // (day.max() - first_day + 1)
+    total = np.bincount(owner, weights=daily, minlength=n)
+    squares = np.bincount(owner, weights=daily * daily, minlength=n)
+    mean = total / days
+    std = np.sqrt(np.maximum(squares / days - mean * mean, 0.0))
+    return pd.DataFrame({"sku": np.asarray(skus, dtype=object), "sold": total, "mean": mean, "std": std})
+
+
+def _date(text: str) -> datetime.date:
+    for fmt in ("%d-%b-%y", "%d-%b-%Y"):
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"not a d-Mon-yy date: {text!r}")
+
+
+def demand_from_sheet(path: str) -> pd.DataFrame:
+    """demand() figures from the stock workbook's Sales column, over the period in its header."""
+    df = pd.read_excel(path, usecols=[0, 1, 2], header=None)
+    period = None
+    for cell in df.iloc[:9, :2].to_numpy().ravel():
+        m = _PERIOD.search(str(cell))
+        if m:
+            period = (_date(m.group(1)), _date(m.group(2)))
+            break
+    if period is None:
+        raise ValueError(f"{path}: no '<d-Mon-yy> to <d-Mon-yy>' period in the header")
+    days = max(1, (period[1] - period[0]).days + 1)
+    df = df.iloc[9:]  # data starts below the column titles, as in ExcelBackend
+    sales = pd.DataFrame({"sku": df.iloc[:, 0].map(as_clean_item_no),
+                          "sold": pd.to_numeric(df.iloc[:, 1], errors="coerce").fillna(0) * SHEET_UNITS})
+    sales = sales[sales["sku"].str.isdigit()].drop_duplicates("sku")
+    mean = sales["sold"].to_numpy(np.float64) / days
+    return pd.DataFrame({"sku": sales["sku"].to_numpy(object), "sold": sales["sold"].to_numpy(np.float64),
+                         "mean": mean, "std": np.sqrt(mean)})
+
+
+def _status(quantity: np.ndarray, level: np.ndarray) -> np.ndarray:
+    """rules.get_stock_status's status, for whole arrays."""
+    return np.select([quantity <= 0, quantity <= level], [OUT_OF_STOCK, LOW_STOCK], IN_STOCK)
+
+
+def recommend(rows: list[dict], stats: pd.DataFrame, lead_days: float = LEAD_DAYS,
+              service_level: float = SERVICE_LEVEL) -> pd.DataFrame:
+    """Proposed level for every catalogue row (backend rows), diffed against its current level.
+    SKUs with no sales in the history get 0, i.e. no minimum."""
+    current = pd.DataFrame({
+        "sku": [as_clean_item_no(r["sku"]) for r in rows],
+        "quantity": pd.to_numeric(pd.Series([r["quantity"] for r in rows], dtype=object), errors="coerce"),
+        "current_level": pd.to_numeric(pd.Series([r["reorder_level"] for r in rows], dtype=object), errors="coerce"),
+    })
+    current = current[current["sku"] != ""].drop_duplicates("sku")  # the app shows a SKU's first row
+    df = current.merge(stats, on="sku", how="left")
+    df[["sold", "mean", "std"]] = df[["sold", "mean", "std"]].fillna(0.0)
+    quantity = np.trunc(df["quantity"].fillna(0).to_numpy())
+    level = df["current_level"].fillna(0).to_numpy()
+    z = NormalDist().inv_cdf(service_level)
+    proposed = np.ceil(df["mean"].to_numpy() * lead_days + z * df["std"].to_numpy() * np.sqrt(lead_days))
+    return pd.DataFrame({
+        "sku": df["sku"],
+        "quantity": quantity,
+        "current_level": level,
+        "proposed_level": proposed,
+        "change": proposed - level,
+        "units_sold": df["sold"],
+        "daily_demand": df["mean"].round(3),
+        "demand_std": df["std"].round(3),
+        "status": _status(quantity, level),
+        "proposed_status": _status(quantity, proposed),
+    })
+
+
+def write(proposal: pd.DataFrame, out: str):
+    """.csv / .xlsx as a file; anything else is a SQLite database that gets (or replaces) TABLE."""
+    if out.endswith(".csv"):
+        proposal.to_csv(out, index=False)
+    elif out.endswith(".xlsx"):
+        proposal.to_excel(out, index=False)
+    else:
+        conn = sqlite3.connect(out, timeout=30)
+        try:
+            proposal.assign(computed_at=time.time()).to_sql(TABLE, conn, if_exists="replace", index=False)
+        finally:
+            conn.close()
+
+
+def summary(proposal: pd.DataFrame, n: int = 10) -> str:
+    change = proposal["change"]
+    moved = proposal[proposal["status"] != proposal["proposed_status"]]
+    lines = [
+        f"{len(proposal)} SKUs: {int((change > 0).sum())} raised, {int((change < 0).sum())} lowered, "
+        f"{int((change == 0).sum())} unchanged",
+        f"{len(moved)} would change status: "
+        + ", ".join(f"{a} -> {b} {k}" for (a, b), k in moved.groupby(["status", "proposed_status"]).size().items()),
+    ]
+    top = proposal.reindex(change.abs().sort_values(ascending=False).index).head(n)
+    for r in top.itertuples():
+        lines.append(f"  {r.sku:>10s} {r.current_level:8.0f} -> {r.proposed_level:8.0f}  "
+                     f"({r.daily_demand:.2f}/day, qty {r.quantity:.0f}, {r.status} -> {r.proposed_status})")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Propose reorder levels from sales velocity and lead time.")
+    ap.add_argument("source", help="folder with the Excel workbooks, SQLite file or Postgres URL")
+    ap.add_argument("--history", default="",
+                    help="stock_changes.db or a sku,date,sold CSV (default for a workbook folder: its Sales column)")
+    ap.add_argument("--out", default="", help=".csv, .xlsx or a SQLite file (default: next to the source)")
+    ap.add_argument("--lead-days", type=float, default=LEAD_DAYS)
+    ap.add_argument("--service-level", type=float, default=SERVICE_LEVEL)
+    ap.add_argument("--window-days", type=int, default=WINDOW_DAYS)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    backend = backends.open_backend(args.source)
+    excel = isinstance(backend, backends.ExcelBackend)
+    out = args.out or (os.path.join(args.source, EXCEL_OUT) if excel
+                       else args.source if isinstance(backend, backends.SqliteBackend) else "")
+    if not out:
+        ap.error("--out is needed for a Postgres source")
+    if not args.history and not excel:
+        ap.error("--history is needed for a database source")
+
+    t0 = time.perf_counter()
+    if not args.history:
+        stats = demand_from_sheet(backend.files["stock"])
+    else:
+        load = sales_from_csv if args.history.endswith(".csv") else sales_from_changes
+        sales, days = load(args.history, args.window_days)
+        if not days:
+            raise SystemExit(f"{args.history}: no history in the last {args.window_days} days")
+        stats = demand(sales, days)
+        logger.info("%d sales rows over %d days", len(sales), days)
+    proposal = recommend(backend.fetch(), stats, args.lead_days, args.service_level)
+    logger.info("computed in %.2fs", time.perf_counter() - t0)
+    write(proposal, out)
+    print(summary(proposal))
+    print(f"written to {out}" + ("" if out.endswith((".csv", ".xlsx")) else f" (table {TABLE})"))
+
+
+if __name__ == "__main__":
+    main()
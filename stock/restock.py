@@ -0,0 +1,441 @@
+"""Back-in-stock notifications: dealers subscribe to an out-of-stock SKU and get one
+WhatsApp message when the stock change feed (stock.changes) says it is back.
+
+subscribe() stores (sku, phone) in a local SQLite queue. enqueue() reads new
+back_in_stock changes and turns each subscriber into an outbox row. The row's
+key (change set, sku, phone) is also its idempotency key, so re-reading the
+feed never queues a message twice. drain() sends the outbox with asyncio:
+
+- RESTOCK_CONCURRENCY workers each claim one row at a time, so a row is
+  never claimed long before its request goes out;
+- when the Graph API rate-limits (HTTP 429 or its throttling error codes),
+  every request waits for Retry-After, or else a growing pause;
+- other transient failures are retried with exponential backoff, up to
+  RESTOCK_MAX_ATTEMPTS.
+
+A claimed row is marked sent only after the API accepts it. Its claim time is
+the claim token: sent/retry/failed only apply while the row still carries
+it, and a claim older than CLAIM_SECONDS / 3 is renewed before every
+request. So several senders (one per worker process) never send the same
+key twice, even through long rate-limit pauses. If a sender dies
+mid-request, its claim is retried after CLAIM_SECONDS, so that message may
+be delivered twice. The key is passed as biz_opaque_callback_data so
+webhooks can spot the repeat.
+
+    RESTOCK_DB=path/to/restock_queue.db   ("" disables the feature)
+    RESTOCK_TEMPLATE=                     approved template name (one body parameter: the SKU);
+                                          the app only sends (and offers subscribing) when it is set
+    RESTOCK_TEMPLATE_LANG=hi
+    RESTOCK_CONCURRENCY=8  RESTOCK_MAX_ATTEMPTS=5  RESTOCK_POLL_SECONDS=30
+    GRAPH_API_URL=https://graph.facebook.com   (point at a local stub for testing)
+
+The sender runs on its own thread and event loop, so the UI never waits on it:
+
+    python -m stock.restock run            # standalone sender (META_* from the environment)
+    python -m stock.restock status
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import NamedTuple, Optional
+
+from stock import changes
+
+logger = logging.getLogger("stock.restock")
+
+TEMPLATE = os.environ.get("RESTOCK_TEMPLATE", "").strip()
+TEMPLATE_LANG = os.environ.get("RESTOCK_TEMPLATE_LANG", "hi").strip() or "hi"
+CONCURRENCY = int(os.environ.get("RESTOCK_CONCURRENCY", "8") or 8)
+MAX_ATTEMPTS = int(os.environ.get("RESTOCK_MAX_ATTEMPTS", "5") or 5)
+POLL_SECONDS = float(os.environ.get("RESTOCK_POLL_SECONDS", "30") or 30)
+GRAPH_API_URL = os.environ.get("GRAPH_API_URL", "https://graph.facebook.com").rstrip("/")
+CLAIM_SECONDS = 300
+# Graph API throttling: app / account / business-number / pair rate limits
+RATE_LIMIT_CODES = {4, 80007, 130429, 131048, 131056}
+MAX_RATE_LIMIT_WAITS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS restock_subscriptions (
+    sku TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (sku, phone)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS restock_outbox (
+    key TEXT PRIMARY KEY,
+    sku TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',   -- pending | sending | sent | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL,
+    message_id TEXT,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_restock_outbox_due ON restock_outbox (state, next_at);
+CREATE TABLE IF NOT EXISTS restock_cursor (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    set_id INTEGER NOT NULL
+);
+"""
+
+
+class Outgoing(NamedTuple):
+    key: str
+    sku: str
+    phone: str
+    attempts: int
+    claimed_at: float  # the claim token
+
+
+class Result(NamedTuple):
+    status: Optional[int]   # HTTP status, None when the request never got an answer
+    body: dict
+    retry_after: Optional[float]
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+    @property
+    def error_code(self) -> Optional[int]:
+        err = self.body.get("error") if isinstance(self.body, dict) else None
+        return err.get("code") if isinstance(err, dict) else None
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status == 429 or self.error_code in RATE_LIMIT_CODES
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status >= 500
+
+    def describe(self) -> str:
+        err = self.body.get("error") if isinstance(self.body, dict) else None
+        msg = err.get("message") if isinstance(err, dict) else ""
+        return f"{self.status} {self.error_code or ''} {msg}".strip()
+
+
+def backoff(attempts: int, cap: float = 600) -> float:
+    return min(cap, 2.0 ** attempts)
+
+
+class RestockQueue:
+    """Subscriptions and the outbox in one SQLite file; every method is one short transaction."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL: a power cut may lose the last commits, never corrupt
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._ready = True
+        return conn
+
+    def _write(self, fn):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return out
+        finally:
+            conn.close()
+
+    def subscribe(self, sku: str, phone: str) -> bool:
+        """False if this phone is already waiting for this SKU."""
+        return self._write(lambda c: c.execute(
+            "INSERT OR IGNORE INTO restock_subscriptions (sku, phone, created_at) VALUES (?, ?, ?)",
+            (sku, phone, time.time()),
+        ).rowcount == 1)
+
+    def enqueue(self, changes_db: str) -> int:
+        """Queue one message per subscriber for every back_in_stock change not seen yet; returns how many."""
+        def run(conn):
+            row = conn.execute("SELECT set_id FROM restock_cursor WHERE id = 1").fetchone()
+            since = row[0] if row else 0
+            found = changes.feed(changes_db, limit=1_000_000, since=since, kinds=["back_in_stock"])
+            queued = 0
+            now = time.time()
+            for c in sorted(found, key=lambda c: c["set_id"]):
+                phones = [r[0] for r in conn.execute("SELECT phone FROM restock_subscriptions WHERE sku = ?", (c["sku"],))]
+                for phone in phones:
+                    queued += conn.execute(
+                        "INSERT OR IGNORE INTO restock_outbox (key, sku, phone, next_at) VALUES (?, ?, ?, ?)",
+                        (f"{c['set_id']}:{c['sku']}:{phone}", c["sku"], phone, now),
+                    ).rowcount
+                # one message per subscription: subscribing again is needed for the next restock
+                conn.execute("DELETE FROM restock_subscriptions WHERE sku = ?", (c["sku"],))
+            if found:
+                conn.execute("INSERT OR REPLACE INTO restock_cursor (id, set_id) VALUES (1, ?)",
+                             (max(c["set_id"] for c in found),))
+            return queued
+        return self._write(run)
+
+    def claim(self, n: int) -> list[Outgoing]:
+        """Take up to `n` due rows (and claims abandoned for CLAIM_SECONDS) for this sender."""
+        def run(conn):
+            now = time.time()
+            rows = conn.execute(
+                "SELECT key, sku, phone, attempts FROM restock_outbox "
+                "WHERE (state = 'pending' AND next_at <= ?) OR (state = 'sending' AND claimed_at < ?) "
+                "ORDER BY next_at LIMIT ?",
+                (now, now - CLAIM_SECONDS, int(n)),
+            ).fetchall()
+            conn.executemany("UPDATE restock_outbox SET state = 'sending', claimed_at = ? WHERE key = ?",
+                             ((now, r[0]) for r in rows))
+            return [Outgoing(*r, now) for r in rows]
+        return self._write(run)
+
+    def _update(self, msg: Outgoing, sets: str, params: tuple) -> bool:
+        """Apply `sets` to msg's row only while this sender's claim holds; False if another took it."""
+        return self._write(lambda c: c.execute(
+            f"UPDATE restock_outbox SET {sets} WHERE key = ? AND state = 'sending' AND claimed_at = ?",
+            params + (msg.key, msg.claimed_at)).rowcount == 1)
+
+    def renew(self, msg: Outgoing) -> Optional[Outgoing]:
+        """Refresh the claim before a request; None if it was lost (the row went to another sender)."""
+        now = time.time()
+        return msg._replace(claimed_at=now) if self._update(msg, "claimed_at = ?", (now,)) else None
+
+    def sent(self, msg: Outgoing, message_id: str) -> bool:
+        return self._update(msg, "state = 'sent', sent_at = ?, message_id = ?, last_error = NULL",
+                            (time.time(), message_id))
+
+    def retry(self, msg: Outgoing, attempts: int, error: str, delay: float) -> bool:
+        return self._update(msg, "state = 'pending', attempts = ?, next_at = ?, last_error = ?",
+                            (attempts, time.time() + delay, error))
+
+    def failed(self, msg: Outgoing, attempts: int, error: str) -> bool:
+        return self._update(msg, "state = 'failed', attempts = ?, last_error = ?", (attempts, error))
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        try:
+            out = dict(conn.execute("SELECT state, COUNT(*) FROM restock_outbox GROUP BY state").fetchall())
+            out["subscriptions"] = conn.execute("SELECT COUNT(*) FROM restock_subscriptions").fetchone()[0]
+            return out
+        finally:
+            conn.close()
+
+
+class GraphSender:
+    """Blocking Cloud API client for one business number; drain() runs it on worker threads."""
+
+    def __init__(self, access_token: str, phone_number_id: str, api_version: str = "v25.0",
+                 base_url: str = GRAPH_API_URL, template: str = TEMPLATE, lang: str = TEMPLATE_LANG,
+                 timeout: float = 10):
+        self.url = f"{base_url}/{api_version}/{phone_number_id}/messages"
+        self.access_token = access_token
+        self.template = template
+        self.lang = lang
+        self.timeout = timeout
+
+    def payload(self, msg: Outgoing) -> dict:
+        body = {
+            "messaging_product": "whatsapp",
+            "to": msg.phone,
+            "biz_opaque_callback_data": msg.key,
+        }
+        if self.template:
+            body.update(type="template", template={
+                "name": self.template,
+                "language": {"code": self.lang},
+                "components": [{"type": "body", "parameters": [{"type": "text", "text": msg.sku}]}],
+            })
+        else:
+            body.update(type="text", text={"body": f"✅ आइटम {msg.sku} फिर से स्टॉक में उपलब्ध है। - Jyoti Cards"})
+        return body
+
+    def post(self, msg: Outgoing) -> Result:
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(self.payload(msg)).encode("utf-8"),
+            headers={"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return Result(resp.status, _json(resp.read()), None)
+        except urllib.error.HTTPError as e:
+            return Result(e.code, _json(e.read()), _seconds(e.headers.get("Retry-After")))
+        except (urllib.error.URLError, TimeoutError, OSError) as e:
+            return Result(None, {"error": {"message": str(e)}}, None)
+
+
+def _json(raw: bytes) -> dict:
+    try:
+        return json.loads(raw or b"{}")
+    except ValueError:
+        return {}
+
+
+def _seconds(value) -> Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class _RateGate:
+    """Shared pause: once the API throttles, no request goes out until it has passed."""
+
+    def __init__(self):
+        self.until = 0.0
+        self.strikes = 0
+
+    def pause(self, seconds: Optional[float]):
+        now = time.monotonic()
+        if now >= self.until:  # requests already in flight when the pause began don't lengthen it
+            self.strikes += 1
+        wait = seconds if seconds is not None else min(30.0, 0.5 * 2 ** (self.strikes - 1))
+        self.until = max(self.until, now + wait)
+
+    def ok(self):
+        self.strikes = 0
+
+    async def wait(self):
+        delay = self.until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def drain(queue: RestockQueue, sender, concurrency: int = CONCURRENCY,
+                max_attempts: int = MAX_ATTEMPTS) -> dict:
+    """Send every due outbox row; returns counts of sent / retry / failed (and claims lost)."""
+    gate = _RateGate()
+    counts = {"sent": 0, "retry": 0, "failed": 0, "rate_limited": 0, "lost": 0}
+
+    async def send(msg: Outgoing) -> str:
+        for _ in range(MAX_RATE_LIMIT_WAITS):
+            await gate.wait()
+            if time.time() - msg.claimed_at > CLAIM_SECONDS / 3:
+                msg = await asyncio.to_thread(queue.renew, msg)
+                if msg is None:
+                    return "lost"
+            result = await asyncio.to_thread(sender.post, msg)
+            if not result.rate_limited:
+                break
+            counts["rate_limited"] += 1
+            gate.pause(result.retry_after)
+        else:
+            done = await asyncio.to_thread(queue.retry, msg, msg.attempts, result.describe(), backoff(gate.strikes, cap=60))
+            return "retry" if done else "lost"
+        if result.ok:
+            gate.ok()
+            ids = result.body.get("messages") or [{}]
+            done = await asyncio.to_thread(queue.sent, msg, str(ids[0].get("id", "")))
+            return "sent" if done else "lost"
+        attempts = msg.attempts + 1
+        if result.retryable and attempts < max_attempts:
+            done = await asyncio.to_thread(queue.retry, msg, attempts, result.describe(), backoff(attempts))
+            return "retry" if done else "lost"
+        if not await asyncio.to_thread(queue.failed, msg, attempts, result.describe()):
+            return "lost"
+        logger.warning("restock message %s failed: %s", msg.key, result.describe())
+        return "failed"
+
+    async def worker():
+        # one row per claim: nothing sits claimed while other requests are in flight
+        while True:
+            rows = await asyncio.to_thread(queue.claim, 1)
+            if not rows:
+                return
+            outcome = await send(rows[0])
+            counts[outcome] += 1
+            if outcome == "lost":
+                logger.warning("restock message %s: claim taken over by another sender", rows[0].key)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return counts
+
+
+class Notifier:
+    """Daemon thread: every poll, queue new restocks and drain the outbox on its own event loop."""
+
+    def __init__(self, queue: RestockQueue, sender, changes_db: str, poll_seconds: float = POLL_SECONDS):
+        self.queue = queue
+        self.sender = sender
+        self.changes_db = changes_db
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self.last = {}
+
+    def start(self) -> "Notifier":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="restock-notifier", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> dict:
+        queued = self.queue.enqueue(self.changes_db)
+        counts = asyncio.run(drain(self.queue, self.sender))
+        self.last = dict(counts, queued=queued, at=time.time())
+        return self.last
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("restock notifier pass failed")
+            self._stop.wait(self.poll_seconds)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Back-in-stock WhatsApp notifications.")
+    ap.add_argument("command", choices=["run", "status", "subscribe"])
+    ap.add_argument("args", nargs="*", help="subscribe: SKU PHONE")
+    ap.add_argument("--db", default=os.environ.get("RESTOCK_DB", "data/restock_queue.db"))
+    ap.add_argument("--changes-db", default=os.environ.get("CHANGES_DB", "data/stock_changes.db"))
+    ap.add_argument("--once", action="store_true", help="run: one pass, then exit")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    queue = RestockQueue(args.db)
+    if args.command == "subscribe":
+        sku, phone = args.args
+        print("subscribed" if queue.subscribe(sku, phone) else "already subscribed")
+    elif args.command == "status":
+        print(queue.stats())
+    else:
+        if not TEMPLATE:
+            ap.error("set RESTOCK_TEMPLATE: messages outside the 24h service window need an approved template")
+        sender = GraphSender(os.environ["META_ACCESS_TOKEN"], os.environ["META_PHONE_NUMBER_ID"],
+                             os.environ.get("META_API_VERSION", "v25.0"))
+        notifier = Notifier(queue, sender, args.changes_db)
+        if args.once:
+            print(notifier.run_once())
+            return
+        notifier.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            notifier.stop()
+
+
+if __name__ == "__main__":
+    main()
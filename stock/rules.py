@@ -0,0 +1,106 @@
+"""Catalogue rules shared by both apps and every data source: SKU cleaning, stock status, photo lookup.
+
+app.py and 2.py used to carry their own copies, which had drifted:
+
+- 2.py dropped non-numeric item numbers, while app.py kept the text.
+- 2.py raised on a zero minimum stock, and app.py read it as "no minimum".
+- They tried the photo extensions in different orders.
+
+One copy here keeps the Excel, SQLite and Postgres catalogues agreeing.
+scripts/check_parity.py compares these rules with the ones they replaced.
+"""
+import math
+import os
+import re
+from typing import Optional
+
+IN_STOCK = "In Stock"
+LOW_STOCK = "Low Stock"
+OUT_OF_STOCK = "Out of Stock"
+
+IMAGE_DIR = "images"
+IMAGE_EXTS = ("jpeg", "jpg", "png", "JPG", "JPEG", "PNG")
+
+
+def as_clean_item_no(x) -> str:
+    """First run of digits ("#1002-A" -> "1002"), else the stripped text; None/NaN -> ""."""
+    if x is None or (isinstance(x, float) and math.isnan(x)):
+        return ""
+    s = str(x).strip()
+    if not s:
+        return ""
+    m = re.search(r'(\d+)', s)
+    return m.group(1) if m else s
+
+
+def _int(v) -> int:
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError, OverflowError):  # junk, NaN, inf
+        return 0
+
+
+def _level(v) -> float:
+    try:
+        r = float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return r if math.isfinite(r) else 0.0
+
+
+def get_stock_status(quantity, reorder_level):
+    """(status, percentage of the reorder level held).
+
+    - quantity <= 0                  -> Out of Stock, 0
+    - 0 < quantity <= reorder_level  -> Low Stock, quantity / reorder_level
+    - quantity > reorder_level       -> In Stock, 100
+
+    A missing, blank or zero reorder level (2.py's minimum stock) means any
+    stock is In Stock. Quantities count whole pieces.
+    """
+    q = _int(quantity)
+    r = _level(reorder_level)  # a workbook minimum may be fractional
+    if q <= 0:
+        return OUT_OF_STOCK, 0
+    if q <= r:
+        return LOW_STOCK, min(100, int((q / max(r, 1)) * 100))
+    return IN_STOCK, 100
+
+
+def _digits(s: str) -> str:
+    d = "".join(ch for ch in str(s) if ch.isdigit())
+    return d.lstrip('0') or d
+
+
+def find_image_path(item_no: str, root: str = IMAGE_DIR) -> Optional[str]:
+    """Primary: {root}/{sku}.jpeg (then the other extensions); fallback: recursive search by digits."""
+    if not item_no:
+        return None
+    for ext in IMAGE_EXTS:
+        p = os.path.join(root, f'{item_no}.{ext}')
+        if os.path.exists(p):
+            return p
+    want = _digits(item_no)
+    if not want:
+        return None
+    exts = {f'.{e}' for e in IMAGE_EXTS}
+    best, best_score = None, (999, 999999)
+    for folder, _, files in os.walk(root):
+        for fname in files:
+            name_no_ext, ext = os.path.splitext(fname)
+            if ext not in exts:
+                continue
+            full = os.path.join(folder, fname)
+            name_digits = _digits(name_no_ext)
+            score = None
+            if name_digits == want and name_no_ext == item_no:
+                score = 0
+            elif name_digits == want:
+                score = 1
+            elif want in _digits(fname):
+                score = 2
+            if score is not None:
+                cand = (score, len(full))
+                if cand < best_score:
+                    best_score, best = cand, full
+    return best
@@ -0,0 +1,338 @@
+"""Per-snapshot search indexes over the inventory rows.
+
+Built once when a snapshot is loaded and then shared read-only by every
+session, so per-query work is a handful of probes instead of a row scan.
+"""
+import logging
+import re
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import nsmallest
+from typing import Iterable, Optional
+
+from stock.rules import as_clean_item_no as clean_sku  # snapshot and pushdown import it from here
+from stock.translit import phonetic_words
+
+logger = logging.getLogger("stock.search_index")
+
+# packed key layout: hash(variant) | deletes used (2 bits) | sku id (20 bits, ~1M SKUs)
+_ID_BITS = 20
+_ID_MASK = (1 << _ID_BITS) - 1
+_DEL_SHIFT = _ID_BITS
+_LOW_BITS = _ID_BITS + 2
+_HASH_MASK = (1 << (64 - _LOW_BITS)) - 1
+
+
+def canonical_query(text, max_len: int = 64) -> str:
+    """Search box text as used for lookups and cache keys: NFKC (full-width digits,
+    ligatures), whitespace runs collapsed, trimmed to `max_len` characters."""
+    s = unicodedata.normalize("NFKC", str(text or ""))
+    return " ".join(s.split())[:max_len].strip()
+
+
+def sku_prefix(words: list) -> str:
+    """The lower-cased single word typed, when all of it could start a cleaned SKU ("#" allowed
+    in front): "1oo1" is a typo to correct, not the prefix "1" of every SKU starting with 1."""
+    if len(words) != 1:
+        return ""
+    token = words[0].lower().lstrip("#")
+    return token if token and clean_sku(token).lower() == token else ""
+
+
+def typed_sku(query: str) -> str:
+    """A one-word query as typed (lower-cased, no leading "#"), for typo correction: cleaning
+    "1OO1" would leave "1". Longer queries fall back to their cleaned SKU."""
+    words = str(query or "").strip().lower().split()
+    if len(words) == 1 and words[0].lstrip("#"):
+        return words[0].lstrip("#")
+    return clean_sku(query)
+
+
+def _deletes(word: str, max_distance: int) -> dict:
+    """Every variant of `word` with up to max_distance characters removed -> fewest deletes needed."""
+    out = {word: 0}
+    frontier = [word]
+    for d in range(1, max_distance + 1):
+        nxt = []
+        for w in frontier:
+            for i in range(len(w)):
+                v = w[:i] + w[i + 1:]
+                if v not in out:
+                    out[v] = d
+                    nxt.append(v)
+        frontier = nxt
+    return out
+
+
+def _hash(s: str) -> int:
+    # not hash(): str hashes are salted per process and the keys may be shared via a snapshot file
+    b = s.encode("utf-8")
+    return ((zlib.crc32(b) << 10) ^ zlib.crc32(b, 0x5BD1E995)) & _HASH_MASK
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance (adjacent swaps count as 1); returns limit+1 once exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insert, delete, substitution or adjacent swap."""
+    la, lb = len(a), len(b)
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    if lb - la > 1:
+        return False
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if i == la:
+        return True
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    return a[i:] == b[i + 1:]
+
+
+class FuzzySkuIndex:
+    """Symmetric-delete index for "did you mean" SKU suggestions.
+
+    Every cleaned SKU contributes all its variants with up to `max_distance`
+    characters deleted. Instead of a dict of strings (hundreds of MB at 100k
+    SKUs) each variant is stored as one packed 64-bit int in a sorted array.
+    Lookups run in tiers: distance 1 first (only variants with at most one
+    delete on either side, verified without a DP), widening to 2 only when
+    nothing is within one edit.
+    """
+
+    min_query_len = 3
+
+    def __init__(self, skus: Iterable[str], max_distance: int = 2):
+        self.max_distance = max(1, min(int(max_distance), 3))
+        self.skus = sorted({clean_sku(s) for s in skus} - {""})
+        packed = []
+        if len(self.skus) > _ID_MASK + 1:
+            # ids past _ID_MASK would spill into the deletes field and suggest the wrong SKUs
+            logger.warning("%d SKUs is more than the fuzzy index can number (%d); no suggestions",
+                           len(self.skus), _ID_MASK + 1)
+            self.skus = []
+        for sku_id, sku in enumerate(self.skus):
+            for variant, d in _deletes(sku, self.max_distance).items():
+                packed.append((_hash(variant) << _LOW_BITS) | (d << _DEL_SHIFT) | sku_id)
+        packed.sort()
+        self._keys = array('Q', packed)
+
+    @classmethod
+    def from_parts(cls, skus, keys, max_distance: int = 2) -> "FuzzySkuIndex":
+        """Rebuild from stored `skus` / `keys` sequences (e.g. views into a snapshot file)."""
+        self = cls.__new__(cls)
+        self.max_distance = max_distance
+        self.skus = skus
+        self._keys = keys
+        return self
+
+    def parts(self) -> dict:
+        return {"skus": self.skus, "keys": self._keys, "max_distance": self.max_distance}
+
+    def __len__(self):
+        return len(self.skus)
+
+    def _candidates(self, variants: dict, tier: int) -> set:
+        keys = self._keys
+        n = len(keys)
+        out = set()
+        for variant, q_del in variants.items():
+            if q_del > tier:
+                continue
+            # within one hash bucket keys are ordered by deletes used, so stop past the tier
+            lo_key = _hash(variant) << _LOW_BITS
+            hi_key = lo_key | (tier << _DEL_SHIFT) | _ID_MASK
+            i = bisect_left(keys, lo_key)
+            while i < n and keys[i] <= hi_key:
+                out.add(keys[i] & _ID_MASK)
+                i += 1
+        return out
+
+    def lookup(self, query: str, limit: int = 5, max_distance: Optional[int] = None) -> list[tuple[str, int]]:
+        """Closest cleaned SKUs as (sku, distance), nearest first; exact matches excluded."""
+        q = typed_sku(query)
+        if len(q) < self.min_query_len or not self.skus:
+            return []
+        max_d = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        variants = _deletes(q, max_d)
+        scored = []
+        for tier in range(1, max_d + 1):
+            scored = []
+            for sku_id in self._candidates(variants, tier):
+                sku = self.skus[sku_id]
+                if sku == q:
+                    continue
+                d = (1 if within_one_edit(q, sku) else 2) if tier == 1 else edit_distance(q, sku, tier)
+                if d <= tier:
+                    scored.append((d, abs(len(sku) - len(q)), sku))
+            if scored:
+                break  # suggest only the nearest tier; a distance-2 guess next to a 1 is noise
+        scored.sort()
+        return [(sku, d) for d, _, sku in scored[:limit]]
+
+
+class PrefixIndex:
+    """Sorted term arrays for prefix completion over cleaned SKUs and lowercase name tokens.
+
+    A completion is two bisects plus a short walk of the matching range, so it
+    never touches the inventory rows. SKU completions rank ahead of name ones.
+    """
+
+    min_name_prefix = 2
+
+    def __init__(self, entries: Iterable[tuple[str, str]]):
+        """entries: (sku, name) pairs; each SKU is completed at most once."""
+        self.skus = []
+        sku_terms, name_terms = [], []
+        for sku_id, (sku, name) in enumerate(entries):
+            clean = clean_sku(sku)
+            self.skus.append(clean)
+            sku_terms.append((clean.lower(), sku_id))
+            for token in set(re.findall(r'\w+', str(name or '').lower())):
+                name_terms.append((token, sku_id))
+        sku_terms.sort()
+        name_terms.sort()
+        self._sku_terms = [t for t, _ in sku_terms]
+        self._sku_ids = array('I', [i for _, i in sku_terms])
+        self._name_terms = [t for t, _ in name_terms]
+        self._name_ids = array('I', [i for _, i in name_terms])
+
+    @classmethod
+    def from_parts(cls, skus, sku_terms, sku_ids, name_terms, name_ids) -> "PrefixIndex":
+        """Rebuild from stored sequences (e.g. views into a snapshot file)."""
+        self = cls.__new__(cls)
+        self.skus = skus
+        self._sku_terms, self._sku_ids = sku_terms, sku_ids
+        self._name_terms, self._name_ids = name_terms, name_ids
+        return self
+
+    def parts(self) -> dict:
+        return {
+            "skus": self.skus,
+            "sku_terms": self._sku_terms,
+            "sku_ids": self._sku_ids,
+            "name_terms": self._name_terms,
+            "name_ids": self._name_ids,
+        }
+
+    def __len__(self):
+        return len(self.skus)
+
+    @staticmethod
+    def _walk(terms, ids, prefix: str, limit: int, seen: set, out: list):
+        i = bisect_left(terms, prefix)
+        while i < len(terms) and len(out) < limit and terms[i].startswith(prefix):
+            sku_id = ids[i]
+            if sku_id not in seen:
+                seen.add(sku_id)
+                out.append(sku_id)
+            i += 1
+
+    def complete(self, prefix: str, limit: int = 8) -> list[str]:
+        """Up to `limit` cleaned SKUs whose SKU or a name word starts with `prefix`."""
+        words = (prefix or "").strip().lower().split()
+        if not words:
+            return []
+        seen, out = set(), []
+        token = sku_prefix(words)
+        if token:
+            self._walk(self._sku_terms, self._sku_ids, token, limit, seen, out)
+        # complete on the last word typed; earlier words are left to the name search
+        last = words[-1]
+        if len(out) < limit and len(last) >= self.min_name_prefix:
+            self._walk(self._name_terms, self._name_ids, last, limit, seen, out)
+        return [self.skus[i] for i in out]
+
+
+class PhoneticIndex:
+    """Posting lists over the phonetic words (stock.translit) of every row's name and description.
+
+    "शुभ विवाह", "shubh vivah" and "subh wivaah" all fold to the same words, so
+    a search in either script is two bisects per word typed into the sorted
+    distinct words, and no name is transliterated at query time. Every word is
+    a prefix, as in the full-text search; rows whose name holds all the words
+    rank ahead of description hits.
+    """
+
+    min_prefix = 2
+
+    def __init__(self, entries: Iterable[tuple[str, str]]):
+        """entries: (name, description) per row, in row order."""
+        postings = {}
+        for row, (name, description) in enumerate(entries):
+            for w in set(phonetic_words(name)):
+                postings.setdefault(w, []).append(row << 1)
+            for w in set(phonetic_words(description)):
+                postings.setdefault(w, []).append(row << 1 | 1)  # low bit: a description word
+        self._terms = sorted(postings)
+        self._starts, self._ids = array('Q'), array('I')
+        for t in self._terms:
+            self._starts.append(len(self._ids))
+            self._ids.extend(postings[t])
+        self._starts.append(len(self._ids))
+
+    @classmethod
+    def from_parts(cls, terms, starts, ids) -> "PhoneticIndex":
+        """Rebuild from stored sequences (e.g. views into a snapshot file)."""
+        self = cls.__new__(cls)
+        self._terms, self._starts, self._ids = terms, starts, ids
+        return self
+
+    def parts(self) -> dict:
+        return {"terms": self._terms, "starts": self._starts, "ids": self._ids}
+
+    def __len__(self):
+        return len(self._terms)
+
+    def _postings(self, word: str):
+        """Row ids for `word` (words shorter than min_prefix) or every word it begins."""
+        terms = self._terms
+        lo = bisect_left(terms, word)
+        if len(word) < self.min_prefix:
+            hi = bisect_right(terms, word, lo)
+        else:
+            hi = bisect_left(terms, word + "\U0010ffff", lo)
+        return self._ids[self._starts[lo]:self._starts[hi]]
+
+    def lookup(self, query: str, limit: int = 10, first: Iterable[int] = ()) -> tuple[int, list[int]]:
+        """(total, best `limit` row numbers) of the rows matching every word of `query`, added
+        to the rows in `first` (e.g. plain name matches), which keep their order ahead of them."""
+        first = list(first)
+        postings = sorted((self._postings(w) for w in dict.fromkeys(phonetic_words(query))), key=len)
+        hits = in_name = None
+        for ids in postings:  # rarest word first, so the sets only shrink
+            rows = {k >> 1 for k in ids}
+            names = {k >> 1 for k in ids if not k & 1}
+            hits = rows if hits is None else hits & rows
+            in_name = names if in_name is None else in_name & names
+            if not hits:
+                break
+        extra = (hits or set()).difference(first)
+        out = first[:limit]
+        if len(out) < limit and extra:
+            out += nsmallest(limit - len(out), extra, key=lambda r: (r not in in_name, r))
+        return len(first) + len(extra), out
@@ -0,0 +1,364 @@
+"""Prepared inventory snapshot in one compact binary file that worker processes memory-map.
+
+Layout: MAGIC, u64 header length, a JSON header {version, rows, sections} and
+then 8-byte aligned sections. Numeric columns are native arrays read through
+memoryview.cast and strings are (start, length) pairs into a UTF-8 blob, so
+opening a snapshot copies nothing: every Streamlit process on the host shares
+the same page-cache pages, and memory stays flat as workers are added.
+
+The file also carries the lookup indexes (SKU order, lowercase names,
+categories, fuzzy, prefix and phonetic indexes), so a reload is done once per
+host by whichever worker first sees a new version; the rest just map the new
+file.
+"""
+import contextlib
+import json
+import math
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Sequence
+from typing import Callable, Optional
+
+from stock.search_index import FuzzySkuIndex, PhoneticIndex, PrefixIndex, clean_sku
+
+try:
+    import fcntl
+except ImportError:  # Windows: no host lock, concurrent rebuilds just race to the rename
+    fcntl = None
+
+MAGIC = b"JCSNAP02"  # bumped with the layout, so an older file is rebuilt rather than misread
+NULL_ID = -(1 << 63)
+STR_COLUMNS = ("sku", "name", "description", "image_path", "category")
+NUM_COLUMNS = ("reorder_level", "quantity")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _tupled(v):
+    return tuple(_tupled(x) for x in v) if isinstance(v, list) else v
+
+
+def _num(v: float):
+    if math.isnan(v):
+        return None
+    return int(v) if v.is_integer() else v
+
+
+def _to_float(v) -> float:
+    try:
+        return float(v) if v is not None else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class StrColumn(Sequence):
+    """Lazily decoded strings (None allowed) stored as starts/lengths into a UTF-8 blob."""
+
+    __slots__ = ("_starts", "_lens", "_blob")
+
+    def __init__(self, starts, lens, blob):
+        self._starts, self._lens, self._blob = starts, lens, blob
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = self._lens[i]
+        if n < 0:
+            return None
+        s = self._starts[i]
+        return str(self._blob[s:s + n], "utf-8")
+
+
+class _Writer:
+    def __init__(self):
+        self.sections = {}
+
+    def array(self, name: str, typecode: str, values):
+        self.sections[name] = (typecode, array(typecode, values).tobytes())
+
+    def strings(self, name: str, values):
+        starts, lens, blob = array("Q"), array("i"), bytearray()
+        for v in values:
+            starts.append(len(blob))
+            if v is None:
+                lens.append(-1)
+                continue
+            b = str(v).encode("utf-8")
+            lens.append(len(b))
+            blob += b
+        self.sections[f"{name}.starts"] = ("Q", starts.tobytes())
+        self.sections[f"{name}.lens"] = ("i", lens.tobytes())
+        self.sections[f"{name}.blob"] = ("B", bytes(blob))
+
+    def tobytes(self, version, rows: int) -> bytes:
+        layout, offset = {}, 0
+        for name, (typecode, data) in self.sections.items():
+            layout[name] = [offset, len(data), typecode]
+            offset = _align(offset + len(data))
+        header = json.dumps({"version": version, "rows": rows, "sections": layout}).encode("utf-8")
+        base = _align(16 + len(header))
+        out = bytearray(base + offset)
+        out[:8] = MAGIC
+        struct.pack_into("<Q", out, 8, len(header))
+        out[16:16 + len(header)] = header
+        for name, (_, data) in self.sections.items():
+            start = base + layout[name][0]
+            out[start:start + len(data)] = data
+        return bytes(out)
+
+
+def build(rows: list[dict], version) -> bytes:
+    """Serialize inventory rows plus their lookup indexes."""
+    w = _Writer()
+    n = len(rows)
+    w.array("id", "q", (NULL_ID if r.get("id") is None else int(r["id"]) for r in rows))
+    for col in NUM_COLUMNS:
+        w.array(col, "d", (_to_float(r.get(col)) for r in rows))
+    for col in STR_COLUMNS:
+        w.strings(col, (r.get(col) for r in rows))
+
+    cleans = [clean_sku(r.get("sku")) for r in rows]
+    w.strings("clean", cleans)
+    w.array("sku_order", "I", sorted((i for i in range(n) if cleans[i]), key=lambda i: (cleans[i], i)))
+
+    # lowercase names joined by newlines; name i starts at name_starts[i], name_starts[n] is the end
+    names_lc = [str(r.get("name") or "").lower().replace("\n", " ").encode("utf-8") for r in rows]
+    starts, pos = array("Q"), 0
+    for b in names_lc:
+        starts.append(pos)
+        pos += len(b) + 1
+    starts.append(pos)
+    w.sections["names_lc"] = ("B", b"\n".join(names_lc) + b"\n")
+    w.sections["name_starts"] = ("Q", starts.tobytes())
+
+    by_category = {}
+    for i, r in enumerate(rows):
+        by_category.setdefault(r.get("category"), []).append(i)
+    categories = list(by_category)
+    w.strings("categories", categories)
+    cat_rows, cat_starts = array("I"), array("Q")
+    for c in categories:
+        cat_starts.append(len(cat_rows))
+        cat_rows.extend(by_category[c])
+    cat_starts.append(len(cat_rows))
+    w.sections["cat_rows"] = ("I", cat_rows.tobytes())
+    w.sections["cat_starts"] = ("Q", cat_starts.tobytes())
+
+    first = {}
+    for i, c in enumerate(cleans):
+        if c:
+            first.setdefault(c, i)
+    fuzzy = FuzzySkuIndex(first)
+    w.strings("fuzzy.skus", fuzzy.skus)
+    w.sections["fuzzy.keys"] = ("Q", fuzzy.parts()["keys"].tobytes())
+    prefix = PrefixIndex((c, rows[i].get("name")) for c, i in first.items())
+    parts = prefix.parts()
+    for name in ("skus", "sku_terms", "name_terms"):
+        w.strings(f"prefix.{name}", parts[name])
+    for name in ("sku_ids", "name_ids"):
+        w.sections[f"prefix.{name}"] = ("I", parts[name].tobytes())
+    phonetic = PhoneticIndex((r.get("name"), r.get("description")) for r in rows)
+    parts = phonetic.parts()
+    w.strings("phonetic.terms", parts["terms"])
+    w.sections["phonetic.starts"] = ("Q", parts["starts"].tobytes())
+    w.sections["phonetic.ids"] = ("I", parts["ids"].tobytes())
+    return w.tobytes(version, n)
+
+
+class _Keyed(Sequence):
+    """column[order[j]]: lets bisect search a column through a sort permutation."""
+
+    __slots__ = ("_column", "_order")
+
+    def __init__(self, column, order):
+        self._column, self._order = column, order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, j):
+        return self._column[self._order[j]]
+
+
+class Snapshot(Sequence):
+    """Read-only inventory rows (decoded to dicts on access) plus lookup indexes."""
+
+    def __init__(self, buf, path: Optional[str] = None):
+        self._buf = buf
+        self.path = path
+        mv = memoryview(buf)
+        if bytes(mv[:8]) != MAGIC:
+            raise ValueError("not an inventory snapshot")
+        (hlen,) = struct.unpack_from("<Q", mv, 8)
+        header = json.loads(bytes(mv[16:16 + hlen]))
+        base = _align(16 + hlen)
+        self.version = _tupled(header["version"])
+        self._n = header["rows"]
+        self._offsets = {}
+        self._s = {}
+        for name, (off, length, typecode) in header["sections"].items():
+            self._offsets[name] = base + off
+            view = mv[base + off:base + off + length]
+            self._s[name] = view if typecode == "B" else view.cast(typecode)
+        self.nbytes = len(mv)
+
+        self._ids = self._s["id"]
+        self._cols = {c: self._strings(c) for c in STR_COLUMNS}
+        self._cols.update({c: self._s[c] for c in NUM_COLUMNS})
+        self._clean = self._strings("clean")
+        self._by_sku = _Keyed(self._clean, self._s["sku_order"])
+        cat_starts = self._s["cat_starts"]
+        self._categories = {c: (cat_starts[i], cat_starts[i + 1]) for i, c in enumerate(self._strings("categories"))}
+        self.fuzzy = FuzzySkuIndex.from_parts(self._strings("fuzzy.skus"), self._s["fuzzy.keys"])
+        self.prefix = PrefixIndex.from_parts(
+            self._strings("prefix.skus"), self._strings("prefix.sku_terms"), self._s["prefix.sku_ids"],
+            self._strings("prefix.name_terms"), self._s["prefix.name_ids"],
+        )
+        self.phonetic = PhoneticIndex.from_parts(
+            self._strings("phonetic.terms"), self._s["phonetic.starts"], self._s["phonetic.ids"],
+        )
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm, path)
+
+    def _strings(self, name: str) -> StrColumn:
+        return StrColumn(self._s[f"{name}.starts"], self._s[f"{name}.lens"], self._s[f"{name}.blob"])
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row(j) for j in range(*i.indices(self._n))]
+        return self.row(i)
+
+    def row(self, i: int) -> dict:
+        rid = self._ids[i]
+        out = {"id": None if rid == NULL_ID else rid}
+        for c in STR_COLUMNS:
+            out[c] = self._cols[c][i]
+        for c in NUM_COLUMNS:
+            out[c] = _num(self._cols[c][i])
+        return out
+
+    def column(self, name: str) -> Sequence:
+        """Raw column view: str/None for text columns, float (NaN for NULL) for numbers."""
+        return self._cols[name]
+
+    def find_sku(self, clean: str) -> Optional[dict]:
+        """First row (in table order) whose cleaned SKU equals `clean`."""
+        j = bisect_left(self._by_sku, clean)
+        if j < len(self._by_sku) and self._by_sku[j] == clean:
+            return self.row(self._s["sku_order"][j])
+        return None
+
+    def _name_hits(self, query: str) -> Iterator[int]:
+        needle = query.lower().encode("utf-8")
+        if not needle or b"\n" in needle:
+            return
+        starts = self._s["name_starts"]
+        lo = self._offsets["names_lc"]
+        hi = lo + starts[self._n] if self._n else lo
+        pos = lo
+        while True:
+            k = self._buf.find(needle, pos, hi)
+            if k < 0:
+                return
+            i = bisect_right(starts, k - lo) - 1
+            yield i
+            pos = lo + starts[i + 1]
+
+    def find_name(self, query: str) -> list[dict]:
+        """Rows whose lowercase name contains `query`, in table order (a C-level scan of one blob)."""
+        return [self.row(i) for i in self._name_hits(query)]
+
+    def name_matches(self, query: str, limit: int) -> tuple[int, list[dict]]:
+        """(total, first `limit` rows) of find_name, decoding only the rows returned."""
+        total, out = 0, []
+        for i in self._name_hits(query):
+            total += 1
+            if len(out) < limit:
+                out.append(self.row(i))
+        return total, out
+
+    def phonetic_matches(self, query: str, limit: int) -> tuple[int, list[dict]]:
+        """(total, best `limit` rows) of name_matches plus the rows whose name or description
+        holds every word of `query` in any spelling (Devanagari or romanized). Plain name
+        matches come first, then phonetic name matches, then description ones."""
+        total, found = self.phonetic.lookup(query, limit, first=self._name_hits(query.strip()))
+        return total, [self.row(i) for i in found]
+
+    def category_rows(self, category) -> Sequence:
+        """Row numbers with this category, in table order."""
+        lo, hi = self._categories.get(category, (0, 0))
+        return self._s["cat_rows"][lo:hi]
+
+    def in_stock(self, category, exclude_sku=None, limit: int = 3) -> list[dict]:
+        """In Stock (quantity > 0 and above the reorder level) rows of `category`, in table order."""
+        skus, qty, reorder = self._cols["sku"], self._cols["quantity"], self._cols["reorder_level"]
+        out = []
+        for i in self.category_rows(category):
+            q = 0 if math.isnan(qty[i]) else int(qty[i])
+            r = 0 if math.isnan(reorder[i]) else int(reorder[i])
+            if q > 0 and q > r and skus[i] != exclude_sku:
+                out.append(self.row(i))
+                if len(out) == limit:
+                    break
+        return out
+
+
+def publish(rows: list[dict], version, path: str) -> str:
+    """Write the snapshot next to `path` and atomically rename it into place."""
+    data = build(rows, version)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+@contextlib.contextmanager
+def _host_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _open_at(path: str, version) -> Optional[Snapshot]:
+    try:
+        snap = Snapshot.open(path)
+    except (OSError, ValueError):
+        return None
+    return snap if snap.version == version else None
+
+
+def shared(path: str, version, load_rows: Callable[[], list]) -> Snapshot:
+    """Map the host-wide snapshot at `path`, rebuilding it first (once, under a file lock) if stale."""
+    snap = _open_at(path, version)
+    if snap is not None:
+        return snap
+    with _host_lock(f"{path}.lock"):
+        snap = _open_at(path, version)
+        if snap is None:
+            publish(load_rows(), version, path)
+            snap = Snapshot.open(path)
+    return snap
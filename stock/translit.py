@@ -0,0 +1,161 @@
+"""Spelling-insensitive keys for product names typed in Devanagari or romanized Hindi.
+
+Dealers search "शुभ विवाह", "shubh vivah", "shub vivaah" and "subh wivah"
+for the same card. phonetic_words() maps all of them to the same words:
+
+1. Devanagari is transliterated to plain Latin letters. A consonant's
+   inherent "a" is written where Hindi speakers pronounce it: it is dropped
+   at the end of a word and between a vowel + consonant and a consonant +
+   vowel, the way "कमला" is said "kamla".
+2. The romanization is folded: accents stripped, long vowels shortened
+   (aa, ee, oo), aspirates merged with their plain consonant (bh -> b,
+   sh -> s), doubled letters collapsed, c/q -> k, w -> v, z -> j, x -> ks,
+   ph -> f, and a word-final "a" dropped ("ganesha" = "ganesh").
+
+The keys are for matching only, never shown. search_index.PhoneticIndex stores
+them for every name and description once per snapshot. Queries are folded
+the same way and answered with two bisects per word.
+
+    python -m stock.translit "शुभ विवाह" "shubh vivaah"
+"""
+import argparse
+import functools
+import re
+import unicodedata
+
+_VIRAMA = "्"
+_NUKTA = "़"
+
+# independent vowels and vowel signs (matras)
+_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ii", "उ": "u", "ऊ": "uu", "ऋ": "ri", "ॠ": "ri",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au", "ऑ": "o", "ऍ": "e", "ऎ": "e", "ऒ": "o",
+}
+_MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "ii", "ु": "u", "ू": "uu", "ृ": "ri",
+    "ॄ": "ri", "े": "e", "ै": "ai", "ो": "o", "ौ": "au", "ॉ": "o",
+    "ॅ": "e", "ॆ": "e", "ॊ": "o",
+}
+_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "ळ": "l", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+}
+# consonant + nukta (NFC never composes these); ड़ / ढ़ keep "d", as they are usually typed
+_NUKTA_FORMS = {"क": "q", "ख": "kh", "ग": "g", "ज": "z", "फ": "f"}
+_MARKS = {"ं": "n", "ँ": "n", "ः": "h"}  # anusvara, chandrabindu, visarga
+_DIGITS = {chr(0x0966 + d): str(d) for d in range(10)}
+
+# longest first: one pass over the romanization, each spelling to one canonical letter
+_FOLD = [
+    ("chh", "c"), ("ch", "c"), ("shh", "s"), ("sh", "s"), ("kh", "k"), ("gh", "g"), ("jh", "j"),
+    ("th", "t"), ("dh", "d"), ("ph", "f"), ("bh", "b"), ("ck", "k"),
+    ("aa", "a"), ("ee", "i"), ("ii", "i"), ("oo", "u"), ("uu", "u"), ("ai", "e"), ("au", "o"),
+    ("mb", "nb"), ("mp", "np"),
+    ("c", "k"), ("q", "k"), ("w", "v"), ("z", "j"), ("x", "ks"),
+]
+_FOLD_RE = re.compile("|".join(re.escape(k) for k, _ in _FOLD))
+_FOLD_MAP = dict(_FOLD)
+_DOUBLED = re.compile(r"([a-z])\1+")
+_WORDS = re.compile(r"[a-z0-9]+")
+_DEVANAGARI = re.compile("[\u0900-\u097f]")
+
+
+def _is_devanagari(ch: str) -> bool:
+    return "\u0900" <= ch <= "\u097f"
+
+
+def devanagari_to_latin(text: str) -> str:
+    """Lowercase Latin spelling of the Devanagari in `text`; anything else passes through."""
+    if not _DEVANAGARI.search(text):
+        return text
+    chars = unicodedata.normalize("NFC", text)
+    pieces = []  # [consonant, vowel, vowel is an inherent "a"]
+    i, n = 0, len(chars)
+    while i < n:
+        ch = chars[i]
+        i += 1
+        if ch in _CONSONANTS:
+            sound = _CONSONANTS[ch]
+            if i < n and chars[i] == _NUKTA:
+                sound = _NUKTA_FORMS.get(ch, sound)
+                i += 1
+            if i < n and chars[i] == _VIRAMA:
+                pieces.append([sound, "", False])
+                i += 1
+            elif i < n and chars[i] in _MATRAS:
+                pieces.append([sound, _MATRAS[chars[i]], False])
+                i += 1
+            else:
+                pieces.append([sound, "a", True])
+        elif ch in _VOWELS:
+            pieces.append(["", _VOWELS[ch], False])
+        elif ch in _MARKS:
+            pieces.append([_MARKS[ch], "", False])
+        elif ch in _DIGITS:
+            pieces.append([_DIGITS[ch], "", False])
+        elif _is_devanagari(ch):  # danda, stray signs: a word break or nothing
+            pieces.append([" " if ch in "।॥" else "", "", False])
+        else:
+            pieces.append([ch, "", False])
+    _delete_schwas(pieces)
+    return "".join(c + v for c, v, _ in pieces)
+
+
+def _is_letter(piece) -> bool:
+    return (piece[0] + piece[1]).isalpha()
+
+
+def _delete_schwas(pieces: list):
+    """Hindi schwa deletion, in place, right to left: an inherent "a" goes at the end of a
+    word (of more than one letter) and in V C(a) C V, so कमल is "kamal" but कमला "kamla"."""
+    n = len(pieces)
+    for k in range(n - 1, -1, -1):
+        if not pieces[k][2]:
+            continue
+        prev = pieces[k - 1] if k > 0 and _is_letter(pieces[k - 1]) else None
+        nxt = pieces[k + 1] if k + 1 < n and _is_letter(pieces[k + 1]) else None
+        if nxt is None:
+            if prev is not None:
+                pieces[k][1] = ""
+        elif prev is not None and prev[1] and nxt[0] and nxt[1]:
+            pieces[k][1] = ""
+
+
+@functools.lru_cache(maxsize=65536)  # a catalogue repeats the same few thousand words
+def _fold(word: str) -> str:
+    word = _FOLD_RE.sub(lambda m: _FOLD_MAP[m.group(0)], word)
+    word = _DOUBLED.sub(r"\1", word)
+    if len(word) > 2 and word.endswith("a"):
+        word = word[:-1]
+    return word
+
+
+def phonetic_words(text) -> list[str]:
+    """Folded words of `text`, in order (duplicates kept)."""
+    s = str(text or "")
+    if not s.isascii():
+        s = devanagari_to_latin(unicodedata.normalize("NFKC", s))
+        s = "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
+    return [_fold(w) for w in _WORDS.findall(s.lower())]
+
+
+def phonetic_key(text) -> str:
+    """phonetic_words joined by single spaces."""
+    return " ".join(phonetic_words(text))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Print the phonetic key of each argument.")
+    ap.add_argument("text", nargs="+")
+    args = ap.parse_args()
+    for t in args.text:
+        print(f"{t!r:32s} {devanagari_to_latin(t)!r:28s} -> {phonetic_key(t)!r}")
+
+
+if __name__ == "__main__":
+    main()
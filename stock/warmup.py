@@ -0,0 +1,183 @@
+"""Boot-time cache warmup and the readiness flag behind /ready.
+
+The app calls `run(steps)` from its first script run. Each step is timed; a
+failing step is recorded but does not block readiness, since a cold cache is
+better than a process that never takes traffic.
+
+Readiness is published two ways: `/ready` on the metrics port (when
+METRICS_ENABLED is set) and READY_FILE, a small JSON file under Streamlit's
+static folder that exists only once warmup has finished. Render's health
+check polls the file's URL (/app/static/ready.json), which Streamlit serves
+without running the script. At boot, `--clear` removes a file left by the
+previous process before the server starts, and `--kick` then triggers the
+one script run that does the warmup (see render.yaml):
+
+    python -m stock.warmup --clear
+    python -m stock.warmup --kick http://127.0.0.1:8501
+
+    WARMUP_TOP_N=50                      SKUs to pre-resolve (0 disables)
+    WARMUP_SKUS_FILE=data/top_skus.txt   extra SKUs to keep hot, one per line
+    READY_FILE=static/ready.json         readiness marker, relative to the app's
+                                         folder, not the working directory ('' disables)
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Iterable
+
+from stock import metrics
+
+logger = logging.getLogger("stock.warmup")
+
+TOP_N = int(os.environ.get("WARMUP_TOP_N", "50") or 0)
+SKUS_FILE = os.environ.get("WARMUP_SKUS_FILE", "data/top_skus.txt").strip()
+# the folder holding app.py and 2.py, whose static/ subfolder Streamlit serves
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ready = os.environ.get("READY_FILE", "static/ready.json").strip()
+READY_FILE = os.path.join(APP_DIR, _ready) if _ready else ""
+
+_lock = threading.Lock()
+_state = {
+    "ready": False,
+    "started_at": None,
+    "finished_at": None,
+    "steps": {},
+    "errors": {},
+}
+
+
+def top_skus(fallback: Iterable[str], n: int = TOP_N, popular: Iterable[str] = ()) -> list[str]:
+    """Up to n SKUs to warm: `popular` (from search analytics) first, then SKUS_FILE, then `fallback`."""
+    out, seen = [], set()
+
+    def add(sku):
+        sku = str(sku or "").strip()
+        if sku and sku not in seen and len(out) < n:
+            seen.add(sku)
+            out.append(sku)
+
+    if n <= 0:
+        return out
+    for sku in popular:
+        add(sku)
+    try:
+        with open(SKUS_FILE, encoding="utf-8") as f:
+            for line in f:
+                add(line.split(",", 1)[0])
+    except OSError:
+        pass
+    for sku in fallback:
+        if len(out) >= n:
+            break
+        add(sku)
+    return out
+
+
+def run(steps: list[tuple[str, Callable[[], object]]]) -> dict:
+    """Run warmup steps in order, then mark the process ready. Returns step timings (seconds)."""
+    with _lock:
+        if _state["started_at"] is None:
+            _state["started_at"] = time.time()
+        timings = {}
+        for name, fn in steps:
+            t0 = time.perf_counter()
+            try:
+                with metrics.span(f"warmup_{name}"):
+                    fn()
+            except Exception as e:
+                _state["errors"][name] = repr(e)
+                logger.warning("warmup step %s failed: %r", name, e)
+            timings[name] = round(time.perf_counter() - t0, 4)
+        _state["steps"].update(timings)
+        _state["finished_at"] = time.time()
+        if not _state["ready"]:
+            _state["ready"] = True
+            logger.info("warmup finished: %s", json.dumps(timings))
+        _write_ready_file()
+        return timings
+
+
+def _write_ready_file(path: str = READY_FILE):
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(status(), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("readiness file %s not written: %s", path, e)
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def status() -> dict:
+    return {k: (dict(v) if isinstance(v, dict) else v) for k, v in _state.items()}
+
+
+@metrics.route("/ready")
+def _ready_route():
+    body = json.dumps(status()) + "\n"
+    return (200 if is_ready() else 503), "application/json", body
+
+
+def clear(path: str = READY_FILE):
+    """Remove the readiness file (call before the server starts)."""
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def kick(base_url: str, timeout: float = 600) -> bool:
+    """Hit Streamlit's script health check until one script run (and with it the warmup)
+    completes. Returns whether it did within `timeout` seconds."""
+    url = base_url.rstrip("/") + "/_stcore/script-health-check"
+    deadline = time.monotonic() + timeout
+    failures = 0
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                if resp.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            # 503 while the runtime is still starting, or a script that raised: retry a few times only
+            failures += 1
+            logger.warning("script health check: HTTP %s", e.code)
+            if failures >= 3:
+                return False
+            time.sleep(5)
+            continue
+        except OSError:
+            pass  # server not listening yet
+        time.sleep(1)
+    return False
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Trigger the boot-time warmup of a starting Streamlit server.")
+    ap.add_argument("--clear", action="store_true", help=f"remove the readiness file ({READY_FILE or 'disabled'})")
+    ap.add_argument("--kick", metavar="URL", help="server base URL, e.g. http://127.0.0.1:8501")
+    ap.add_argument("--timeout", type=float, default=600)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.clear:
+        clear()
+    if not args.kick:
+        return
+    ok = kick(args.kick, args.timeout)
+    logger.info("warmup kick %s", "done" if ok else "failed")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()